@@ -1,15 +1,33 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
+import numpy as np
 import os
+import time
 from dotenv import load_dotenv
 
-# --- IMPORTAÇÃO DA LÓGICA DE IA (src/agentedeia.py) ---
-# Certifique-se de que o arquivo agentedeia.py esteja dentro da pasta 'src'
+# --- IMPORTAÇÃO DOS MÓDULOS DO PAINEL ---
+# A lógica de IA (src/agentedeia.py, com crewai/litellm) NÃO é importada aqui: ela é carregada
+# sob demanda por src/ia_sob_demanda.py quando um relatório ou pergunta é pedido.
 try:
-    from src.agentedeia import executar_analise_menu, responder_chat_dados
+    from src.ia_sob_demanda import aquecer_em_segundo_plano, carregar_ia
+    import src.ia_sob_demanda as ia_sob_demanda
+    from src.incremental import MenuIncremental
+    from src.consultas import responder_localmente
+    from src.contexto import IndiceProdutos, selecionar_contexto
+    from src.conversa import Conversa
+    from src.historico import historico_padrao
+    from src.receitas import GrafoReceitas, ler_ficha, ler_tabela_precos
+    from src.importacao import combinar, importar_arquivos, resumo_importacao
+    from src.graficos import LIMIAR_WEBGL, montar_matriz
+    from src.preanalise import ALERTAS, preanalisar
+    from src.simulacao import ELASTICIDADE_PADRAO, elasticidades, monte_carlo, precos_cenarios, simular_cenario, simular_grade
+    from src.engenharia import QUADRANTES
+    from src.sessao import adicionar_itens, aplicar_edicoes, atualizar_custos, atualizar_vendas, para_editor, tabela_vazia, tipar
+    from src.instrumentacao import Instrumentacao, medir, memoria_mb, tamanho_df
+    from src.agendador import FilaCheia, agendador_ia
+    from src.banco import BANCO_ATIVO_PADRAO, banco_padrao, erros_banco
 except ImportError:
-    st.error("Erro ao importar 'src.agentedeia'. Verifique se o arquivo existe e se a estrutura de pastas está correta.")
+    st.error("Erro ao importar os módulos de 'src'. Verifique se a estrutura de pastas está correta.")
     st.stop()
 
 # --- CONFIGURAÇÃO INICIAL ---
@@ -17,17 +35,38 @@ load_dotenv()
 st.set_page_config(page_title="ChefIA - Inteligência de Menu", layout="wide", page_icon="👨‍🍳")
 
 # --- FUNÇÕES AUXILIARES ---
-def classificar_produto(row, pop, luc):
-    if row['popularidade'] >= pop and row['lucratividade'] >= luc: return '⭐ Estrela'
-    elif row['popularidade'] >= pop and row['lucratividade'] < luc: return '🛒 Popular'
-    elif row['popularidade'] < pop and row['lucratividade'] >= luc: return '💎 Oportunidade'
-    else: return '⚠️ Crítico'
-
 def limpar_texto_ia(texto_obj):
     # Garante que o output seja string pura para evitar erros de renderização
     texto = str(texto_obj.raw) if hasattr(texto_obj, 'raw') else str(texto_obj)
     return texto.replace("$", "\\$")
 
+def limpar_fluxo_ia(fluxo):
+    # Mesma sanitização aplicada pedaço a pedaço (a troca de '$' não depende dos vizinhos)
+    for pedaco in fluxo:
+        yield limpar_texto_ia(pedaco)
+
+def legenda_tempos(metricas):
+    if metricas.get('do_cache'):
+        return "⚡ Recuperado do cache (sem custo de tokens)."
+    legenda = f"⏱️ Primeiro token em {metricas.get('ttft_s', 0):.2f}s · total {metricas.get('total_s', 0):.2f}s"
+    if metricas.get('tokens_em_cache'):
+        legenda += f" · {metricas['tokens_em_cache']:,} de {metricas['tokens_entrada']:,} tokens de entrada do cache do provedor"
+    return legenda
+
+def aviso_fila(area):
+    # Callback para o agendador da IA (src/agendador.py): mostra a posição enquanto o pedido espera
+    def ao_esperar(posicao):
+        if posicao:
+            area.caption(f"⏳ Na fila da IA: posição {posicao}")
+    return ao_esperar
+
+def camada_ia():
+    # Primeiro uso da IA no processo paga o import do crewai; os seguintes são instantâneos
+    try:
+        return carregar_ia()
+    except ImportError as e:
+        raise RuntimeError(f"camada de IA indisponível ({e}). Verifique se o crewai está instalado (requirements.txt).") from e
+
 CORES_MATRIZ = {
     '⭐ Estrela': '#FFD700',
     '🛒 Popular': '#1E90FF',
@@ -64,6 +103,32 @@ elif provedor == "Perplexity":
     modelo_selecionado = f"perplexity/{mod}"
     api_key_final = os.getenv("PERPLEXITY_API_KEY") or st.sidebar.text_input("Perplexity API Key:", type="password")
 
+usar_streaming = st.sidebar.toggle("Mostrar respostas da IA em tempo real", value=True)
+orcamento_contexto = st.sidebar.slider(
+    "Orçamento de dados por pergunta (tokens):", min_value=300, max_value=8000, value=1500, step=100,
+    help="Limite de dados do cardápio enviados ao chat. Só os itens relevantes para a pergunta entram."
+)
+aquecer_ia = st.sidebar.toggle("Pré-carregar a IA em segundo plano", value=True,
+                               help="Importa o CrewAI depois que a página aparece, para o primeiro relatório/pergunta não esperar.")
+diagnostico_ativo = st.sidebar.toggle("📊 Diagnóstico de desempenho", value=False,
+                                      help="Mede o tempo de cada etapa, memória, tokens e acertos de cache a cada interação.")
+usar_banco = st.sidebar.toggle("💾 Guardar dados no banco local", value=BANCO_ATIVO_PADRAO,
+                               help="Cardápio, fichas técnicas e histórico de vendas ficam num banco no disco (DuckDB ou SQLite) e voltam na próxima sessão.")
+
+# Instrumentação (src/instrumentacao.py): um coletor por rerun; desligada, não custa praticamente nada
+if 'instrumentacao' not in st.session_state:
+    st.session_state.instrumentacao = Instrumentacao()
+st.session_state.instrumentacao.iniciar_execucao(diagnostico_ativo)
+
+# Banco local opcional (src/banco.py): aberto uma vez por processo e compartilhado entre as sessões
+banco = None
+if usar_banco:
+    try:
+        with medir('banco.abrir'):
+            banco = banco_padrao()
+    except erros_banco() as e:
+        st.sidebar.warning(f"Banco local indisponível ({e}); os dados ficam só nesta sessão.")
+
 # --- CABEÇALHO E NOME ---
 st.title("👨‍🍳 ChefIA - Inteligência Gastronômica")
 
@@ -104,40 +169,161 @@ st.markdown("---")
 st.header("📝 Gerenciamento do Cardápio")
 st.markdown("Insira seus dados reais aqui. Você pode importar um arquivo ou digitar manualmente.")
 
-if 'dados_manuais' not in st.session_state:
-    st.session_state.dados_manuais = []
+# Cardápio da sessão como tabela colunar tipada (src/sessao.py); vira DataFrame "comum" só para o editor
+if 'cardapio' not in st.session_state:
+    st.session_state.cardapio = tabela_vazia()
+
+# Com o banco ligado, a sessão começa com o cardápio e a ficha técnica guardados do usuário
+# (um cardápio já montado nesta sessão tem prioridade e passa a ser o guardado)
+usuario = st.session_state.user_name
+if banco is not None and st.session_state.get('banco_carregado') != usuario:
+    with medir('banco.carregar') as m:
+        if st.session_state.cardapio.empty:
+            st.session_state.cardapio = tipar(banco.carregar_cardapio(usuario))
+        if st.session_state.get('receitas') is None:
+            ficha_guardada = banco.ficha(usuario)
+            if len(ficha_guardada):
+                st.session_state.receitas = GrafoReceitas.da_ficha(ficha_guardada)
+                precos_guardados = banco.precos_insumos(usuario)
+                if len(precos_guardados):
+                    st.session_state.receitas.atualizar_precos(precos_guardados)
+        m.update(linhas=len(st.session_state.cardapio))
+    st.session_state.banco_carregado = usuario
 
 # --- IMPORTAÇÃO ---
-with st.expander("📂 Importar Arquivo CSV (Backup)", expanded=False):
-    up_sim = st.file_uploader("Escolha o arquivo CSV", type=['csv'])
-    
-    if up_sim is not None:
-        file_id = f"{up_sim.name}_{up_sim.size}"
-        if 'ultimo_import_id' not in st.session_state or st.session_state.ultimo_import_id != file_id:
+with st.expander("📂 Importar Arquivos CSV (Backup, Vendas do PDV, Ficha Técnica)", expanded=False):
+    st.caption(
+        "Envie vários arquivos de uma vez. Encoding, separador e decimal são detectados automaticamente; "
+        "vendas do PDV são casadas com a ficha técnica enviada junto (sem ela, entram com custo zerado)."
+    )
+    ups_import = st.file_uploader(
+        "Escolha os arquivos CSV", type=['csv'], accept_multiple_files=True, key="uploader_importacao"
+    )
+    modo_import = st.radio("Ao importar", ["Substituir o cardápio", "Acrescentar ao cardápio"], horizontal=True)
+
+    if ups_import and st.button("📥 Importar arquivos"):
+        with medir('importacao.lote') as m:
+            resultados_import = importar_arquivos(ups_import)
+            df_import = combinar(resultados_import)
+            m.update(tamanho_df(df_import))
+        st.session_state.ultima_importacao = resultados_import
+
+        if df_import.empty:
+            st.error("Nenhum item válido: os arquivos devem ser um backup (produto_nome, custo_producao, preco_venda, popularidade) ou vendas do PDV (com ou sem ficha técnica).")
+        else:
+            if modo_import.startswith("Substituir") or st.session_state.cardapio.empty:
+                st.session_state.cardapio = tipar(df_import)
+            else:
+                # Itens repetidos: o arquivo importado vence
+                atuais = st.session_state.cardapio
+                manter = ~atuais['produto_nome'].astype(str).isin(set(df_import['produto_nome']))
+                st.session_state.cardapio = adicionar_itens(atuais[manter.to_numpy()].reset_index(drop=True), df_import)
+            st.rerun()
+
+    # Resumo da última importação (sobrevive ao rerun)
+    if st.session_state.get('ultima_importacao'):
+        resultados_import = st.session_state.ultima_importacao
+        aceitas = sum(r['aceitas'] for r in resultados_import)
+        rejeitadas = sum(r['rejeitadas'] for r in resultados_import)
+        st.success(f"{len(resultados_import)} arquivo(s) lidos: {aceitas} linhas aceitas, {rejeitadas} rejeitadas.")
+        st.dataframe(resumo_importacao(resultados_import), hide_index=True, use_container_width=True)
+        for r in resultados_import:
+            if r.get('aviso'):
+                st.warning(f"{r['arquivo']}: {r['aviso']}")
+        if rejeitadas:
+            with st.expander(f"⚠️ Linhas rejeitadas ({rejeitadas})"):
+                for r in resultados_import:
+                    if r['rejeitadas']:
+                        st.markdown(f"**{r['arquivo']}** — {r['rejeitadas']} linha(s)")
+                        st.dataframe(r['rejeicoes'], hide_index=True, use_container_width=True)
+
+# --- FICHAS TÉCNICAS E PREÇOS DE INSUMOS (src/receitas.py) ---
+with st.expander("🧾 Fichas Técnicas e Preços de Insumos", expanded=False):
+    st.caption(
+        "Carregue a ficha técnica (com sub-receitas como molhos e massas) uma vez; depois, cada lista de preços "
+        "do fornecedor recalcula só os pratos que usam os insumos alterados."
+    )
+    up_ficha = st.file_uploader("Ficha técnica (CSV)", type=['csv'], key="uploader_ficha_grafo")
+    if up_ficha is not None and st.session_state.get('ficha_grafo_id') != f"{up_ficha.name}_{up_ficha.size}":
+        try:
+            with medir('receitas.montagem') as m:
+                ficha = ler_ficha(up_ficha)
+                st.session_state.receitas = GrafoReceitas.da_ficha(ficha)
+                m.update(st.session_state.receitas.resumo())
+            st.session_state.ficha_grafo_id = f"{up_ficha.name}_{up_ficha.size}"
+            if banco is not None:
+                banco.salvar_ficha(usuario, ficha)
+        except ValueError as e:
+            st.error(f"Ficha técnica inválida: {e}")
+
+    receitas = st.session_state.get('receitas')
+    if receitas is not None:
+        resumo_grafo = receitas.resumo()
+        st.info(f"{resumo_grafo['receitas']} receitas ({resumo_grafo['sub_receitas']} sub-receitas), "
+                f"{resumo_grafo['ingredientes']} insumos, {resumo_grafo['niveis']} nível(is).")
+        if st.button("💲 Aplicar custos das fichas ao cardápio"):
+            st.session_state.cardapio, n_itens = atualizar_custos(st.session_state.cardapio, receitas.custos())
+            st.session_state.msg_receitas = f"Custo atualizado em {n_itens} item(ns) do cardápio."
+            st.rerun()
+
+        up_precos = st.file_uploader("Lista de preços do fornecedor (CSV: insumo;preço)", type=['csv'], key="uploader_precos")
+        if up_precos is not None and st.button("🔁 Atualizar preços dos insumos"):
             try:
-                df_import = pd.read_csv(up_sim, sep=';', decimal=',')
-                df_import.columns = df_import.columns.str.strip().str.lower()
-                
-                cols_map = {
-                    "produto_nome": "produto_nome", 
-                    "custo_producao": "custo_producao", 
-                    "preco_venda": "preco_venda", 
-                    "popularidade": "popularidade"
-                }
-                
-                if all(c in df_import.columns for c in cols_map.keys()):
-                    df_import['popularidade'] = pd.to_numeric(df_import['popularidade'], errors='coerce').fillna(0).astype(int)
-                    df_import['custo_producao'] = pd.to_numeric(df_import['custo_producao'], errors='coerce').fillna(0.0)
-                    df_import['preco_venda'] = pd.to_numeric(df_import['preco_venda'], errors='coerce').fillna(0.0)
-                    
-                    st.session_state.dados_manuais = df_import.to_dict('records')
-                    st.session_state.ultimo_import_id = file_id
-                    st.success("Dados carregados com sucesso!")
-                    st.rerun()
+                with medir('receitas.atualizar_precos') as m:
+                    precos = ler_tabela_precos(up_precos)
+                    afetados, desconhecidos = receitas.atualizar_precos(precos)
+                    if banco is not None:
+                        banco.guardar_precos_insumos(usuario, precos)
+                    st.session_state.cardapio, n_itens = atualizar_custos(st.session_state.cardapio, afetados)
+                    m.update(insumos=len(precos), receitas_afetadas=len(afetados))
+                st.session_state.afetados_receitas = afetados
+                st.session_state.msg_receitas = (
+                    f"{len(precos) - len(desconhecidos)} insumos atualizados: {len(afetados)} receitas recalculadas, "
+                    f"{n_itens} item(ns) do cardápio com custo novo."
+                    + (f" Não encontrados na ficha: {', '.join(map(str, desconhecidos[:10]))}" if desconhecidos else "")
+                )
+                st.rerun()
+            except ValueError as e:
+                st.error(str(e))
+
+        if st.session_state.get('msg_receitas'):
+            st.success(st.session_state.msg_receitas)
+        if st.session_state.get('afetados_receitas') is not None and not st.session_state.afetados_receitas.empty:
+            st.dataframe(st.session_state.afetados_receitas, hide_index=True, use_container_width=True)
+
+# --- HISTÓRICO DE VENDAS ---
+with st.expander("🗓️ Histórico de Vendas (várias exportações do PDV)", expanded=False):
+    # Com o banco ligado, filtros e somas por período rodam em SQL; senão, nos Parquets do HistoricoVendas
+    historico = banco if banco is not None else historico_padrao()
+    ups_hist = st.file_uploader(
+        "Exportações de vendas (o nome deve conter a data, ex: vendas-2025-10-13.csv)",
+        type=['csv'], accept_multiple_files=True, key="uploader_historico"
+    )
+    if ups_hist and st.button("Adicionar ao histórico"):
+        for up in ups_hist:
+            try:
+                r = historico.ingerir(up, nome=up.name)
+                if r['status'] == 'ingerido':
+                    st.success(f"{up.name}: {r['linhas']} linhas ({', '.join(r['lojas'])}) em {r['data']}.")
                 else:
-                    st.error("O arquivo CSV deve conter as colunas: produto_nome, custo_producao, preco_venda, popularidade.")
-            except Exception as e:
-                st.error(f"Erro ao ler arquivo: {e}")
+                    st.info(f"{up.name}: já estava no histórico.")
+            except ValueError as e:
+                st.error(str(e))
+
+    periodos = historico.periodos('mensal')
+    if periodos:
+        lojas_hist = st.multiselect("Lojas (vazio = todas)", historico.lojas())
+        h1, h2 = st.columns(2)
+        periodo_a = h1.selectbox("Mês A", periodos, index=max(len(periodos) - 2, 0))
+        periodo_b = h2.selectbox("Mês B", periodos, index=len(periodos) - 1)
+        if periodo_a != periodo_b:
+            st.dataframe(historico.comparar_periodos(periodo_a, periodo_b, lojas_hist).head(50), use_container_width=True, hide_index=True)
+
+        # Atualiza vendas e preço dos pratos já cadastrados com os números do período escolhido
+        if st.button(f"Usar vendas de {periodo_b} no cardápio") and not st.session_state.cardapio.empty:
+            vendas_mes = historico.vendas_periodo(periodo_b, periodo_b, lojas_hist)
+            st.session_state.cardapio = atualizar_vendas(st.session_state.cardapio, vendas_mes)
+            st.rerun()
 
 # --- ADIÇÃO MANUAL ---
 with st.expander("➕ Adicionar Prato Novo (Formulário)", expanded=False):
@@ -150,26 +336,19 @@ with st.expander("➕ Adicionar Prato Novo (Formulário)", expanded=False):
         
         if st.form_submit_button("Adicionar"):
             if novo_nome:
-                st.session_state.dados_manuais.append({
+                st.session_state.cardapio = adicionar_itens(st.session_state.cardapio, [{
                     "produto_nome": novo_nome.upper(),
                     "custo_producao": novo_custo,
                     "preco_venda": novo_preco,
                     "popularidade": int(novo_qtd)
-                })
+                }])
                 st.rerun()
 
 # --- TABELA EDITÁVEL ---
 st.markdown("### 📋 Seus Dados")
 st.info("💡 Dica: Clique em qualquer célula para editar os valores.")
 
-if len(st.session_state.dados_manuais) > 0:
-    df_input = pd.DataFrame(st.session_state.dados_manuais)
-    cols_keep = ["produto_nome", "custo_producao", "preco_venda", "popularidade"]
-    for c in cols_keep:
-        if c not in df_input.columns: df_input[c] = 0
-    df_input = df_input[cols_keep]
-else:
-    df_input = pd.DataFrame(columns=["produto_nome", "custo_producao", "preco_venda", "popularidade"])
+df_input = para_editor(st.session_state.cardapio)
 
 column_cfg = {
     "produto_nome": st.column_config.TextColumn("Nome", required=True),
@@ -178,26 +357,40 @@ column_cfg = {
     "popularidade": st.column_config.NumberColumn("Qtd", min_value=1, step=1, required=True)
 }
 
-edited_df = st.data_editor(
-    df_input,
-    column_config=column_cfg,
-    num_rows="dynamic",
-    use_container_width=True,
-    hide_index=True,
-    key="editor_dados"
-)
+with medir('ui.data_editor', **tamanho_df(df_input)):
+    edited_df = st.data_editor(
+        df_input,
+        column_config=column_cfg,
+        num_rows="dynamic",
+        use_container_width=True,
+        hide_index=True,
+        key="editor_dados"
+    )
 
-if not edited_df.equals(df_input):
-    st.session_state.dados_manuais = edited_df.to_dict('records')
+    if not edited_df.equals(df_input):
+        # Só o delta do editor é aplicado à tabela da sessão (célula a célula quando possível)
+        st.session_state.cardapio = aplicar_edicoes(st.session_state.cardapio, st.session_state.get('editor_dados'), edited_df)
 
 # ==============================================================================
 # SEÇÃO 3: ANÁLISE E INTELIGÊNCIA (DASHBOARD)
 # ==============================================================================
 
+if 'motor_menu' not in st.session_state:
+    st.session_state.motor_menu = MenuIncremental()
+motor = st.session_state.motor_menu
+
 if not edited_df.empty:
-    df_final = edited_df.copy()
-    df_final['lucratividade'] = df_final['preco_venda'] - df_final['custo_producao']
-    df_final['receita_total'] = df_final['preco_venda'] * df_final['popularidade']
+    # Camada incremental (src/incremental.py): só as linhas editadas são recalculadas entre reruns
+    with medir('motor.atualizar') as m:
+        df_final = motor.atualizar(edited_df)
+        m.update(linhas=len(df_final), linhas_recalculadas=motor.linhas_recalculadas, reclassificou_tudo=motor.reclassificou_tudo)
+    ref_pop, ref_luc = motor.ref_pop, motor.ref_luc
+
+    # Cardápio gravado no banco só quando os dados mudam (a versão do motor sobe a cada alteração)
+    if banco is not None and st.session_state.get('banco_versao') != (usuario, motor.versao):
+        with medir('banco.salvar', linhas=len(df_final)):
+            banco.salvar_cardapio(usuario, st.session_state.cardapio)
+        st.session_state.banco_versao = (usuario, motor.versao)
 
     st.markdown("---")
     st.header("📊 Dashboard & Inteligência")
@@ -206,36 +399,111 @@ if not edited_df.empty:
     c_b1, c_b2 = st.columns([1, 1])
     with c_b1:
         if st.button("🗑️ Limpar Todos os Dados"):
-            st.session_state.dados_manuais = []
+            st.session_state.cardapio = tabela_vazia()
+            if banco is not None:
+                banco.salvar_cardapio(usuario, st.session_state.cardapio)
             st.rerun()
     with c_b2:
-        csv = df_final.to_csv(index=False, sep=';', decimal=',').encode('utf-8-sig')
-        st.download_button("💾 Baixar Backup dos Dados", data=csv, file_name='dados_chefia.csv', mime='text/csv')
+        # O CSV só é gerado quando pedido; depois fica pronto para baixar até os dados mudarem
+        if st.session_state.get('backup_versao') == motor.versao or st.button("💾 Gerar Backup dos Dados"):
+            st.session_state.backup_versao = motor.versao
+            csv = motor.memo('csv_backup', lambda: df_final.drop(columns='classificacao').to_csv(index=False, sep=';', decimal=',').encode('utf-8-sig'))
+            st.download_button("💾 Baixar Backup dos Dados", data=csv, file_name='dados_chefia.csv', mime='text/csv')
 
     if len(df_final) >= 1:
-        ref_pop = df_final['popularidade'].mean()
-        ref_luc = df_final['lucratividade'].mean()
-        
-        df_final['classificacao'] = df_final.apply(lambda x: classificar_produto(x, ref_pop, ref_luc), axis=1)
-
-        # KPIs
+        # KPIs (contagens memorizadas enquanto os dados não mudam)
+        contagens = motor.kpis()
         k1, k2, k3, k4, k5 = st.columns(5)
         k1.metric("Itens", len(df_final))
-        k2.metric("⭐ Estrelas", len(df_final[df_final['classificacao']=='⭐ Estrela']))
-        k3.metric("💎 Oportunidades", len(df_final[df_final['classificacao']=='💎 Oportunidade']))
-        k4.metric("⚠️ Críticos", len(df_final[df_final['classificacao']=='⚠️ Crítico']))
-        k5.metric("🛒 Populares", len(df_final[df_final['classificacao']=='🛒 Popular']))
-
-        # Gráfico
-        fig_sim = px.scatter(
-            df_final, x="popularidade", y="lucratividade", color="classificacao",
-            size="popularidade", hover_name="produto_nome", text="produto_nome",
-            color_discrete_map=CORES_MATRIZ, template="plotly_white", title="Matriz de Engenharia de Menu"
-        )
-        fig_sim.add_vline(x=ref_pop, line_dash="dash", line_color="gray", annotation_text="Média Pop.")
-        fig_sim.add_hline(y=ref_luc, line_dash="dash", line_color="gray", annotation_text="Média Lucro")
-        fig_sim.update_traces(textposition='top center')
-        st.plotly_chart(fig_sim, use_container_width=True)
+        k2.metric("⭐ Estrelas", contagens.get('⭐ Estrela', 0))
+        k3.metric("💎 Oportunidades", contagens.get('💎 Oportunidade', 0))
+        k4.metric("⚠️ Críticos", contagens.get('⚠️ Crítico', 0))
+        k5.metric("🛒 Populares", contagens.get('🛒 Popular', 0))
+
+        # Gráfico (src/graficos.py): WebGL e rótulos limitados em cardápios grandes, densidade nos enormes
+        busca_grafico, foco_quadrante = None, None
+        if len(df_final) > LIMIAR_WEBGL:
+            g1, g2 = st.columns(2)
+            busca_grafico = g1.text_input("🔎 Destacar produtos no gráfico:", placeholder="Ex: pastel") or None
+            foco_quadrante = g2.selectbox("Foco no quadrante:", ["Nenhum"] + QUADRANTES)
+            foco_quadrante = None if foco_quadrante == "Nenhum" else foco_quadrante
+
+        with medir('grafico.figura', pontos=len(df_final)):
+            # Mesma figura entre reruns enquanto dados, busca e foco não mudam
+            fig_sim = motor.memo(
+                'figura_matriz',
+                lambda: montar_matriz(df_final, ref_pop, ref_luc, CORES_MATRIZ, busca=busca_grafico, quadrante=foco_quadrante),
+                busca_grafico, foco_quadrante
+            )
+        with medir('grafico.render', pontos=len(df_final)):
+            st.plotly_chart(fig_sim, use_container_width=True)
+
+        # --- SIMULADOR DE PREÇOS (src/simulacao.py) ---
+        with st.expander("🧪 Simulador de Preços: e se eu mudar o preço?", expanded=False):
+            # O Streamlit executa o corpo do expander mesmo fechado: sem o toggle a simulação rodaria em todo rerun
+            if st.toggle("Simular", value=False, key='simulador_ativo'):
+                s1, s2 = st.columns([3, 1])
+                itens_sim = s1.multiselect("Itens a reajustar (vazio = cardápio inteiro):", df_final['produto_nome'].astype(str).tolist())
+                unidade_sim = s2.radio("Reajuste em", ["R$", "%"], horizontal=True)
+                if unidade_sim == "R$":
+                    modo_sim, grade_sim = 'absoluto', np.round(np.linspace(-5, 5, 201), 2)
+                    variacao_sim = st.slider("Variação de preço (R$):", -5.0, 5.0, 0.5, 0.1)
+                else:
+                    modo_sim, grade_sim = 'percentual', np.linspace(-0.3, 0.3, 121)
+                    variacao_sim = st.slider("Variação de preço (%):", -30, 30, 5, 1) / 100
+
+                e1, e2, e3 = st.columns(3)
+                elast_revenda = e1.slider("Elasticidade da revenda", -3.0, 0.0, ELASTICIDADE_PADRAO['revenda'], 0.1,
+                                          help="Quanto a quantidade vendida cai (%) a cada 1% de aumento. Latas, água e long necks quase não reagem.")
+                elast_producao = e2.slider("Elasticidade da produção", -3.0, 0.0, ELASTICIDADE_PADRAO['producao'], 0.1,
+                                           help="Pratos feitos na casa têm substitutos no próprio cardápio: reagem mais ao preço.")
+                incerteza_sim = e3.slider("Incerteza da demanda (%)", 0, 50, 15, 5) / 100
+
+                def simular():
+                    elast_sim = motor.memo('elasticidades_simulacao',
+                                           lambda: elasticidades(df_final, {'revenda': elast_revenda, 'producao': elast_producao}),
+                                           elast_revenda, elast_producao)
+                    alvo_sim = df_final['produto_nome'].astype(str).isin(itens_sim).to_numpy() if itens_sim else None
+                    precos_sim = precos_cenarios(df_final['preco_venda'].to_numpy(), [variacao_sim], alvo_sim, modo_sim)[0]
+                    itens_proj, migracoes_sim = simular_cenario(df_final, precos_sim, elast_sim)
+                    grade_res = simular_grade(df_final, grade_sim, alvo_sim, modo_sim, elast_sim)
+                    mc_sim = monte_carlo(df_final, precos_sim, elast_sim, incerteza_demanda=incerteza_sim, semente=0)
+                    return itens_proj, migracoes_sim, grade_res, mc_sim
+
+                with medir('simulacao', itens=len(df_final)):
+                    # Mensagens do chat e outros reruns não refazem a simulação: só dados novos ou controles mexidos
+                    itens_proj, migracoes_sim, grade_res, mc_sim = motor.memo(
+                        'simulacao', simular, tuple(itens_sim), modo_sim, variacao_sim,
+                        elast_revenda, elast_producao, incerteza_sim
+                    )
+
+                lucro_atual = float((df_final['lucratividade'] * df_final['popularidade']).sum())
+                lucro_proj = float(itens_proj['lucro_total'].sum())
+                receita_atual = float(df_final['receita_total'].sum())
+                receita_proj = float(itens_proj['receita_total'].sum())
+                resumo_mc = mc_sim['resumo']
+                m1, m2, m3, m4 = st.columns(4)
+                m1.metric("Lucro projetado", f"R$ {lucro_proj:,.2f}", f"R$ {lucro_proj - lucro_atual:,.2f}")
+                m2.metric("Receita projetada", f"R$ {receita_proj:,.2f}", f"R$ {receita_proj - receita_atual:,.2f}")
+                m3.metric("Itens que mudam de quadrante", int((itens_proj['classificacao'] != itens_proj['classificacao_projetada']).sum()))
+                m4.metric("Chance de lucrar mais", f"{resumo_mc['prob_lucro_maior']:.0%}")
+                st.caption(
+                    f"🎲 {len(mc_sim['rodadas'])} simulações de demanda: ganho de lucro entre R$ {resumo_mc['delta_lucro_p5']:,.2f} "
+                    f"e R$ {resumo_mc['delta_lucro_p95']:,.2f} (90% dos casos), mediana R$ {resumo_mc['delta_lucro_p50']:,.2f}."
+                )
+
+                st.markdown("**Ganho de lucro por variação de preço**")
+                st.line_chart(grade_res.set_index('variacao')[['delta_lucro', 'delta_receita']])
+
+                c_sim1, c_sim2 = st.columns([1, 2])
+                with c_sim1:
+                    st.markdown("**Movimento entre quadrantes**")
+                    st.dataframe(migracoes_sim, use_container_width=True)
+                with c_sim2:
+                    afetados = itens_proj[(itens_proj['preco_novo'] != itens_proj['preco_venda'])
+                                          | (itens_proj['classificacao'] != itens_proj['classificacao_projetada'])]
+                    st.markdown(f"**Itens afetados ({len(afetados)})**")
+                    st.dataframe(afetados.head(500), hide_index=True, use_container_width=True)
 
         # --- ABAS DE INTELIGÊNCIA ---
         st.markdown("### 🧠 Inteligência Artificial")
@@ -245,26 +513,88 @@ if not edited_df.empty:
         # ABA 1: Relatório
         with tab1:
             st.info(f"Modelo selecionado: **{modelo_selecionado}**")
+            # Pré-análise local do cardápio inteiro (src/preanalise.py): só o resumo dos alertas vai para a IA
+            grafo_receitas = st.session_state.get('receitas')
+            with medir('preanalise') as m:
+                df_analise = motor.memo('preanalise', lambda: preanalisar(
+                    df_final, grafo_receitas.revendas() if grafo_receitas is not None else None
+                ), id(grafo_receitas))
+                m['linhas'] = len(df_analise)
+            sinalizados = df_analise[df_analise['alertas'] != '']
+            with st.expander(f"🔍 Pré-análise local: {len(sinalizados)} de {len(df_analise)} itens com alerta (sem IA)"):
+                contagem = df_analise[list(ALERTAS)].sum()
+                for codigo, descricao in ALERTAS.items():
+                    if contagem[codigo]:
+                        st.caption(f"• {descricao}: {int(contagem[codigo])} itens")
+                st.dataframe(
+                    sinalizados[['produto_nome', 'tipo', 'classificacao', 'preco_venda', 'custo_producao', 'cmv_pct', 'alertas']]
+                    .sort_values('cmv_pct', ascending=False),
+                    hide_index=True, use_container_width=True,
+                    column_config={'cmv_pct': st.column_config.NumberColumn("CMV %", format="%.1f")}
+                )
+
+            relatorio_fatiado = st.toggle(
+                "⚡ Relatório em fatias (paralelo)",
+                help="Analisa cada quadrante ao mesmo tempo e consolida as 3 ações no fim. Mais rápido em cardápios grandes; "
+                     "fatias que demorarem demais ficam de fora."
+            )
             if st.button("💡 Gerar Relatório Automático"):
                 if not api_key_final:
                     st.error("⚠️ Configure a API Key na barra lateral para usar a IA.")
                 else:
-                    with st.spinner(f"Engenheiro de Menu e Consultor trabalhando..."):
-                        try:
-                            # Pega extremos para análise (foca no que importa para economizar tokens)
-                            df_analise = pd.concat([
-                                df_final.sort_values('lucratividade', ascending=False).head(10),
-                                df_final.sort_values('popularidade', ascending=False).head(10),
-                                df_final.sort_values('lucratividade', ascending=True).head(5)
-                            ]).drop_duplicates()
-                            
-                            # CHAMADA DA NOVA FUNÇÃO DO ARQUIVO EXTERNO
-                            # Note a ordem dos argumentos definida em agentedeia.py: (dados, api_key, modelo)
-                            res = executar_analise_menu(df_analise, api_key_final, modelo_selecionado)
-                            
+                    try:
+                        if relatorio_fatiado:
+                            metricas = {}
+                            area_fila = st.empty()
+                            with st.spinner("Engenheiro de Menu analisando cada quadrante..."), medir('llm.relatorio_fatiado', modelo=modelo_selecionado) as m:
+                                relatorio = camada_ia().executar_analise_menu_fatiada(df_analise, api_key_final, modelo_selecionado, metricas=metricas,
+                                                                                     ao_esperar=aviso_fila(area_fila))
+                                m.update(metricas)
+                            area_fila.empty()
+                            for fatia, texto in relatorio['analises'].items():
+                                with st.expander(f"🔎 Análise técnica: {fatia}"):
+                                    st.markdown(limpar_texto_ia(texto))
+                            st.markdown(limpar_texto_ia(relatorio['recomendacoes']))
+                            if metricas.get('do_cache'):
+                                st.caption("⚡ Relatório recuperado do cache (mesmos dados e modelo, sem custo de tokens).")
+                            else:
+                                st.caption(f"⏱️ Fatias em {metricas['analise_s']:.1f}s · consolidação em {metricas['consolidacao_s']:.1f}s · "
+                                           f"total {metricas['total_s']:.1f}s")
+                            if metricas.get('parcial'):
+                                st.warning("Relatório parcial: algumas fatias não responderam a tempo.")
+                            st.dataframe(pd.DataFrame(relatorio['fatias']), hide_index=True, use_container_width=True)
+                        elif usar_streaming:
+                            # Análise técnica aparece num expander; as 3 ações são escritas logo abaixo
+                            metricas = {}
+                            area_analise = st.expander("🔎 Análise técnica do Engenheiro de Menu", expanded=True).empty()
+                            area_acoes = st.empty()
+                            area_fila = st.empty()
+                            textos = {'analise': '', 'recomendacoes': ''}
+                            fluxo = camada_ia().executar_analise_menu_stream(df_analise, api_key_final, modelo_selecionado, metricas=metricas,
+                                                                             ao_esperar=aviso_fila(area_fila))
+                            with st.spinner("Engenheiro de Menu e Consultor trabalhando..."), medir('llm.relatorio_stream', modelo=modelo_selecionado) as m:
+                                for etapa, pedaco in fluxo:
+                                    area_fila.empty()
+                                    textos[etapa] += limpar_texto_ia(pedaco)
+                                    (area_analise if etapa == 'analise' else area_acoes).markdown(textos[etapa])
+                                m.update(metricas)
+                            st.caption(legenda_tempos(metricas))
+                        else:
+                            area_fila = st.empty()
+                            with st.spinner(f"Engenheiro de Menu e Consultor trabalhando..."):
+                                # CHAMADA DA NOVA FUNÇÃO DO ARQUIVO EXTERNO
+                                # Note a ordem dos argumentos definida em agentedeia.py: (dados, api_key, modelo)
+                                res = camada_ia().executar_analise_menu(df_analise, api_key_final, modelo_selecionado,
+                                                                        ao_esperar=aviso_fila(area_fila))
+                            area_fila.empty()
+
+                            if getattr(res, 'do_cache', False):
+                                st.caption("⚡ Relatório recuperado do cache (mesmos dados e modelo, sem custo de tokens).")
                             st.markdown(limpar_texto_ia(res))
-                        except Exception as e:
-                            st.error(f"Erro na IA: {e}")
+                    except FilaCheia as e:
+                        st.warning(f"⏳ {e}")
+                    except Exception as e:
+                        st.error(f"Erro na IA: {e}")
 
         # ABA 2: Chatbot
         with tab2:
@@ -272,33 +602,140 @@ if not edited_df.empty:
             
             if "messages" not in st.session_state:
                 st.session_state.messages = []
+            if "conversa" not in st.session_state:
+                st.session_state.conversa = Conversa()
+
+            c_memoria, c_limpar = st.columns([3, 1])
+            conversa_com_memoria = c_memoria.toggle(
+                "🧠 Lembrar a conversa", value=True,
+                help="Perguntas de continuação ('e desses?', 'compare com o anterior') usam as respostas anteriores. "
+                     "O cardápio vai num prefixo fixo que o provedor reaproveita entre os turnos."
+            )
+            if c_limpar.button("🧹 Nova conversa"):
+                st.session_state.messages = []
+                st.session_state.conversa.limpar()
 
             for message in st.session_state.messages:
                 with st.chat_message(message["role"]):
                     st.markdown(message["content"])
 
             if prompt := st.chat_input("Ex: Qual o produto com maior faturamento total?"):
-                if not api_key_final:
+                # Perguntas numéricas simples são respondidas com pandas sobre o cardápio inteiro (src/consultas.py)
+                inicio_local = time.perf_counter()
+                with medir('chat.consulta_local') as m:
+                    resposta_local = responder_localmente(prompt, df_final)
+                    m['respondida'] = resposta_local is not None
+                tempo_local_ms = (time.perf_counter() - inicio_local) * 1000
+
+                if resposta_local is not None:
+                    st.chat_message("user").markdown(prompt)
+                    st.session_state.messages.append({"role": "user", "content": prompt})
+                    with st.chat_message("assistant", avatar="👨‍🍳"):
+                        resposta = limpar_texto_ia(resposta_local)
+                        st.markdown(resposta)
+                        st.caption(f"🧮 Calculado localmente sobre {len(df_final)} itens em {tempo_local_ms:.0f} ms (sem IA).")
+                    st.session_state.messages.append({"role": "assistant", "content": resposta})
+                    st.session_state.conversa.registrar_turno(prompt, resposta_local)
+                elif not api_key_final:
                     st.error("⚠️ Configure a API Key na barra lateral.")
                 else:
                     st.chat_message("user").markdown(prompt)
                     st.session_state.messages.append({"role": "user", "content": prompt})
 
                     with st.chat_message("assistant", avatar="👨‍🍳"):
-                        with st.spinner("Calculando..."):
-                            try:
-                                # Passa os dados para o chat
-                                df_contexto = df_final.sort_values(by='receita_total', ascending=False).head(60)
-                                
-                                # CHAMADA DA NOVA FUNÇÃO DO ARQUIVO EXTERNO
-                                # Note a ordem dos argumentos: (pergunta, dados, api_key, modelo)
-                                resposta_raw = responder_chat_dados(prompt, df_contexto, api_key_final, modelo_selecionado)
-                                
-                                resposta = limpar_texto_ia(resposta_raw)
-                                
-                                st.markdown(resposta)
-                                st.session_state.messages.append({"role": "assistant", "content": resposta})
-                            except Exception as e:
-                                st.error(f"Erro ao responder: {e}")
+                        try:
+                            indice = motor.memo('indice_produtos', lambda: IndiceProdutos(df_final['produto_nome'].tolist()))
+                            if conversa_com_memoria:
+                                # Cardápio em prefixo fixo por versão dos dados + resumo dos turnos antigos (src/conversa.py)
+                                metricas = {}
+                                area_fila = st.empty()
+                                fluxo = camada_ia().responder_conversa_stream(prompt, st.session_state.conversa, df_final, motor.versao,
+                                                                              api_key_final, modelo_selecionado, metricas=metricas,
+                                                                              ao_esperar=aviso_fila(area_fila), indice=indice)
+                                with medir('llm.conversa', modelo=modelo_selecionado) as m:
+                                    if usar_streaming:
+                                        resposta = st.write_stream(limpar_fluxo_ia(fluxo))
+                                    else:
+                                        with st.spinner("Calculando..."):
+                                            resposta = limpar_texto_ia(''.join(fluxo))
+                                        st.markdown(resposta)
+                                    m.update(metricas)
+                                area_fila.empty()
+                                st.caption(legenda_tempos(metricas))
+                            else:
+                                # Só as linhas relevantes para a pergunta, dentro do orçamento de tokens (src/contexto.py)
+                                with medir('chat.contexto') as m:
+                                    df_contexto = selecionar_contexto(prompt, df_final, orcamento_tokens=orcamento_contexto, indice=indice)
+                                    m.update(linhas=len(df_contexto), de=len(df_final))
+
+                                if usar_streaming:
+                                    metricas = {}
+                                    area_fila = st.empty()
+                                    fluxo = camada_ia().responder_chat_dados_stream(prompt, df_contexto, api_key_final, modelo_selecionado, metricas=metricas,
+                                                                                    ao_esperar=aviso_fila(area_fila))
+                                    with medir('llm.chat_stream', modelo=modelo_selecionado) as m:
+                                        resposta = st.write_stream(limpar_fluxo_ia(fluxo))
+                                        m.update(metricas)
+                                    area_fila.empty()
+                                    st.caption(legenda_tempos(metricas))
+                                else:
+                                    area_fila = st.empty()
+                                    with st.spinner("Calculando..."):
+                                        # CHAMADA DA NOVA FUNÇÃO DO ARQUIVO EXTERNO
+                                        # Note a ordem dos argumentos: (pergunta, dados, api_key, modelo)
+                                        resposta_raw = camada_ia().responder_chat_dados(prompt, df_contexto, api_key_final, modelo_selecionado,
+                                                                                        ao_esperar=aviso_fila(area_fila))
+                                    area_fila.empty()
+
+                                    resposta = limpar_texto_ia(resposta_raw)
+                                    if getattr(resposta_raw, 'do_cache', False):
+                                        st.caption("⚡ Resposta recuperada do cache.")
+                                    st.markdown(resposta)
+
+                            st.session_state.messages.append({"role": "assistant", "content": resposta})
+                        except FilaCheia as e:
+                            st.warning(f"⏳ {e}")
+                        except Exception as e:
+                            st.error(f"Erro ao responder: {e}")
 else:
-    st.info("👆 Adicione pratos manualmente ou importe um CSV para começar a análise.")
\ No newline at end of file
+    st.info("👆 Adicione pratos manualmente ou importe um CSV para começar a análise.")
+
+# ==============================================================================
+# PAINEL DE DIAGNÓSTICO (SIDEBAR)
+# ==============================================================================
+coletor = st.session_state.instrumentacao.execucoes[-1] if diagnostico_ativo and st.session_state.instrumentacao.execucoes else None
+if coletor is not None:
+    with st.sidebar.expander("📊 Diagnóstico desta interação", expanded=True):
+        d1, d2 = st.columns(2)
+        d1.metric("Rerun", f"{coletor.duracao_ms():.0f} ms")
+        d2.metric("Memória", f"{memoria_mb():.0f} MB", f"{memoria_mb() - coletor.memoria_inicial_mb:+.1f} MB")
+
+        df_etapas = coletor.etapas()
+        if not df_etapas.empty:
+            colunas = [c for c in ['nome', 'duracao_ms', 'memoria_delta_mb', 'linhas'] if c in df_etapas.columns]
+            st.dataframe(df_etapas[colunas].sort_values('duracao_ms', ascending=False), hide_index=True, use_container_width=True)
+
+        if ia_sob_demanda.tempo_importacao_s is not None:
+            st.caption(f"🧠 Camada de IA importada em {ia_sob_demanda.tempo_importacao_s:.2f}s")
+        tokens = coletor.tokens()
+        if tokens['prompt'] or tokens['completion']:
+            st.caption(f"🔤 Tokens: {tokens['prompt']} de entrada · {tokens['completion']} de saída")
+        for nome, (acertos, faltas, taxa) in sorted(coletor.taxas_cache().items()):
+            st.caption(f"🗄️ {nome}: {acertos} acertos / {faltas} faltas ({taxa:.0%})")
+        if coletor.contadores.get('cache_ia.erro'):
+            st.caption(f"⚠️ cache_ia: {coletor.contadores['cache_ia.erro']} erros de SQLite (contados como faltas)")
+        for provedor, e in agendador_ia.estatisticas().items():
+            st.caption(f"🚦 IA {provedor}: {e['em_execucao']}/{e['concorrencia']} em execução · {e['na_fila']} na fila · "
+                       f"{e['retentativas']} retentativas · {e['coalescidos']} coalescidos")
+
+        st.download_button(
+            "⬇️ Exportar medições (JSONL)", data=st.session_state.instrumentacao.exportar_jsonl(),
+            file_name='chefia_diagnostico.jsonl', mime='application/json'
+        )
+
+# Página já desenhada: importa a camada de IA em segundo plano (uma vez por processo)
+if aquecer_ia:
+    aquecer_em_segundo_plano()
+
+# Fim do rerun: grava as medições agora (o próximo rerun roda em outra thread)
+st.session_state.instrumentacao.encerrar_execucao()
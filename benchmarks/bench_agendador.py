@@ -0,0 +1,118 @@
+"""
+Carga no agendador de chamadas de LLM (src/agendador.py) contra o servidor falso (benchmarks/llm_falso.py).
+
+Várias sessões simultâneas fazem perguntas ao mesmo "provedor", que responde 429 acima de N chamadas
+ao mesmo tempo (e, opcionalmente, ao acaso). Compara chamar o litellm direto, como cada sessão fazia,
+com passar pelo agendador: taxa de sucesso, latência p50/p95, pico de chamadas no servidor,
+retentativas e chamadas coalescidas (perguntas repetidas em voo).
+
+    python benchmarks/bench_agendador.py [--sessoes 40] [--pedidos 3] [--limite 4] [--taxa-429 0.05] [--fluxo]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LITELLM_LOCAL_MODEL_COST_MAP', 'True')
+
+from benchmarks.llm_falso import ConfiguracaoFalsa, iniciar_servidor  # noqa: E402
+from src.agendador import Agendador, estimar_tokens  # noqa: E402
+
+import litellm  # noqa: E402
+import numpy as np  # noqa: E402
+
+litellm.suppress_debug_info = True
+
+MODELO = 'openai/falso'
+
+
+def _chamada(api_base, pergunta, fluxo):
+    mensagens = [{'role': 'user', 'content': pergunta}]
+    # max_retries=0: as retentativas do SDK ficam de fora para a comparação medir só o agendador
+    if not fluxo:
+        return lambda: litellm.completion(model=MODELO, messages=mensagens, api_key='falsa', api_base=api_base,
+                                          max_retries=0)
+    return lambda: litellm.completion(model=MODELO, messages=mensagens, api_key='falsa', api_base=api_base,
+                                      max_retries=0, stream=True, stream_options={'include_usage': True})
+
+
+def _perguntas(n_sessoes, n_pedidos, taxa_repetidas, semente=0):
+    # Parte das perguntas se repete entre sessões (ex: "qual o prato mais vendido?")
+    rng = np.random.default_rng(semente)
+    return [[f"Pergunta frequente {rng.integers(5)}" if rng.random() < taxa_repetidas else f"Pergunta {s}-{i}"
+             for i in range(n_pedidos)] for s in range(n_sessoes)]
+
+
+def rodar(modo, perguntas, api_base, cfg, limite, fluxo):
+    cfg.pico_em_andamento = 0
+    cfg.recusadas_429 = 0
+    cfg.requisicoes = 0
+    agendador = Agendador(limites={'openai': (limite, 10_000_000)}, fila_maxima=1_000,
+                          espera_base=0.2, espera_maxima=2.0)
+    latencias, erros = [], []
+    lock = threading.Lock()
+
+    def sessao(lista):
+        for pergunta in lista:
+            chamada = _chamada(api_base, pergunta, fluxo)
+            inicio = time.perf_counter()
+            try:
+                if modo == 'direto':
+                    resposta = chamada()
+                    if fluxo:
+                        list(resposta)
+                elif fluxo:
+                    list(agendador.transmitir(MODELO, chamada, estimar_tokens(pergunta), chave=pergunta))
+                else:
+                    agendador.executar(MODELO, chamada, estimar_tokens(pergunta), chave=pergunta)
+                with lock:
+                    latencias.append(time.perf_counter() - inicio)
+            except Exception as e:
+                with lock:
+                    erros.append(type(e).__name__)
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=sessao, args=(lista,)) for lista in perguntas]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    total = time.perf_counter() - inicio
+
+    n = sum(len(lista) for lista in perguntas)
+    p50, p95 = (np.percentile(latencias, [50, 95]) if latencias else (float('nan'), float('nan')))
+    linha = (f"{modo:<10} sucesso {len(latencias) / n:6.1%} | p50 {p50:5.2f}s p95 {p95:5.2f}s | total {total:5.1f}s | "
+             f"chamadas ao servidor {cfg.requisicoes:4d} (429: {cfg.recusadas_429:3d}) | pico simultâneas "
+             f"{cfg.pico_em_andamento:3d}")
+    if modo == 'agendador':
+        e = agendador.estatisticas()['openai']
+        linha += (f" | retentativas {e['retentativas']} · coalescidos {e['coalescidos']} · "
+                  f"espera média na fila {e['espera_total_s'] / max(e['concluidos'] + e['falhas'], 1):.2f}s")
+    print(linha)
+    if erros:
+        print(f"{'':<10} erros: " + ', '.join(f"{nome} x{erros.count(nome)}" for nome in sorted(set(erros))))
+    return latencias
+
+
+def executar(n_sessoes, n_pedidos, limite, taxa_429, taxa_repetidas, fluxo):
+    cfg = ConfiguracaoFalsa(atraso_inicial=0.3, atraso_token=0.005, taxa_429=taxa_429, limite_simultaneas=limite)
+    _, cfg, api_base = iniciar_servidor(cfg=cfg)
+    perguntas = _perguntas(n_sessoes, n_pedidos, taxa_repetidas)
+    print(f"{n_sessoes} sessões x {n_pedidos} pedidos | provedor aceita {limite} simultâneas "
+          f"(+{taxa_429:.0%} de 429 ao acaso) | {'streaming' if fluxo else 'sem streaming'}")
+    for modo in ('direto', 'agendador'):
+        rodar(modo, perguntas, api_base, cfg, limite, fluxo)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessoes', type=int, default=40)
+    parser.add_argument('--pedidos', type=int, default=3)
+    parser.add_argument('--limite', type=int, default=4, help="chamadas simultâneas aceitas pelo provedor falso")
+    parser.add_argument('--taxa-429', type=float, default=0.05)
+    parser.add_argument('--repetidas', type=float, default=0.3, help="fração de perguntas repetidas entre sessões")
+    parser.add_argument('--fluxo', action='store_true', help="usa streaming")
+    args = parser.parse_args()
+    executar(args.sessoes, args.pedidos, args.limite, args.taxa_429, args.repetidas, args.fluxo)
@@ -0,0 +1,118 @@
+"""
+Banco local (src/banco.py, DuckDB ou SQLite) vs estado só na sessão + CSV de backup e histórico em Parquet.
+
+Mede o início de uma sessão nova (reimportar o backup vs ler o cardápio do banco), o custo de gravar
+o cardápio após uma edição, o CSV de backup que antes era gerado a cada rerun e as consultas do
+histórico de vendas (períodos, vendas de um mês, comparação entre meses, ano inteiro de 2 lojas).
+Confere também que exportações em latin1 e em UTF-8 entram no histórico como os mesmos produtos.
+
+    python benchmarks/bench_banco.py [--itens 50000] [--meses 12] [--linhas-mes 200000]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_consultas import cardapio_sintetico  # noqa: E402
+from benchmarks.dados_sinteticos import gerar_vendas  # noqa: E402
+from src.banco import DUCKDB_DISPONIVEL, BancoLocal  # noqa: E402
+from src.historico import HistoricoVendas  # noqa: E402
+from src.importacao import combinar, importar_arquivos  # noqa: E402
+from src.sessao import COLUNAS_CARDAPIO, tipar  # noqa: E402
+
+USUARIO = 'bench'
+
+
+def _tempo(funcao, repeticoes=5):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000
+
+
+def _reimportar(caminho):
+    with open(caminho, 'rb') as f:
+        return tipar(combinar(importar_arquivos([f])))
+
+
+def _sessao(diretorio, n_itens, motores):
+    tabela = tipar(cardapio_sintetico(n_itens)[COLUNAS_CARDAPIO])
+    backup = os.path.join(diretorio, 'dados_chefia.csv')
+    gerar_backup = lambda: tabela.to_csv(index=False, sep=';', decimal=',').encode('utf-8-sig')   # noqa: E731
+    with open(backup, 'wb') as f:
+        f.write(gerar_backup())
+
+    print(f"\nSessão nova com {n_itens:,} itens")
+    print(f"  {'reimportar backup CSV':<34}{_tempo(lambda: _reimportar(backup)):9.1f} ms")
+    for motor in motores:
+        banco = BancoLocal(os.path.join(diretorio, f'sessao.{motor}'), motor).iniciar()
+        banco.salvar_cardapio(USUARIO, tabela)
+        carregar = _tempo(lambda: tipar(banco.carregar_cardapio(USUARIO)))
+        salvar = _tempo(lambda: banco.salvar_cardapio(USUARIO, tabela), repeticoes=3)
+        print(f"  {f'carregar do banco ({motor})':<34}{carregar:9.1f} ms | gravar após edição {salvar:7.1f} ms")
+    print(f"  {'CSV de backup a cada rerun (antes)':<34}{_tempo(gerar_backup):9.1f} ms -> 0 ms (só quando pedido)")
+
+
+def _historico(diretorio, meses, linhas_mes, motores):
+    arquivos = [gerar_vendas(os.path.join(diretorio, f'produtosdevenda-2025-{m:02d}-01.csv'), linhas_mes,
+                             n_produtos=5_000, semente=m) for m in range(1, meses + 1)]
+    fontes = {'parquet (HistoricoVendas)': HistoricoVendas(os.path.join(diretorio, 'historico'))}
+    fontes.update({f'banco ({m})': BancoLocal(os.path.join(diretorio, f'historico.{m}'), m).iniciar() for m in motores})
+
+    print(f"\nHistórico: {meses} exportações de {linhas_mes:,} linhas (5 lojas, 5.000 produtos)")
+    print(f"  {'fonte':<28}{'ingestão':>10}{'períodos':>10}{'1 mês':>10}{'comparar':>10}{'ano, 2 lojas':>14}")
+    for nome, fonte in fontes.items():
+        inicio = time.perf_counter()
+        for arquivo in arquivos:
+            fonte.ingerir(arquivo)
+        ingestao = time.perf_counter() - inicio
+        periodos = fonte.periodos()
+        a, b = periodos[-2], periodos[-1]
+        t_periodos = _tempo(fonte.periodos)
+        t_mes = _tempo(lambda: fonte.vendas_periodo(b, b))
+        t_comparar = _tempo(lambda: fonte.comparar_periodos(a, b))
+        t_ano = _tempo(lambda: fonte.vendas_periodo(periodos[0], b, ['LOJA 01', 'LOJA 02']))
+        print(f"  {nome:<28}{ingestao:9.2f}s{t_periodos:8.1f}ms{t_mes:8.1f}ms{t_comparar:8.1f}ms{t_ano:12.1f}ms")
+
+
+def _encodings(diretorio, motores):
+    # A mesma exportação salva em latin1 (PDV) e em UTF-8 (planilha salva de novo) tem de virar os mesmos produtos
+    texto = ('PRODUTO DE VENDA;UNIDADE;VENDA DE FRENTE DE LOJA;VENDA DELIVERY;RECEITA FRENTE DE LOJA;RECEITA DELIVERY\n'
+             'AÇAÍ 300ML;LOJA 01;"1.000";5;"10.000,00";"50,00"\nPÃO DE QUEIJO;LOJA 01;10;0;"35,00";0\n')
+    arquivos = []
+    for dia, encoding in ((1, 'latin1'), (2, 'utf-8')):
+        caminho = os.path.join(diretorio, f'produtosdevenda-2024-01-0{dia}.csv')
+        with open(caminho, 'w', encoding=encoding) as f:
+            f.write(texto)
+        arquivos.append(caminho)
+    fontes = {'parquet': HistoricoVendas(os.path.join(diretorio, 'historico_encoding'))}
+    fontes.update({m: BancoLocal(os.path.join(diretorio, f'encoding.{m}'), m).iniciar() for m in motores})
+    for nome, fonte in fontes.items():
+        for arquivo in arquivos:
+            fonte.ingerir(arquivo)
+        produtos = sorted(fonte.vendas_periodo('2024-01', '2024-01')['produto_nome'])
+        assert produtos == ['AÇAÍ 300ML', 'PÃO DE QUEIJO'], f"{nome}: encoding mal lido na ingestão ({produtos})"
+    print(f"\nExportações latin1 e UTF-8 ingeridas como os mesmos produtos em: {', '.join(fontes)}")
+
+
+def executar(n_itens, meses, linhas_mes):
+    motores = (['duckdb'] if DUCKDB_DISPONIVEL else []) + ['sqlite']
+    with tempfile.TemporaryDirectory() as diretorio:
+        _sessao(diretorio, n_itens, motores)
+        _historico(diretorio, meses, linhas_mes, motores)
+        _encodings(diretorio, motores)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--itens', type=int, default=50_000)
+    parser.add_argument('--meses', type=int, default=12)
+    parser.add_argument('--linhas-mes', type=int, default=200_000)
+    args = parser.parse_args()
+    executar(args.itens, args.meses, args.linhas_mes)
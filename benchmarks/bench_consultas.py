@@ -0,0 +1,177 @@
+"""
+Corpus de perguntas do chat "Perguntar aos Dados" para medir o roteador local (src/consultas.py).
+
+Cada pergunta traz a resposta esperada (trechos calculados direto com pandas, que a resposta local
+precisa conter) ou 'ia' quando ela deve ir para a IA. Relata acertos (rota e conteúdo), cobertura
+local e latência por pergunta.
+
+    python benchmarks/bench_consultas.py [--itens 5000]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.consultas import LIMITE_LISTA, formatar_valor, responder_localmente  # noqa: E402
+from src.engenharia import classificar_menu  # noqa: E402
+
+ESTRELA, CRITICO, OPORTUNIDADE, POPULAR = '⭐ Estrela', '⚠️ Crítico', '💎 Oportunidade', '🛒 Popular'
+
+
+# --- RESPOSTAS ESPERADAS ---
+# Cada uma recebe o cardápio e devolve os trechos que a resposta local precisa conter, calculados
+# aqui direto com pandas (sem passar pelo roteador)
+def _base(df, palavras=(), quadrante=None):
+    mascara = pd.Series(True, index=df.index)
+    for palavra in palavras:
+        mascara &= df['produto_nome'].str.contains(palavra, regex=False)
+    if quadrante is not None:
+        mascara &= df['classificacao'] == quadrante
+    return df[mascara]
+
+
+def _item(coluna, maior=True, quadrante=None):
+    def esperado(df):
+        base = _base(df, quadrante=quadrante)
+        posicao = base[coluna].idxmax() if maior else base[coluna].idxmin()
+        return [f"**{base.loc[posicao, 'produto_nome']}**"]
+    return esperado
+
+
+def _top(coluna, n, maior=True):
+    return lambda df: [f"**{nome}**" for nome in df.sort_values(coluna, ascending=not maior, kind='stable')
+                       .head(n)['produto_nome']]
+
+
+def _contagem(palavras=(), quadrante=None):
+    return lambda df: [f"**{len(_base(df, palavras, quadrante))}**"]
+
+
+def _media(coluna, palavras=(), quadrante=None):
+    return lambda df: [formatar_valor(_base(df, palavras, quadrante)[coluna].astype('float64').mean(), coluna)]
+
+
+def _total(coluna, palavras=()):
+    return lambda df: [formatar_valor(_base(df, palavras)[coluna].astype('float64').sum(), coluna)]
+
+
+def _consulta_item(palavras):
+    # Até LIMITE_LISTA itens a resposta lista cada um; acima disso vem o resumo com a contagem
+    def esperado(df):
+        base = _base(df, palavras)
+        if len(base) <= LIMITE_LISTA:
+            return [f"**{nome}**" for nome in base['produto_nome']]
+        return [f"{len(base)} itens"]
+    return esperado
+
+
+CORPUS = [
+    ("Qual o produto com maior faturamento total?", _item('receita_total')),
+    ("qual o produto com maior faturamento?", _item('receita_total')),
+    ("Qual item vende mais?", _item('popularidade')),
+    ("Qual é o produto mais vendido?", _item('popularidade')),
+    ("qual o produto menos vendido", _item('popularidade', maior=False)),
+    ("Qual o prato mais lucrativo?", _item('lucratividade')),
+    ("Qual item tem a pior margem?", _item('lucratividade', maior=False)),
+    ("Qual o produto mais caro?", _item('preco_venda')),
+    ("Qual o produto mais barato do cardápio?", _item('preco_venda', maior=False)),
+    ("Qual o item com maior custo?", _item('custo_producao')),
+    ("Top 5 mais vendidos", _top('popularidade', 5)),
+    ("top 10 produtos por faturamento", _top('receita_total', 10)),
+    ("Quais os 3 itens com menor lucro?", _top('lucratividade', 3, maior=False)),
+    ("Quantos itens críticos eu tenho?", _contagem(quadrante=CRITICO)),
+    ("quantas estrelas tem no cardápio?", _contagem(quadrante=ESTRELA)),
+    ("Quantas oportunidades?", _contagem(quadrante=OPORTUNIDADE)),
+    ("Quantos itens populares?", _contagem(quadrante=POPULAR)),
+    ("Quantos produtos tenho?", _contagem()),
+    ("Quais são os itens críticos?", _contagem(quadrante=CRITICO)),
+    ("Liste as estrelas", _contagem(quadrante=ESTRELA)),
+    ("Margem média do pastel", _media('lucratividade', ['PASTEL'])),
+    ("Qual o preço médio do cardápio?", _media('preco_venda')),
+    ("Qual o faturamento total?", _total('receita_total')),
+    ("Quantas vendas no total?", _total('popularidade')),
+    ("Qual o custo médio dos itens críticos?", _media('custo_producao', quadrante=CRITICO)),
+    ("Qual o preço do pastel de carne?", _consulta_item(['PASTEL', 'CARNE'])),
+    ("Faturamento total do pastel", _total('receita_total', ['PASTEL'])),
+    ("Qual a estrela mais vendida?", _item('popularidade', quadrante=ESTRELA)),
+    ("Qual oportunidade tem maior margem?", _item('lucratividade', quadrante=OPORTUNIDADE)),
+    ("Quantos itens de pastel eu tenho?", _contagem(['PASTEL'])),
+    ("Como posso melhorar a margem dos pastéis?", 'ia'),
+    ("O que devo fazer com os itens críticos?", 'ia'),
+    ("Vale a pena tirar o refrigerante do cardápio?", 'ia'),
+    ("Me dê ideias de combos para aumentar o ticket médio", 'ia'),
+    ("Por que o pastel de frango vende tanto?", 'ia'),
+    ("Sugira uma estratégia para as oportunidades", 'ia'),
+    ("Explique a matriz de engenharia de menu", 'ia'),
+    ("Qual a sua opinião sobre o cardápio?", 'ia'),
+    ("Compare a lucratividade entre pastéis e bebidas", 'ia'),
+    ("Escreva um post de Instagram para a estrela", 'ia'),
+    # Filtro numérico, período, canal ou palavras que as regras não cobrem: a resposta local erraria
+    ("quantos pastéis vendi?", 'ia'),
+    ("quais itens custam mais de 10 reais?", 'ia'),
+    ("Itens com preço entre 10 e 20 reais", 'ia'),
+    ("faturamento dos 2 últimos meses", 'ia'),
+    ("Qual o mais vendido no delivery?", 'ia'),
+    ("Qual o faturamento de ontem?", 'ia'),
+    ("Qual o preço do pastel de carne seca?", 'ia'),
+    ("Qual o lucro médio das bebidas?", 'ia'),
+]
+
+
+def cardapio_sintetico(n_itens, semente=42):
+    rng = np.random.default_rng(semente)
+    base = ['PASTEL DE CARNE', 'PASTEL DE FRANGO', 'PASTEL DE QUEIJO', 'COCA-COLA LATA', 'SUCO DE LARANJA',
+            'HAMBURGUER', 'BATATA FRITA', 'AGUA MINERAL', 'RISOTO', 'BROWNIE']
+    nomes = [f"{base[i % len(base)]} {i // len(base) + 1}" for i in range(n_itens)]
+    custo = rng.uniform(1, 25, n_itens).round(2)
+    df = pd.DataFrame({
+        'produto_nome': nomes,
+        'custo_producao': custo,
+        'preco_venda': (custo * rng.uniform(1.2, 4.0, n_itens)).round(2),
+        'popularidade': rng.integers(1, 800, n_itens),
+    })
+    df['lucratividade'] = df['preco_venda'] - df['custo_producao']
+    df['receita_total'] = df['preco_venda'] * df['popularidade']
+    df['classificacao'], _, _ = classificar_menu(df)
+    return df
+
+
+def executar(n_itens):
+    df = cardapio_sintetico(n_itens)
+    acertos, locais, tempos, erros = 0, 0, [], []
+    for pergunta, esperado in CORPUS:
+        inicio = time.perf_counter()
+        resposta = responder_localmente(pergunta, df)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        locais += resposta is not None
+        if esperado == 'ia':
+            problema = None if resposta is None else "deveria ir para a IA"
+        elif resposta is None:
+            problema = "foi para a IA"
+        else:
+            faltando = [trecho for trecho in esperado(df) if trecho not in resposta]
+            problema = f"resposta sem {', '.join(faltando)}" if faltando else None
+        if problema is None:
+            acertos += 1
+        else:
+            erros.append((pergunta, problema, resposta))
+
+    esperados_locais = sum(1 for _, e in CORPUS if e != 'ia')
+    print(f"Cardápio: {n_itens} itens | perguntas: {len(CORPUS)}")
+    print(f"Respostas corretas (rota e conteúdo): {acertos}/{len(CORPUS)} ({acertos / len(CORPUS):.0%})")
+    print(f"Respondidas localmente: {locais} (esperado {esperados_locais})")
+    print(f"Latência local: mediana {statistics.median(tempos):.2f} ms | máx {max(tempos):.2f} ms")
+    for pergunta, problema, resposta in erros:
+        print(f"  ✗ {pergunta!r}: {problema}" + (f" -> {resposta[:120]!r}" if resposta else ''))
+    return acertos / len(CORPUS)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--itens', type=int, default=5000)
+    executar(parser.parse_args().itens)
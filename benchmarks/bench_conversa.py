@@ -0,0 +1,92 @@
+"""
+"Perguntar aos Dados" em vários turnos: chat sem memória (contexto selecionado a cada pergunta, como hoje)
+vs conversa com prefixo estável e resumo (responder_conversa_stream, src/conversa.py).
+
+Roda contra o servidor falso (benchmarks/llm_falso.py) com cache de prefixo ligado: tokens de prompt
+já vistos no início da conversa não pagam processamento, como nos provedores reais. Mede por turno os
+tokens de entrada, quantos vieram do cache e a latência. Precisa do crewai instalado (src/agentedeia.py).
+
+    python benchmarks/bench_conversa.py [--itens 300] [--atraso-prompt-token 0.0003]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LITELLM_LOCAL_MODEL_COST_MAP', 'True')
+
+from benchmarks.bench_consultas import cardapio_sintetico  # noqa: E402
+from benchmarks.llm_falso import ConfiguracaoFalsa, iniciar_servidor  # noqa: E402
+from src.contexto import IndiceProdutos, selecionar_contexto  # noqa: E402
+from src.conversa import Conversa  # noqa: E402
+
+MODELO = 'openai/falso'
+PERGUNTAS = [
+    "Quais pratos dão mais lucro?",
+    "E desses, qual vende menos?",
+    "Quanto eu ganharia aumentando o preço dele em R$ 2,00?",
+    "Compare com o risoto mais vendido.",
+    "Qual a margem média das bebidas?",
+    "E se eu tirar a pior delas do cardápio?",
+    "Resuma o que conversamos em 3 ações.",
+    "Qual delas faço primeiro?",
+]
+
+
+def _turnos(agentedeia, df, modo):
+    conversa, indice, linhas = Conversa(), IndiceProdutos(df['produto_nome'].tolist()), []
+    for pergunta in PERGUNTAS:
+        metricas = {}
+        if modo == 'sem memória':
+            fluxo = agentedeia.responder_chat_dados_stream(pergunta, selecionar_contexto(pergunta, df, indice=indice),
+                                                           'falsa', MODELO, usar_cache=False, metricas=metricas)
+        else:
+            fluxo = agentedeia.responder_conversa_stream(pergunta, conversa, df, 1, 'falsa', MODELO, usar_cache=False,
+                                                         metricas=metricas, indice=indice)
+        inicio = time.perf_counter()
+        for _ in fluxo:
+            pass
+        entrada = metricas.get('tokens_entrada') or 0
+        linhas.append((entrada, entrada - (metricas.get('tokens_em_cache') or 0), metricas.get('ttft_s', 0),
+                       time.perf_counter() - inicio))
+    return linhas
+
+
+def executar(n_itens, atraso_prompt_token):
+    try:
+        import src.agentedeia as agentedeia
+    except ImportError as e:
+        print(f"Camada de IA indisponível ({e}); instale o requirements.txt.")
+        return
+    import litellm
+    litellm.suppress_debug_info = True
+
+    cfg = ConfiguracaoFalsa(atraso_inicial=0.2, atraso_token=0.002, cache_prefixo=True,
+                            atraso_prompt_token=atraso_prompt_token)
+    _, cfg, agentedeia.API_BASE = iniciar_servidor(cfg=cfg)
+    df = cardapio_sintetico(n_itens)
+
+    print(f"{n_itens} itens, {len(PERGUNTAS)} turnos")
+    print(f"{'modo':<14}{'turno':>6}{'entrada':>9}{'fora do cache':>15}{'1º token':>10}{'total':>8}")
+    resumo = {}
+    for modo in ('sem memória', 'com memória'):
+        linhas = _turnos(agentedeia, df, modo)
+        for i, (entrada, novos, ttft, total) in enumerate(linhas, 1):
+            print(f"{modo:<14}{i:>6}{entrada:>9,}{novos:>15,}{ttft:>9.2f}s{total:>7.2f}s")
+        # Só os turnos de continuação: o 1º da conversa sempre paga o prefixo inteiro
+        seguintes = linhas[1:]
+        resumo[modo] = (statistics.mean(l[1] for l in seguintes), statistics.mean(l[2] for l in seguintes))
+    (novos_a, ttft_a), (novos_b, ttft_b) = resumo['sem memória'], resumo['com memória']
+    print(f"\nContinuações (turnos 2+): tokens fora do cache {novos_a:,.0f} -> {novos_b:,.0f} "
+          f"({1 - novos_b / novos_a:.0%} menos) | 1º token {ttft_a:.2f}s -> {ttft_b:.2f}s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--itens', type=int, default=300)
+    parser.add_argument('--atraso-prompt-token', type=float, default=0.0003,
+                        help="segundos por token de prompt fora do cache (prefill)")
+    args = parser.parse_args()
+    executar(args.itens, args.atraso_prompt_token)
@@ -0,0 +1,112 @@
+"""
+Tempo de inicialização a frio do app: imports do caminho do painel com e sem a camada de IA.
+
+Cada medição roda num processo Python novo (sem módulos em cache). "antes" reproduz o app.py
+antigo, que importava src.agentedeia no topo; "painel" é o caminho atual até desenhar o dashboard;
+"ia" é o custo pago sob demanda no primeiro relatório/pergunta (ou no aquecimento em segundo plano).
+
+    python benchmarks/bench_inicializacao.py [--repeticoes 5] [--salvar-baseline]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CAMINHO_BASELINE = os.path.join(RAIZ, 'benchmarks', 'baseline_inicializacao.json')
+TOLERANCIA = 1.5
+
+# Mesmos imports do topo do app.py (streamlit/dotenv entram quando instalados)
+MODULOS_PAINEL = [
+    'pandas', 'streamlit', 'dotenv', 'src.ia_sob_demanda', 'src.incremental', 'src.consultas', 'src.contexto',
+    'src.historico', 'src.importacao', 'src.graficos', 'src.simulacao', 'src.engenharia', 'src.sessao',
+    'src.instrumentacao', 'src.preanalise', 'src.agendador', 'src.banco',
+]
+MODULO_IA = 'src.agentedeia'
+
+
+def _importaveis(modulos):
+    # Descarta módulos cujas dependências não estão instaladas neste ambiente (ex: plotly, crewai)
+    codigo = (
+        "import importlib, sys\n"
+        f"for m in {modulos!r}:\n"
+        "    try: importlib.import_module(m); print('ok', m)\n"
+        "    except ImportError as e: print('falta', m, e.name)\n"
+    )
+    ambiente = {**os.environ, 'LITELLM_LOCAL_MODEL_COST_MAP': 'True'}
+    r = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, env=ambiente, capture_output=True, text=True)
+    ok, faltando = [], []
+    for linha in r.stdout.splitlines():
+        partes = linha.split()
+        (ok if partes[0] == 'ok' else faltando).append(partes[1] if partes[0] == 'ok' else f"{partes[1]} (sem {partes[2]})")
+    return ok, faltando
+
+
+def _medir_import(modulos, repeticoes):
+    codigo = (
+        "import time, importlib; t = time.perf_counter()\n"
+        f"for m in {modulos!r}: importlib.import_module(m)\n"
+        "print(time.perf_counter() - t)"
+    )
+    # Sem baixar a tabela de preços dos modelos no import do litellm (rede distorce a medição)
+    ambiente = {**os.environ, 'LITELLM_LOCAL_MODEL_COST_MAP': 'True'}
+    tempos = []
+    for _ in range(repeticoes):
+        r = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, env=ambiente, capture_output=True, text=True)
+        if r.returncode != 0:
+            return None, r.stderr.strip().splitlines()[-1] if r.stderr.strip() else 'falhou'
+        tempos.append(float(r.stdout.strip().splitlines()[-1]))
+    return statistics.median(tempos), None
+
+
+def executar(repeticoes):
+    painel, faltando = _importaveis(MODULOS_PAINEL)
+    ia, faltando_ia = _importaveis([MODULO_IA])
+    if not ia:
+        # Sem crewai, mede o que existe da pilha de IA (litellm) como limite inferior
+        ia, _ = _importaveis(['litellm'])
+    cenarios = {
+        'painel': painel,
+        'ia': ia,
+        'antes': ia + painel,
+    }
+    resultados = {'modulos_ia': ia}
+    print(f"Módulos do painel medidos: {', '.join(painel)}")
+    for nome in faltando + faltando_ia:
+        print(f"  não medido: {nome}")
+    print(f"Camada de IA medida: {', '.join(ia) or '-'}")
+    for nome, modulos in cenarios.items():
+        tempo, erro = _medir_import(modulos, repeticoes)
+        resultados[nome] = tempo
+        if erro:
+            print(f"{nome:<8} indisponível: {erro}")
+        else:
+            print(f"{nome:<8} {tempo:8.3f}s")
+    if resultados.get('antes') and resultados.get('painel'):
+        print(f"\nInício a frio do painel: {resultados['antes']:.2f}s -> {resultados['painel']:.2f}s "
+              f"({resultados['antes'] / resultados['painel']:.1f}x mais rápido)")
+    return resultados
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--salvar-baseline', action='store_true')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA)
+    args = parser.parse_args()
+    resultados = executar(args.repeticoes)
+
+    if args.salvar_baseline:
+        with open(CAMINHO_BASELINE, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=1)
+        print(f"Baseline gravada em {CAMINHO_BASELINE}")
+    elif os.path.exists(CAMINHO_BASELINE):
+        with open(CAMINHO_BASELINE, encoding='utf-8') as f:
+            baseline = json.load(f)
+        # O caminho do painel é o que importa: ele não pode voltar a carregar a IA
+        if baseline.get('painel') and resultados.get('painel') and resultados['painel'] > baseline['painel'] * args.tolerancia:
+            print(f"✗ Regressão: painel {baseline['painel']:.3f}s -> {resultados['painel']:.3f}s")
+            sys.exit(1)
+        print("Sem regressão no início do painel em relação à baseline.")
@@ -0,0 +1,189 @@
+"""
+Suíte de benchmarks do pipeline: ficha, vendas (completo e em blocos), junção, classificação e prompt.
+
+Para cada escala gera (ou reaproveita) os dados sintéticos, roda cada etapa `--repeticoes` vezes e
+relata tempo (mediana), pico de memória (tracemalloc, numa execução separada) e linhas/s.
+Compara com a baseline gravada e sai com código 1 se alguma etapa ficar mais lenta que a tolerância.
+
+    python benchmarks/bench_pipeline.py --escalas pequena media
+    python benchmarks/bench_pipeline.py --escalas pequena media --salvar-baseline
+    python benchmarks/bench_pipeline.py --escalas grande --repeticoes 1      # 10M linhas
+"""
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.dados_sinteticos import ESCALAS, gerar_conjunto  # noqa: E402
+from src.contexto import serializar_compacto  # noqa: E402
+from src.correspondencia import CorrespondenciaProdutos  # noqa: E402
+from src.dataloader import filtrar_vendas, processar_nova_ficha  # noqa: E402
+from src.engenharia import classificar_menu  # noqa: E402
+from src.preanalise import preanalisar, resumo_para_prompt  # noqa: E402
+
+CAMINHO_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_pipeline.json')
+TOLERANCIA = 1.5          # etapa 50% mais lenta que a baseline = regressão
+PISO_COMPARACAO_S = 0.02  # etapas mais rápidas que isso oscilam demais para comparar
+
+
+def _medir(funcao, repeticoes):
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        gc.collect()
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    # Pico de memória numa execução à parte: o tracemalloc deixa o código bem mais lento
+    gc.collect()
+    tracemalloc.start()
+    funcao()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(tempos), pico, resultado
+
+
+def _prompt_analise():
+    # O prompt do relatório depende do crewai (src/agentedeia.py); sem ele a etapa é pulada
+    if importlib.util.find_spec('crewai') is None:
+        return None
+    # Sem isso o litellm baixa a tabela de preços dos modelos no import, o que distorce a medição
+    os.environ.setdefault('LITELLM_LOCAL_MODEL_COST_MAP', 'True')
+    try:
+        from src.agentedeia import VERSAO_PROMPT_ANALISE, _descricao_analise, _resumo_analise
+        from src.cache_ia import chave_resposta
+    except ImportError:
+        return None
+
+    def montar(df):
+        resumo = _resumo_analise(df)
+        chave_resposta('analise_menu', VERSAO_PROMPT_ANALISE, 'bench', resumo)
+        return _descricao_analise(resumo)
+    return montar
+
+
+def etapas(vendas, ficha, dir_aliases):
+    """
+    Lista de (nome, função, linhas de entrada). Cada etapa recebe o resultado das anteriores já pronto.
+    """
+    linhas_vendas = sum(1 for _ in open(vendas, encoding='latin1')) - 1
+    linhas_ficha = sum(1 for _ in open(ficha, encoding='latin1')) - 1
+    df_custos = processar_nova_ficha(ficha)
+    df_vendas = filtrar_vendas(vendas, chunksize=200_000)
+    # Os dois modos de leitura têm de dar o mesmo resultado (uma linha por produto, mesmas somas)
+    completo = filtrar_vendas(vendas)
+    assert completo['produto_nome'].tolist() == df_vendas['produto_nome'].tolist(), "modos de leitura com produtos diferentes"
+    assert np.allclose(completo[['popularidade', 'receita_total']], df_vendas[['popularidade', 'receita_total']]), \
+        "modos de leitura com somas diferentes"
+
+    def juntar():
+        # Sem aliases persistidos: mede o casamento aproximado completo a cada repetição
+        caminho = os.path.join(dir_aliases, 'aliases.csv')
+        if os.path.exists(caminho):
+            os.remove(caminho)
+        return CorrespondenciaProdutos(caminho_aliases=caminho).juntar(df_vendas, df_custos)
+
+    df_menu = juntar()
+    df_menu['lucratividade'] = df_menu['preco_venda'] - df_menu['custo_producao']
+    df_classificado = df_menu.assign(classificacao=classificar_menu(df_menu)[0])
+
+    lista = [
+        ('ficha', lambda: processar_nova_ficha(ficha), linhas_ficha),
+        ('vendas', lambda: filtrar_vendas(vendas), linhas_vendas),
+        ('vendas_blocos', lambda: filtrar_vendas(vendas, chunksize=200_000), linhas_vendas),
+        ('juncao', juntar, len(df_vendas)),
+        ('classificacao', lambda: classificar_menu(df_menu), len(df_menu)),
+        ('contexto_chat', lambda: serializar_compacto(df_classificado), len(df_classificado)),
+        ('preanalise', lambda: resumo_para_prompt(preanalisar(df_classificado)), len(df_classificado)),
+    ]
+    montar = _prompt_analise()
+    if montar is not None:
+        lista.append(('prompt_analise', lambda: montar(df_classificado), len(df_classificado)))
+    return lista
+
+
+def executar(escalas, repeticoes, diretorio_dados):
+    resultados = {}
+    with tempfile.TemporaryDirectory() as dir_aliases:
+        for escala in escalas:
+            n = ESCALAS[escala]
+            destino = os.path.join(diretorio_dados, escala)
+            vendas = os.path.join(destino, f'produtosdevenda-{n}.csv')
+            ficha = os.path.join(destino, f'lbox_unidades_cardapio-{n}.csv')
+            if not (os.path.exists(vendas) and os.path.exists(ficha)):
+                print(f"Gerando dados da escala {escala} ({n:,} linhas)...")
+                vendas, ficha = gerar_conjunto(destino, n)
+
+            print(f"\n== {escala}: {n:,} linhas de vendas ==")
+            print(f"{'etapa':<16}{'tempo (s)':>12}{'pico (MB)':>12}{'linhas/s':>14}")
+            resultados[escala] = {}
+            for nome, funcao, linhas in etapas(vendas, ficha, dir_aliases):
+                tempo, pico, _ = _medir(funcao, 1 if escala == 'grande' else repeticoes)
+                resultados[escala][nome] = {
+                    'tempo_s': round(tempo, 5), 'pico_mb': round(pico / 1e6, 2),
+                    'linhas': linhas, 'linhas_por_s': round(linhas / tempo) if tempo > 0 else None,
+                }
+                print(f"{nome:<16}{tempo:>12.4f}{pico / 1e6:>12.1f}{linhas / tempo if tempo > 0 else 0:>14,.0f}")
+    return resultados
+
+
+def comparar(resultados, baseline, tolerancia):
+    regressoes = []
+    for escala, por_etapa in resultados.items():
+        for etapa, atual in por_etapa.items():
+            base = baseline.get('resultados', {}).get(escala, {}).get(etapa)
+            if not base or base['tempo_s'] < PISO_COMPARACAO_S:
+                continue
+            razao = atual['tempo_s'] / base['tempo_s']
+            if razao > tolerancia:
+                regressoes.append((escala, etapa, base['tempo_s'], atual['tempo_s'], razao))
+    return regressoes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--escalas', nargs='+', choices=list(ESCALAS), default=['pequena', 'media'])
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--dados', default=os.path.join(tempfile.gettempdir(), 'chefia_bench'),
+                        help="Onde gerar/reaproveitar os dados sintéticos")
+    parser.add_argument('--baseline', default=CAMINHO_BASELINE)
+    parser.add_argument('--salvar-baseline', action='store_true')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA)
+    args = parser.parse_args()
+
+    resultados = executar(args.escalas, args.repeticoes, args.dados)
+
+    if args.salvar_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({
+                'maquina': {'python': platform.python_version(), 'pandas': pd.__version__,
+                            'processador': platform.processor() or platform.machine(), 'nucleos': os.cpu_count()},
+                'resultados': resultados,
+            }, f, ensure_ascii=False, indent=1)
+        print(f"\nBaseline gravada em {args.baseline}")
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print("\nSem baseline para comparar (rode com --salvar-baseline).")
+        sys.exit(0)
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressoes = comparar(resultados, baseline, args.tolerancia)
+    if regressoes:
+        print(f"\nRegressões (> {args.tolerancia:.1f}x a baseline):")
+        for escala, etapa, antes, depois, razao in regressoes:
+            print(f"  ✗ {escala}/{etapa}: {antes:.4f}s -> {depois:.4f}s ({razao:.2f}x)")
+        sys.exit(1)
+    print(f"\nSem regressões em relação à baseline ({baseline['maquina'].get('processador')}).")
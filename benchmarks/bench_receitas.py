@@ -0,0 +1,100 @@
+"""
+Atualização de preço de insumos: reler e somar a ficha inteira (processar_nova_ficha) vs grafo de
+receitas com propagação incremental (src/receitas.py).
+
+Ficha sintética com produtos, sub-receitas (molhos/massas) e insumos; mede a montagem do grafo e
+atualizações de 1 insumo, 1% dos insumos e da lista de preços inteira do fornecedor.
+
+    python benchmarks/bench_receitas.py [--produtos 5000] [--insumos 5000] [--sub-receitas 300]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.dataloader import processar_nova_ficha  # noqa: E402
+from src.receitas import GrafoReceitas  # noqa: E402
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+
+def ficha_sintetica(n_produtos, n_insumos, n_sub, componentes_por_receita=8, semente=42):
+    rng = np.random.default_rng(semente)
+    insumos = np.array([f"INSUMO {i}" for i in range(n_insumos)], dtype=object)
+    subs = np.array([f"MOLHO {i}" for i in range(n_sub)], dtype=object)
+    produtos = np.array([f"PRATO {i}" for i in range(n_produtos)], dtype=object)
+    preco = rng.uniform(0.5, 60, n_insumos).round(2)
+
+    # Sub-receitas só com insumos; pratos com insumos e, às vezes, uma sub-receita
+    n_linhas_sub = n_sub * componentes_por_receita
+    i_sub = rng.integers(0, n_insumos, n_linhas_sub)
+    linhas = [pd.DataFrame({
+        'produto_principal': np.repeat(subs, componentes_por_receita), 'produto_componente': insumos[i_sub],
+        'quantidade': rng.uniform(0.01, 1, n_linhas_sub).round(3),
+    })]
+    linhas[0]['valor_custo'] = (linhas[0]['quantidade'] * preco[i_sub]).round(4)
+    n_linhas = n_produtos * componentes_por_receita
+    i_ins = rng.integers(0, n_insumos, n_linhas)
+    pratos = pd.DataFrame({
+        'produto_principal': np.repeat(produtos, componentes_por_receita), 'produto_componente': insumos[i_ins],
+        'quantidade': rng.uniform(0.01, 0.5, n_linhas).round(3),
+    })
+    pratos['valor_custo'] = (pratos['quantidade'] * preco[i_ins]).round(4)
+    com_sub = rng.random(n_linhas) < 0.1
+    pratos.loc[com_sub, 'produto_componente'] = subs[rng.integers(0, n_sub, com_sub.sum())]
+    linhas.append(pratos)
+    return pd.concat(linhas, ignore_index=True).assign(unidade='KG'), insumos
+
+
+def _tempo(funcao, repeticoes=5):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000
+
+
+def executar(n_produtos, n_insumos, n_sub):
+    ficha, insumos = ficha_sintetica(n_produtos, n_insumos, n_sub)
+    rng = np.random.default_rng(1)
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, 'ficha.csv')
+        ficha.to_csv(caminho, sep=';', index=False, encoding='latin1')
+        t_reler = _tempo(lambda: processar_nova_ficha(caminho))
+        referencia = processar_nova_ficha(caminho)
+        t_montar = _tempo(lambda: GrafoReceitas.do_arquivo(caminho), repeticoes=3)
+
+    grafo = GrafoReceitas.da_ficha(ficha)
+    # Antes de qualquer atualização, o grafo tem de dar os mesmos custos da soma simples da ficha
+    iniciais = grafo.custos().merge(referencia, on='produto_nome', suffixes=('', '_ficha'))
+    assert len(iniciais) == len(referencia), "grafo e processar_nova_ficha com receitas diferentes"
+    assert np.allclose(iniciais['custo_producao'], iniciais['custo_producao_ficha']), \
+        "custos iniciais do grafo diferentes do processar_nova_ficha"
+    print(f"{len(ficha):,} linhas de ficha | {grafo.resumo()}")
+    print(f"  reler + somar a ficha (processar_nova_ficha): {t_reler:8.1f} ms | montar o grafo: {t_montar:8.1f} ms")
+    for rotulo, n in (('1 insumo', 1), ('1% dos insumos', max(1, n_insumos // 100)), ('lista inteira', n_insumos)):
+        # Preços novos a cada repetição, para sempre haver propagação
+        listas = [dict(zip(rng.choice(insumos, n, replace=False), rng.uniform(0.5, 60, n))) for _ in range(5)]
+        tempos, afetados = [], 0
+        for precos in listas:
+            inicio = time.perf_counter()
+            afetados = len(grafo.atualizar_precos(precos)[0])
+            tempos.append(time.perf_counter() - inicio)
+        t = statistics.median(tempos) * 1000
+        print(f"  atualizar {rotulo:<15} {t:8.2f} ms  ({afetados:,} receitas recalculadas, "
+              f"{t_reler / t:6.0f}x mais rápido que reler)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--produtos', type=int, default=5_000)
+    parser.add_argument('--insumos', type=int, default=5_000)
+    parser.add_argument('--sub-receitas', type=int, default=300)
+    args = parser.parse_args()
+    executar(args.produtos, args.insumos, args.sub_receitas)
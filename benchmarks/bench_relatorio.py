@@ -0,0 +1,62 @@
+"""
+Relatório estratégico: analista sobre o cardápio inteiro seguido do consultor (mesmos prompts do crew
+sequencial, pelo modo streaming) vs relatório em fatias (executar_analise_menu_fatiada), com o
+analista por quadrante em paralelo e uma consolidação.
+
+Roda contra o servidor falso (benchmarks/llm_falso.py), que gera respostas proporcionais ao prompt:
+análises de cardápios maiores demoram mais, como num modelo real. Precisa do crewai instalado
+(src/agentedeia.py o importa).
+
+    python benchmarks/bench_relatorio.py [--itens 50 1000 20000] [--atraso-token 0.002] [--tempo-limite 30]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LITELLM_LOCAL_MODEL_COST_MAP', 'True')
+
+from benchmarks.bench_consultas import cardapio_sintetico  # noqa: E402
+from benchmarks.llm_falso import ConfiguracaoFalsa, iniciar_servidor  # noqa: E402
+
+MODELO = 'openai/falso'
+
+
+def executar(tamanhos, atraso_token, tempo_limite):
+    try:
+        import src.agentedeia as agentedeia
+    except ImportError as e:
+        print(f"Camada de IA indisponível ({e}); instale o requirements.txt.")
+        return
+    import litellm
+    litellm.suppress_debug_info = True
+
+    cfg = ConfiguracaoFalsa(atraso_inicial=0.3, atraso_token=atraso_token, proporcao_resposta=0.5)
+    _, cfg, agentedeia.API_BASE = iniciar_servidor(cfg=cfg)
+
+    for n in tamanhos:
+        df = cardapio_sintetico(n)
+        inicio = time.perf_counter()
+        for _ in agentedeia.executar_analise_menu_stream(df, 'falsa', MODELO, usar_cache=False):
+            pass
+        t_sequencial = time.perf_counter() - inicio
+
+        metricas = {}
+        relatorio = agentedeia.executar_analise_menu_fatiada(df, 'falsa', MODELO, usar_cache=False, metricas=metricas,
+                                                            tempo_limite_s=tempo_limite)
+        print(f"{n:>7,} itens | sequencial {t_sequencial:6.2f}s | em fatias {metricas['total_s']:6.2f}s "
+              f"(fatias {metricas['analise_s']:5.2f}s + consolidação {metricas['consolidacao_s']:5.2f}s) "
+              f"{t_sequencial / metricas['total_s']:4.1f}x" + (" | PARCIAL" if metricas['parcial'] else ''))
+        for linha in relatorio['fatias']:
+            print(f"{'':>14}{linha['fatia']:<14} {linha['itens']:>7,} itens {linha['alertas']:>7,} alertas "
+                  f"{linha['latencia_s']:6.2f}s  {linha['status']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--itens', type=int, nargs='+', default=[50, 1_000, 20_000])
+    parser.add_argument('--atraso-token', type=float, default=0.002, help="segundos por token gerado")
+    parser.add_argument('--tempo-limite', type=float, default=30.0, help="prazo de cada fatia (s)")
+    args = parser.parse_args()
+    executar(args.itens, args.atraso_token, args.tempo_limite)
@@ -0,0 +1,78 @@
+"""
+Memória e CPU por sessão: cardápio como lista de dicts (modelo antigo) vs tabela tipada (src/sessao.py).
+
+Mede a memória retida pelo estado da sessão (tracemalloc) e o custo de um rerun com uma edição
+de célula: antigo = DataFrame(lista) + to_dict('records'); novo = para_editor + aplicar_edicoes.
+
+    python benchmarks/bench_sessao.py [--itens 1000 50000 500000]
+"""
+import argparse
+import gc
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_consultas import cardapio_sintetico  # noqa: E402
+from src.sessao import COLUNAS_CARDAPIO, aplicar_edicoes, para_editor, tipar  # noqa: E402
+
+import pandas as pd  # noqa: E402
+
+
+def _memoria_retida(fabrica):
+    gc.collect()
+    tracemalloc.start()
+    objeto = fabrica()
+    atual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return objeto, atual
+
+
+def _tempo(funcao, repeticoes=5):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000
+
+
+def executar(n_itens):
+    base = cardapio_sintetico(n_itens)[COLUNAS_CARDAPIO]
+    registros_origem = base.to_dict('records')
+
+    lista, mem_lista = _memoria_retida(lambda: [dict(r) for r in registros_origem])
+    tabela, mem_tabela = _memoria_retida(lambda: tipar(base))
+
+    edicao = {'edited_rows': {n_itens // 2: {'preco_venda': 12.5}}, 'added_rows': [], 'deleted_rows': []}
+
+    def rerun_antigo():
+        df_input = pd.DataFrame(lista)[COLUNAS_CARDAPIO]
+        editado = df_input.copy()
+        editado.iat[n_itens // 2, 2] = 12.5
+        if not editado.equals(df_input):
+            editado.to_dict('records')
+
+    def rerun_novo():
+        df_input = para_editor(tabela)
+        editado = df_input.copy()
+        editado.iat[n_itens // 2, 2] = 12.5
+        if not editado.equals(df_input):
+            aplicar_edicoes(tabela, edicao, editado)
+
+    t_antigo = _tempo(rerun_antigo)
+    t_novo = _tempo(rerun_novo)
+    assert float(tabela['preco_venda'].iat[n_itens // 2]) == 12.5
+
+    print(f"{n_itens:>9,} itens | estado: lista {mem_lista / 1e6:8.2f} MB -> tabela {mem_tabela / 1e6:7.2f} MB "
+          f"({mem_lista / max(mem_tabela, 1):5.1f}x menor) | rerun com edição: {t_antigo:8.1f} ms -> {t_novo:7.1f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--itens', type=int, nargs='+', default=[1_000, 50_000, 500_000])
+    for n in parser.parse_args().itens:
+        executar(n)
@@ -0,0 +1,70 @@
+"""
+Tempo do simulador de preços (src/simulacao.py): grade de variações e Monte Carlo sobre o cardápio inteiro.
+
+Meta: milhares de cenários x milhares de itens bem abaixo de 1 s, para alimentar os sliders do painel.
+A referência "laço" recalcula um cenário por vez com pandas, como um loop ingênuo faria.
+
+    python benchmarks/bench_simulacao.py [--itens 1000 5000] [--cenarios 2000] [--rodadas 1000]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_consultas import cardapio_sintetico  # noqa: E402
+from src.engenharia import classificar_menu  # noqa: E402
+from src.simulacao import elasticidades, monte_carlo, precos_cenarios, simular_grade  # noqa: E402
+
+import numpy as np  # noqa: E402
+
+
+def _tempo(funcao, repeticoes=3):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000
+
+
+def _laco(df, variacoes):
+    # Um cenário por vez, em pandas: o que o painel faria sem o motor vetorizado
+    e = elasticidades(df)
+    for v in variacoes:
+        cenario = df.copy()
+        cenario['preco_venda'] = df['preco_venda'] * (1 + v)
+        cenario['popularidade'] = df['popularidade'] * (1 + v) ** e
+        cenario['lucratividade'] = cenario['preco_venda'] - cenario['custo_producao']
+        classificar_menu(cenario)
+        (cenario['lucratividade'] * cenario['popularidade']).sum()
+
+
+def executar(n_itens, n_cenarios, n_rodadas):
+    df = cardapio_sintetico(n_itens)
+    variacoes = np.linspace(-0.3, 0.3, n_cenarios)
+    t_grade = _tempo(lambda: simular_grade(df, variacoes))
+    # Amostra de 50 cenários do laço, extrapolada para a grade inteira
+    t_laco = _tempo(lambda: _laco(df, variacoes[:50]), repeticoes=1) * n_cenarios / 50
+
+    preco = df['preco_venda'].to_numpy()
+    um_item = precos_cenarios(preco, [0.5], np.arange(n_itens) == 0, 'absoluto')[0]
+    dez_pct = precos_cenarios(preco, [0.5], np.arange(n_itens) % 10 == 0, 'absoluto')[0]
+    t_mc_um = _tempo(lambda: monte_carlo(df, um_item, n_simulacoes=n_rodadas, semente=0))
+    t_mc_dez = _tempo(lambda: monte_carlo(df, dez_pct, n_simulacoes=n_rodadas, semente=0))
+
+    print(f"{n_itens:>7,} itens | grade {n_cenarios} cenários: {t_grade:7.1f} ms (laço pandas ~{t_laco:9.0f} ms, "
+          f"{t_laco / t_grade:5.0f}x) | Monte Carlo {n_rodadas} rodadas: 1 item {t_mc_um:6.1f} ms, "
+          f"10% dos itens {t_mc_dez:6.1f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--itens', type=int, nargs='+', default=[1_000, 5_000])
+    parser.add_argument('--cenarios', type=int, default=2_000)
+    parser.add_argument('--rodadas', type=int, default=1_000)
+    args = parser.parse_args()
+    for n in args.itens:
+        executar(n, args.cenarios, args.rodadas)
@@ -0,0 +1,142 @@
+"""
+Gerador de exportações sintéticas no layout exato do PDV e da ficha técnica.
+
+- Vendas (produtosdevenda-AAAA-MM-DD.csv): latin1, ';', números no formato BR entre aspas
+  ("1.234,56"), coluna UNIDADE e nomes sujos (caixa mista, espaços duplos, acentos).
+- Ficha (lbox_unidades_cardapio.csv): latin1, ';', produto_principal;produto_componente;
+  quantidade;unidade;valor_custo, com componentes repetidos e nomes terminando em '.'.
+
+    python benchmarks/dados_sinteticos.py --linhas 100000 --saida /tmp/chefia_dados
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ESCALAS = {'pequena': 1_000, 'media': 100_000, 'grande': 10_000_000}
+LINHAS_POR_ESCRITA = 500_000
+
+BASES = ['PASTEL DE CARNE', 'PASTEL DE FRANGO', 'PASTEL DE QUEIJO', 'PASTEL DE PIZZA', 'COXINHA', 'ESFIHA DE CARNE',
+         'HAMBÚRGUER', 'BATATA FRITA', 'PÃO DE QUEIJO', 'AÇAÍ', 'SUCO DE LARANJA', 'CAFÉ EXPRESSO', 'COCA-COLA LATA',
+         'ÁGUA MINERAL', 'REFRI GUARANÁ', 'BROWNIE', 'PUDIM', 'RISOTO', 'SALADA', 'TAPIOCA']
+TAMANHOS = ['', ' 17CM', ' 25CM', ' P', ' M', ' G', ' 300ML', ' 500ML']
+COMPONENTES = ['FARINHA', 'CARNE MOIDA', 'FRANGO DESFIADO', 'QUEIJO MUSSARELA', 'OLEO', 'EMBALAGEM', 'SAL',
+               'AÇÚCAR', 'LEITE', 'OVO', 'PRESUNTO', 'TOMATE', 'CEBOLA', 'GUARDANAPO']
+
+
+def catalogo(n_produtos):
+    # Nomes canônicos únicos: base + tamanho + número de variante quando acabam as combinações
+    nomes = []
+    for i in range(n_produtos):
+        base = BASES[i % len(BASES)] + TAMANHOS[(i // len(BASES)) % len(TAMANHOS)]
+        variante = i // (len(BASES) * len(TAMANHOS))
+        nomes.append(f"{base} {variante}" if variante else base)
+    return np.array(nomes, dtype=object)
+
+
+def _sujar(nomes, rng, fracao=0.2):
+    # Parte dos nomes vem como no PDV real: minúsculas, espaços extras nas pontas e no meio
+    nomes = nomes.copy()
+    alvo = rng.random(len(nomes)) < fracao
+    sujos = pd.Series(nomes[alvo], dtype=object)
+    tipo = rng.integers(0, 3, len(sujos))
+    sujos = sujos.where(tipo != 0, sujos.str.lower())
+    sujos = sujos.where(tipo != 1, '  ' + sujos + ' ')
+    sujos = sujos.where(tipo != 2, sujos.str.replace(' ', '  ', n=1, regex=False))
+    nomes[alvo] = sujos.to_numpy()
+    return nomes
+
+
+def _numero_br(valores):
+    # 1234.5 -> "1.234,50"
+    s = pd.Series(valores).map('{:,.2f}'.format)
+    return s.str.replace(',', 'X', regex=False).str.replace('.', ',', regex=False).str.replace('X', '.', regex=False)
+
+
+def gerar_vendas(caminho, n_linhas, n_produtos=None, n_lojas=5, semente=42):
+    """
+    Uma linha por (loja, produto) e dia de movimento, como na exportação do PDV; o mesmo produto
+    se repete muitas vezes, então o parser precisa agregar.
+    """
+    rng = np.random.default_rng(semente)
+    n_produtos = n_produtos or max(50, min(5_000, n_linhas // 20))
+    nomes = catalogo(n_produtos)
+    preco = rng.uniform(4, 60, n_produtos).round(2)
+    # Popularidade com cauda longa: poucos campeões, muitos itens que quase não saem
+    peso = rng.pareto(1.2, n_produtos) + 0.05
+    peso /= peso.sum()
+
+    with open(caminho, 'w', encoding='latin1', newline='') as f:
+        f.write('"UNIDADE";"PRODUTO DE VENDA";"VENDA DE FRENTE DE LOJA";"VENDA DELIVERY";'
+                '"RECEITA FRENTE DE LOJA";"RECEITA DELIVERY"\n')
+        escritas = 0
+        while escritas < n_linhas:
+            n = min(LINHAS_POR_ESCRITA, n_linhas - escritas)
+            idx = rng.choice(n_produtos, size=n, p=peso)
+            loja = rng.integers(0, n_lojas, n)
+            qtd_loja = rng.poisson(6, n)
+            qtd_delivery = rng.poisson(2, n)
+            bloco = pd.DataFrame({
+                'UNIDADE': pd.Series(loja).map(lambda i: f"LOJA {i + 1:02d}"),
+                'PRODUTO DE VENDA': _sujar(nomes[idx], rng),
+                'VENDA DE FRENTE DE LOJA': qtd_loja,
+                'VENDA DELIVERY': qtd_delivery,
+                'RECEITA FRENTE DE LOJA': _numero_br(qtd_loja * preco[idx]),
+                'RECEITA DELIVERY': _numero_br(qtd_delivery * preco[idx] * 1.1),
+            })
+            bloco.to_csv(f, sep=';', index=False, header=False, quoting=1)
+            escritas += n
+    return caminho
+
+
+def gerar_ficha(caminho, n_linhas, n_produtos=None, semente=7):
+    """
+    Ficha técnica com vários componentes por produto (alguns repetidos na mesma receita).
+    valor_custo usa ponto decimal, como o processar_nova_ficha espera.
+    """
+    rng = np.random.default_rng(semente)
+    n_produtos = n_produtos or max(10, n_linhas // 6)
+    nomes = catalogo(n_produtos)
+    produto = np.sort(rng.integers(0, n_produtos, n_linhas))
+    produto[:min(n_produtos, n_linhas)] = np.arange(min(n_produtos, n_linhas))   # todo produto tem ao menos 1 componente
+    componente = np.array(COMPONENTES, dtype=object)[rng.integers(0, len(COMPONENTES), n_linhas)]
+    nome = nomes[produto]
+    # Ponto final perdido no cadastro ("BISNAGA GARLIC.")
+    ponto = rng.random(n_linhas) < 0.05
+    nome[ponto] = nome[ponto] + '.'
+
+    with open(caminho, 'w', encoding='latin1', newline='') as f:
+        pd.DataFrame({
+            'produto_principal': _sujar(nome, rng, fracao=0.1),
+            'produto_componente': componente,
+            'quantidade': rng.uniform(0.01, 0.5, n_linhas).round(3),
+            'unidade': np.where(rng.random(n_linhas) < 0.5, 'KG', 'UN'),
+            'valor_custo': rng.uniform(0.05, 3.0, n_linhas).round(2),
+        }).to_csv(f, sep=';', index=False)
+    return caminho
+
+
+def gerar_conjunto(diretorio, n_linhas, semente=42):
+    """
+    Gera o par vendas + ficha com o mesmo catálogo de produtos. Devolve (caminho_vendas, caminho_ficha).
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    n_produtos = max(50, min(5_000, n_linhas // 20))
+    vendas = gerar_vendas(os.path.join(diretorio, f'produtosdevenda-{n_linhas}.csv'), n_linhas, n_produtos, semente=semente)
+    ficha = gerar_ficha(os.path.join(diretorio, f'lbox_unidades_cardapio-{n_linhas}.csv'),
+                        max(n_produtos * 6, 60), n_produtos, semente=semente + 1)
+    return vendas, ficha
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--linhas', type=int, default=None, help="Linhas de vendas")
+    parser.add_argument('--escala', choices=list(ESCALAS), default='media')
+    parser.add_argument('--saida', default='dados_sinteticos')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+    n = args.linhas or ESCALAS[args.escala]
+    for caminho in gerar_conjunto(args.saida, n, args.semente):
+        print(f"{caminho} ({os.path.getsize(caminho) / 1e6:.1f} MB)", file=sys.stdout)
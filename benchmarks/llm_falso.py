@@ -0,0 +1,189 @@
+"""
+Servidor LLM falso, compatível com a rota /v1/chat/completions da OpenAI (com e sem streaming SSE).
+
+Serve para medir tempo até o primeiro token e testar o app sem gastar tokens:
+
+    python benchmarks/llm_falso.py --porta 8765 --atraso-inicial 0.8 --atraso-token 0.02
+    CHEFIA_LLM_API_BASE=http://127.0.0.1:8765/v1 streamlit run app.py   # modelo "openai/..."
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RESPOSTA_PADRAO = (
+    "**Análise (servidor falso):** o item $ mais vendido é o PASTEL DE CARNE 17CM. "
+    "Aumente o preço da Coca-Cola em R$ 0,50 e destaque as Oportunidades no cardápio. 👨‍🍳"
+)
+
+
+class ConfiguracaoFalsa:
+    def __init__(self, atraso_inicial=0.5, atraso_token=0.02, resposta=RESPOSTA_PADRAO,
+                 taxa_429=0.0, taxa_500=0.0, limite_simultaneas=None, proporcao_resposta=None,
+                 cache_prefixo=False, atraso_prompt_token=0.0):
+        self.atraso_inicial = atraso_inicial
+        self.atraso_token = atraso_token
+        self.resposta = resposta
+        self.taxa_429 = taxa_429
+        self.taxa_500 = taxa_500
+        self.limite_simultaneas = limite_simultaneas   # como um provedor real: 429 acima de N chamadas ao mesmo tempo
+        self.recusadas_429 = 0
+        # Resposta com N tokens por token de prompt (repetindo o texto): prompts maiores geram análises maiores
+        self.proporcao_resposta = proporcao_resposta
+        # Cache de prefixo como o dos provedores: mensagens iniciais já vistas não pagam o processamento do prompt
+        self.cache_prefixo = cache_prefixo
+        self.atraso_prompt_token = atraso_prompt_token
+        self._prefixos = set()
+        self.requisicoes = 0
+        self.em_andamento = 0
+        self.pico_em_andamento = 0
+        self._lock = threading.Lock()
+
+
+def _tokens(texto):
+    # "Tokens" falsos: palavras com o espaço seguinte, o que basta para simular o streaming
+    partes = texto.split(' ')
+    return [p + (' ' if i < len(partes) - 1 else '') for i, p in enumerate(partes)]
+
+
+def _tokens_em_cache(cfg, mensagens):
+    # Maior prefixo de mensagens já visto (granularidade de mensagem); registra os prefixos deste pedido
+    em_cache, acumulado, continuo, digest = 0, 0, True, hashlib.sha256()
+    with cfg._lock:
+        for mensagem in mensagens:
+            digest.update(json.dumps(mensagem, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+            acumulado += len(str(mensagem.get('content', ''))) // 4
+            chave = digest.copy().hexdigest()
+            continuo = continuo and chave in cfg._prefixos
+            if continuo:
+                em_cache = acumulado
+            cfg._prefixos.add(chave)
+    return em_cache
+
+
+def criar_handler(cfg):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status, corpo):
+            dados = json.dumps(corpo).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def do_POST(self):
+            tamanho = int(self.headers.get('Content-Length', 0))
+            pedido = json.loads(self.rfile.read(tamanho) or b'{}')
+            with cfg._lock:
+                cfg.requisicoes += 1
+                cfg.em_andamento += 1
+                cfg.pico_em_andamento = max(cfg.pico_em_andamento, cfg.em_andamento)
+                lotado = cfg.limite_simultaneas is not None and cfg.em_andamento > cfg.limite_simultaneas
+            try:
+                sorteio = random.random()
+                if lotado or sorteio < cfg.taxa_429:
+                    with cfg._lock:
+                        cfg.recusadas_429 += 1
+                    self._json(429, {'error': {'message': 'Rate limit (falso)', 'type': 'rate_limit_error'}})
+                    return
+                if sorteio < cfg.taxa_429 + cfg.taxa_500:
+                    self._json(500, {'error': {'message': 'Erro interno (falso)', 'type': 'server_error'}})
+                    return
+
+                tokens = _tokens(cfg.resposta)
+                modelo = pedido.get('model', 'falso')
+                prompt_tokens = sum(len(str(m.get('content', ''))) // 4 for m in pedido.get('messages', []))
+                em_cache = _tokens_em_cache(cfg, pedido.get('messages', [])) if cfg.cache_prefixo else 0
+                time.sleep(cfg.atraso_inicial + cfg.atraso_prompt_token * (prompt_tokens - em_cache))
+                if cfg.proporcao_resposta:
+                    n = max(1, int(prompt_tokens * cfg.proporcao_resposta))
+                    tokens = [(t if t.endswith(' ') else t + ' ') for t in tokens] * (n // len(tokens) + 1)
+                    tokens = tokens[:n]
+                fim = 'stop'
+                if pedido.get('max_tokens') and len(tokens) > pedido['max_tokens']:
+                    tokens, fim = tokens[:pedido['max_tokens']], 'length'
+                texto = ''.join(tokens)
+                uso = {'prompt_tokens': prompt_tokens, 'completion_tokens': len(tokens),
+                       'total_tokens': prompt_tokens + len(tokens),
+                       'prompt_tokens_details': {'cached_tokens': em_cache}}
+
+                if not pedido.get('stream'):
+                    time.sleep(cfg.atraso_token * len(tokens))
+                    self._json(200, {
+                        'id': 'falso', 'object': 'chat.completion', 'created': int(time.time()), 'model': modelo,
+                        'choices': [{'index': 0, 'finish_reason': fim,
+                                     'message': {'role': 'assistant', 'content': texto}}],
+                        'usage': uso,
+                    })
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                for i, token in enumerate(tokens):
+                    pedaco = {
+                        'id': 'falso', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': modelo,
+                        'choices': [{'index': 0, 'finish_reason': None,
+                                     'delta': {'role': 'assistant', 'content': token} if i == 0 else {'content': token}}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(pedaco)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                    time.sleep(cfg.atraso_token)
+                final = {'id': 'falso', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': modelo,
+                         'choices': [{'index': 0, 'finish_reason': fim, 'delta': {}}], 'usage': uso}
+                self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode('utf-8'))
+                self.wfile.flush()
+                self.close_connection = True
+            finally:
+                with cfg._lock:
+                    cfg.em_andamento -= 1
+
+    return Handler
+
+
+def iniciar_servidor(porta=0, cfg=None):
+    """
+    Sobe o servidor em uma thread daemon e devolve (servidor, cfg, api_base).
+    Com porta=0 o sistema escolhe uma porta livre.
+    """
+    cfg = cfg or ConfiguracaoFalsa()
+    servidor = ThreadingHTTPServer(('127.0.0.1', porta), criar_handler(cfg))
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, cfg, f"http://127.0.0.1:{servidor.server_address[1]}/v1"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Servidor LLM falso compatível com OpenAI.")
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--atraso-inicial', type=float, default=0.5, help="segundos até o primeiro token")
+    parser.add_argument('--atraso-token', type=float, default=0.02, help="segundos entre tokens")
+    parser.add_argument('--taxa-429', type=float, default=0.0)
+    parser.add_argument('--taxa-500', type=float, default=0.0)
+    parser.add_argument('--limite-simultaneas', type=int, default=None, help="429 acima de N chamadas ao mesmo tempo")
+    parser.add_argument('--proporcao-resposta', type=float, default=None, help="tokens de resposta por token de prompt")
+    parser.add_argument('--cache-prefixo', action='store_true', help="simula o cache de prefixo do provedor")
+    parser.add_argument('--atraso-prompt-token', type=float, default=0.0, help="segundos por token de prompt fora do cache")
+    args = parser.parse_args()
+
+    _, _, api_base = iniciar_servidor(args.porta, ConfiguracaoFalsa(
+        args.atraso_inicial, args.atraso_token, taxa_429=args.taxa_429, taxa_500=args.taxa_500,
+        limite_simultaneas=args.limite_simultaneas, proporcao_resposta=args.proporcao_resposta,
+        cache_prefixo=args.cache_prefixo, atraso_prompt_token=args.atraso_prompt_token
+    ))
+    print(f"Servidor LLM falso em {api_base} (Ctrl+C para sair)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
@@ -1,123 +1,55 @@
-import pandas as pd
-import numpy as np
-
-def processar_nova_ficha(caminho_arquivo):
-    """
-    Processa o novo arquivo de ficha técnica (lbox_unidades_cardapio.csv)
-    para calcular o custo total de produção de cada item.
-    """
-    print("Iniciando processamento da nova ficha técnica...")
-    df_ficha = pd.read_csv(caminho_arquivo, sep=';', encoding='latin1')
-
-    # Renomear colunas para clareza
-    df_ficha = df_ficha.rename(columns={
-        'produto_principal': 'produto_nome',
-        'valor_custo': 'custo_componente'
-    })
-
-    # Limpeza de dados numéricos para o custo
-    df_ficha['custo_componente'] = pd.to_numeric(df_ficha['custo_componente'], errors='coerce')
-    df_ficha = df_ficha.dropna(subset=['custo_componente'])
-
-    # Limpeza robusta do nome do produto (essencial para o merge)
-    df_ficha['produto_nome'] = (
-        df_ficha['produto_nome']
-        .str.strip()
-        .str.replace(' +', ' ', regex=True)
-        .str.upper()
-        .str.rstrip('.') # Remove pontos no final do nome, como em "BISNAGA GARLIC."
-    )
-
-    # A lógica principal: agrupar por produto e somar os custos dos componentes
-    df_custos = df_ficha.groupby('produto_nome')['custo_componente'].sum().reset_index()
-
-    # Renomear a coluna final de custo
-    df_custos = df_custos.rename(columns={'custo_componente': 'custo_producao'})
-
-    print("Nova ficha técnica processada com sucesso!")
-    return df_custos
-
-
-def filtrar_vendas(caminho_do_arquivo):
-    """
-    Processa o arquivo de vendas, aplicando a mesma limpeza de nomes.
-    """
-    print("Iniciando processamento dos dados de vendas...")
-    df_vendas = pd.read_csv(caminho_do_arquivo, sep=';', encoding='latin1')
-
-    if 'UNIDADE' in df_vendas.columns:
-        df_vendas.drop(['UNIDADE'], axis=1, inplace=True)
-
-    df_vendas = df_vendas.rename(columns={
-        'PRODUTO DE VENDA': 'produto_nome',
-        'VENDA DE FRENTE DE LOJA': 'vendas_loja',
-        'VENDA DELIVERY': 'vendas_delivery',
-        'RECEITA FRENTE DE LOJA': 'receita_loja',
-        'RECEITA DELIVERY': 'receita_delivery'
-    })
-
-    # Limpeza robusta do nome do produto (deve ser idêntica à da outra função)
-    df_vendas['produto_nome'] = (
-        df_vendas['produto_nome']
-        .str.strip()
-        .str.replace(' +', ' ', regex=True)
-        .str.upper()
-    )
-
-    colunas_numericas = ['vendas_loja', 'vendas_delivery', 'receita_loja', 'receita_delivery']
-    for col in colunas_numericas:
-        df_vendas[col] = pd.to_numeric(
-            df_vendas[col].astype(str).str.replace('.', '', regex=False).str.replace(',', '.', regex=False),
-            errors='coerce'
-        )
-
-    df_vendas = df_vendas.fillna(0)
-    df_vendas['popularidade'] = df_vendas['vendas_loja'] + df_vendas['vendas_delivery']
-    df_vendas['receita_total'] = df_vendas['receita_loja'] + df_vendas['receita_delivery']
-    df_vendas['preco_venda'] = np.where(df_vendas['popularidade'] > 0,
-                                          df_vendas['receita_total'] / df_vendas['popularidade'], 0)
-
-    print("Vendas processadas com sucesso!")
-    return df_vendas[['produto_nome', 'popularidade', 'preco_venda']]
-
-
-# ---- Caminhos dos arquivos ----
-arquivo_vendas = 'C:/Users/Xícaro PC/pfm_lia/dataset/produtosdevenda-2025-10-13.csv'
-arquivo_ficha_novo = 'C:/Users/Xícaro PC/pfm_lia/dataset/lbox_unidades_cardapio.csv'
-
-# ---- Processamento ----
-dados_vendas_processados = filtrar_vendas(arquivo_vendas)
-dados_custos_processados = processar_nova_ficha(arquivo_ficha_novo)
-
-# ---- Junção dos dados ----
-df_final = pd.merge(dados_vendas_processados, dados_custos_processados, on='produto_nome', how='inner')
-
-# ---- Lógica Final ----
-if not df_final.empty:
-    df_final = df_final[df_final['popularidade'] > 0].copy()
-    df_final['lucratividade'] = df_final['preco_venda'] - df_final['custo_producao']
-    df_final = df_final[df_final['lucratividade'] >= 0]
+"""
+Análise em lote do ChefIA (sem interface): cruza vendas e ficha técnica de várias lojas em paralelo.
+
+    python filtro.py dataset/lojas -o saida/
+    python filtro.py --manifesto lojas.csv -o saida/ --processos 8
+    python filtro.py --vendas produtosdevenda-2025-10-13.csv --ficha lbox_unidades_cardapio.csv
+
+Com um diretório, cada subpasta é uma loja (vendas `produtosdevenda*.csv` e, opcionalmente, a
+ficha `lbox*cardapio*.csv`; sem ficha própria vale a da raiz ou a de --ficha). O manifesto é um
+CSV com as colunas loja;vendas;ficha. Saída: `lojas/<loja>.parquet|csv`, `consolidado.parquet|csv`
+e `resumo.csv` com os tempos de cada etapa por loja.
+"""
+import argparse
+import os
+import sys
+
+from src.lote import executar_lote, imprimir_resumo, trabalhos_do_diretorio, trabalhos_do_manifesto
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('diretorio', nargs='?', help="Pasta com uma subpasta por loja")
+    parser.add_argument('--manifesto', help="CSV (;) com as colunas loja, vendas e ficha")
+    parser.add_argument('--vendas', help="Um único arquivo de vendas (modo de uma loja só)")
+    parser.add_argument('--ficha', help="Ficha técnica (padrão para as lojas sem ficha própria)")
+    parser.add_argument('--loja', default='LOJA', help="Nome da loja no modo de um arquivo só")
+    parser.add_argument('-o', '--saida', default='saida', help="Pasta de saída (padrão: saida/)")
+    parser.add_argument('-p', '--processos', type=int, default=None, help="Processos em paralelo (padrão: núcleos da máquina)")
+    args = parser.parse_args(argv)
+
+    if args.manifesto:
+        trabalhos = trabalhos_do_manifesto(args.manifesto)
+    elif args.vendas:
+        if not args.ficha:
+            parser.error("--vendas exige --ficha")
+        trabalhos = [{'loja': args.loja, 'vendas': args.vendas, 'ficha': args.ficha}]
+    elif args.diretorio:
+        trabalhos = trabalhos_do_diretorio(args.diretorio, args.ficha)
+    else:
+        parser.error("informe um diretório, --manifesto ou --vendas/--ficha")
 
-    if not df_final.empty:
-        popularidade_media = df_final['popularidade'].mean()
-        lucratividade_media = df_final['lucratividade'].mean()
+    if not trabalhos:
+        print("Nenhuma loja encontrada (vendas + ficha técnica).")
+        return 1
 
-        def classificar_produto(row):
-            if row['popularidade'] >= popularidade_media and row['lucratividade'] >= lucratividade_media:
-                return '⭐ Estrela'
-            elif row['popularidade'] >= popularidade_media and row['lucratividade'] < lucratividade_media:
-                return '💪 Burro de Carga'
-            elif row['popularidade'] < popularidade_media and row['lucratividade'] >= lucratividade_media:
-                return '❓ Quebra-cabeça'
-            else:
-                return '🐶 Cão'
+    os.makedirs(args.saida, exist_ok=True)
+    print(f"Processando {len(trabalhos)} loja(s)...")
+    df_resumo, _, estatisticas = executar_lote(trabalhos, args.saida, args.processos)
+    imprimir_resumo(df_resumo, estatisticas)
+    print(f"\nResultados em: {os.path.abspath(args.saida)}")
+    return 0 if estatisticas['ok'] == estatisticas['lojas'] else 2
 
-        df_final['classificacao'] = df_final.apply(classificar_produto, axis=1)
 
-        print("\n--- ANÁLISE FINALIZADA COM SUCESSO! ---")
-        print(df_final[['produto_nome', 'popularidade', 'lucratividade', 'classificacao']].head(15))
-        print(f"\nTotal de produtos encontrados em comum: {len(df_final)}")
-    else:
-        print("\n--- ANÁLISE FINALIZADA, MAS NENHUM PRODUTO COM LUCRATIVIDADE POSITIVA FOI ENCONTRADO ---")
-else:
-    print("\n--- ANÁLISE FINALIZADA, MAS NENHUM PRODUTO EM COMUM FOI ENCONTRADO ---")
\ No newline at end of file
+if __name__ == '__main__':
+    sys.exit(main())
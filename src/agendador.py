@@ -0,0 +1,422 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as TempoEsgotado
+
+from src.pool_ia import hash_chave_api
+
+# --- LIMITES POR PROVEDOR ---
+# (requisições simultâneas, orçamento de tokens por minuto). Sobrescreva por variável de ambiente:
+# CHEFIA_LIMITE_GEMINI=8,2000000 -> até 8 chamadas ao mesmo tempo e 2M tokens/min para modelos "gemini/...".
+LIMITES_PADRAO = {
+    'gemini': (4, 1_000_000),
+    'openai': (4, 200_000),
+    'deepseek': (4, 500_000),
+    'perplexity': (2, 100_000),
+    'padrao': (2, 100_000),
+}
+FILA_MAXIMA = 50            # acima disso a requisição é recusada na hora (contrapressão) em vez de empilhar threads
+TENTATIVAS = 4
+ESPERA_BASE_S = 1.0
+ESPERA_MAXIMA_S = 30.0
+INTERVALO_AVISO_S = 0.5     # de quanto em quanto tempo quem espera na fila recebe a posição
+
+
+class FilaCheia(RuntimeError):
+    pass
+
+
+class PedidoCancelado(RuntimeError):
+    pass
+
+
+def provedor_do_modelo(modelo_nome):
+    # Mesmo prefixo que o litellm usa para escolher o provedor ("gemini/gemini-2.5-flash" -> "gemini")
+    return modelo_nome.split('/', 1)[0].lower() if modelo_nome and '/' in modelo_nome else 'padrao'
+
+
+def limites_do_provedor(provedor):
+    concorrencia, tpm = LIMITES_PADRAO.get(provedor, LIMITES_PADRAO['padrao'])
+    valor = os.getenv(f'CHEFIA_LIMITE_{provedor.upper()}')
+    if valor:
+        partes = [p.strip() for p in valor.split(',')]
+        concorrencia = int(partes[0]) if partes[0] else concorrencia
+        tpm = int(partes[1]) if len(partes) > 1 and partes[1] else tpm
+    return max(concorrencia, 1), max(tpm, 1)
+
+
+def estimar_tokens(*textos, saida=800):
+    # ~4 caracteres por token no prompt + uma reserva para a resposta
+    return sum(len(str(t)) for t in textos) // 4 + saida
+
+
+def _tokens_usados(obj):
+    # CrewOutput.token_usage (UsageMetrics) ou o 'usage' do último pedaço do litellm
+    uso = getattr(obj, 'token_usage', None) or getattr(obj, 'usage', None)
+    total = getattr(uso, 'total_tokens', None)
+    return total if isinstance(total, int) and total > 0 else None
+
+
+def _status(erro):
+    status = getattr(erro, 'status_code', None) or getattr(getattr(erro, 'response', None), 'status_code', None)
+    return status if isinstance(status, int) else None
+
+
+def reexecutavel(erro):
+    """
+    429 e 5xx (ou as exceções equivalentes do litellm/openai sem status) valem nova tentativa;
+    erro de chave, de requisição ou de código não.
+    """
+    status = _status(erro)
+    if status is not None:
+        return status == 429 or status >= 500
+    nome = type(erro).__name__
+    return any(p in nome for p in ('RateLimit', 'ServiceUnavailable', 'InternalServer', 'Timeout', 'APIConnection'))
+
+
+def _retry_after(erro):
+    cabecalhos = getattr(getattr(erro, 'response', None), 'headers', None) or {}
+    try:
+        return float(cabecalhos.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class _Provedor:
+    # Estado de um provedor; só é alterado com o lock do Agendador
+    def __init__(self, nome, concorrencia, tpm):
+        self.nome = nome
+        self.concorrencia = concorrencia
+        self.tpm = tpm
+        self.fila = deque()
+        self.em_execucao = 0
+        self.tokens = float(tpm)
+        self.atualizado = time.monotonic()
+        self.pausado_ate = 0.0
+        self.evento = None
+        self.estatisticas = {'concluidos': 0, 'falhas': 0, 'retentativas': 0, 'limites_429': 0,
+                             'coalescidos': 0, 'recusados': 0, 'cancelados': 0, 'espera_total_s': 0.0}
+
+    def _repor(self):
+        agora = time.monotonic()
+        self.tokens = min(self.tpm, self.tokens + (agora - self.atualizado) * self.tpm / 60)
+        self.atualizado = agora
+
+    def espera_para(self, pedido):
+        """
+        0 se o pedido pode começar agora; senão quantos segundos esperar (None = até alguém liberar vaga).
+        A fila é estritamente FIFO: só o primeiro da fila é avaliado.
+        """
+        if not self.fila or self.fila[0] is not pedido or self.em_execucao >= self.concorrencia:
+            return None
+        agora = time.monotonic()
+        if agora < self.pausado_ate:
+            return self.pausado_ate - agora
+        self._repor()
+        necessario = min(pedido.estimativa, self.tpm)
+        if self.tokens < necessario:
+            return (necessario - self.tokens) * 60 / self.tpm
+        return 0
+
+
+class Pedido:
+    """
+    Uma requisição agendada. Chamadas idênticas em voo compartilham o mesmo Pedido (coalescência).
+    Para fluxos, os pedaços ficam guardados para que quem chegou depois receba a resposta inteira.
+    """
+
+    def __init__(self, agendador, provedor, estimativa, chave, fluxo):
+        self._agendador = agendador
+        self.provedor = provedor
+        self.estimativa = estimativa
+        self.chave = chave
+        self.fluxo = fluxo
+        self.criado = time.monotonic()
+        self.iniciado = None
+        self.concluido = None
+        self.tentativas = 0
+        self.assinantes = 1
+        self.cancelado = False
+        self.liberado = False
+        self.futuro = Future()
+        self._pedacos = []
+        self._condicao = threading.Condition()
+        self._terminou = False
+
+    @property
+    def espera_s(self):
+        return (self.iniciado or time.monotonic()) - self.criado
+
+    @property
+    def latencia_s(self):
+        # Da submissão ao fim (fila + tentativas); até terminar, o tempo decorrido
+        return (self.concluido or time.monotonic()) - self.criado
+
+    def posicao(self):
+        # 1 = próximo da fila; 0 = já em execução (ou terminado)
+        return self._agendador.posicao(self)
+
+    def _avisar(self, ao_esperar):
+        if ao_esperar is not None and self.iniciado is None:
+            ao_esperar(self.posicao())
+
+    def resultado(self, ao_esperar=None):
+        """
+        Espera o resultado (bloqueia só a thread de quem chamou), informando a posição na fila.
+        Levanta a exceção final se todas as tentativas falharem.
+        """
+        while True:
+            try:
+                return self.futuro.result(timeout=INTERVALO_AVISO_S)
+            except TempoEsgotado:
+                self._avisar(ao_esperar)
+
+    def pedacos(self, ao_esperar=None):
+        # Gera os pedaços do fluxo à medida que chegam (desde o início, mesmo para quem se juntou depois)
+        i = 0
+        while True:
+            with self._condicao:
+                if i >= len(self._pedacos) and not self._terminou:
+                    self._condicao.wait(timeout=INTERVALO_AVISO_S)
+                novos = self._pedacos[i:]
+                terminou = self._terminou
+            i += len(novos)
+            yield from novos
+            if terminou and i >= len(self._pedacos):
+                erro = self.futuro.exception()
+                if erro is not None:
+                    raise erro
+                return
+            if not novos:
+                self._avisar(ao_esperar)
+
+    # --- lado do agendador ---
+    def _publicar(self, pedaco):
+        with self._condicao:
+            self._pedacos.append(pedaco)
+            self._condicao.notify_all()
+
+    def _encerrar(self, resultado=None, erro=None):
+        self.concluido = time.monotonic()
+        if erro is not None:
+            self.futuro.set_exception(erro)
+        else:
+            self.futuro.set_result(resultado)
+        with self._condicao:
+            self._terminou = True
+            self._condicao.notify_all()
+
+
+class Agendador:
+    """
+    Agendador de chamadas de LLM do processo, compartilhado entre todas as sessões do Streamlit.
+
+    Um event loop asyncio numa thread daemon admite as requisições por provedor em ordem FIFO,
+    respeitando o limite de chamadas simultâneas e o orçamento de tokens por minuto. As chamadas
+    bloqueantes (crew.kickoff, litellm.completion) rodam num pool de threads do agendador; 429/5xx
+    são repetidos com espera exponencial com jitter (e um 429 pausa o provedor inteiro). Requisições
+    idênticas em voo (mesma chave e mesma chave de API) são coalescidas numa só.
+    """
+
+    def __init__(self, limites=None, fila_maxima=FILA_MAXIMA, tentativas=TENTATIVAS,
+                 espera_base=ESPERA_BASE_S, espera_maxima=ESPERA_MAXIMA_S):
+        self.limites = limites or {}
+        self.fila_maxima = fila_maxima
+        self.tentativas = tentativas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self._lock = threading.Lock()
+        self._loop = None
+        self._executor = None
+        self._provedores = {}
+        self._em_voo = {}
+
+    def _iniciar(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='agendador-ia', daemon=True).start()
+                self._executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix='agendador-ia')
+
+    def _provedor(self, nome):
+        estado = self._provedores.get(nome)
+        if estado is None:
+            concorrencia, tpm = self.limites.get(nome) or limites_do_provedor(nome)
+            estado = self._provedores[nome] = _Provedor(nome, concorrencia, tpm)
+        return estado
+
+    # --- API PARA AS SESSÕES ---
+    def submeter(self, modelo_nome, funcao, estimativa=0, chave=None, fluxo=False, api_key=None):
+        """
+        Agenda `funcao()` (sem argumentos). Com fluxo=True, `funcao()` devolve um iterável cujos itens
+        são repassados a quem chamou. Devolve o Pedido (o mesmo de uma chamada idêntica já em voo
+        com a mesma `api_key`). Levanta FilaCheia se o provedor já tem `fila_maxima` requisições esperando.
+        """
+        self._iniciar()
+        nome = provedor_do_modelo(modelo_nome)
+        if chave is not None:
+            # Como no pool_ia: sessões com chaves de API diferentes nunca compartilham a chamada
+            # (nem a cota, nem o erro de autenticação de outra pessoa)
+            chave = (hash_chave_api(api_key), chave)
+        with self._lock:
+            estado = self._provedor(nome)
+            if chave is not None and (existente := self._em_voo.get((nome, fluxo, chave))) is not None:
+                existente.assinantes += 1
+                estado.estatisticas['coalescidos'] += 1
+                return existente
+            if len(estado.fila) >= self.fila_maxima:
+                estado.estatisticas['recusados'] += 1
+                raise FilaCheia(f"IA ocupada: {len(estado.fila)} pedidos na fila do provedor {nome}. Tente em instantes.")
+            pedido = Pedido(self, nome, estimativa, chave, fluxo)
+            estado.fila.append(pedido)
+            if chave is not None:
+                self._em_voo[(nome, fluxo, chave)] = pedido
+        asyncio.run_coroutine_threadsafe(self._rodar(estado, pedido, funcao), self._loop)
+        return pedido
+
+    def executar(self, modelo_nome, funcao, estimativa=0, chave=None, ao_esperar=None, api_key=None):
+        """
+        Agenda e espera o resultado. `ao_esperar(posicao)` é chamado na thread de quem pediu enquanto
+        o pedido aguarda na fila.
+        """
+        return self.submeter(modelo_nome, funcao, estimativa, chave, api_key=api_key).resultado(ao_esperar)
+
+    def transmitir(self, modelo_nome, funcao, estimativa=0, chave=None, ao_esperar=None, api_key=None):
+        # Versão para fluxos: gera os itens de `funcao()` conforme chegam
+        yield from self.submeter(modelo_nome, funcao, estimativa, chave, fluxo=True, api_key=api_key).pedacos(ao_esperar)
+
+    def posicao(self, pedido):
+        with self._lock:
+            estado = self._provedores.get(pedido.provedor)
+            try:
+                return estado.fila.index(pedido) + 1
+            except (AttributeError, ValueError):
+                return 0
+
+    def cancelar(self, pedido):
+        """
+        Desiste de um pedido (ex: fatia do relatório que passou do prazo). Se outra sessão coalesceu
+        no mesmo pedido, ele continua para ela. Na fila, sai sem gastar vaga nem tokens; em execução,
+        a chamada em andamento não tem como ser interrompida, mas a vaga do provedor é liberada na
+        hora e não há novas tentativas. Devolve True se o pedido foi cancelado.
+        """
+        with self._lock:
+            if pedido.futuro.done() or pedido.cancelado:
+                return False
+            pedido.assinantes -= 1
+            if pedido.assinantes > 0:
+                return False
+            pedido.cancelado = True
+            estado = self._provedores.get(pedido.provedor)
+            estado.estatisticas['cancelados'] += 1
+            if pedido in estado.fila:
+                estado.fila.remove(pedido)
+            elif pedido.iniciado is not None and not pedido.liberado:
+                pedido.liberado = True
+                estado.em_execucao -= 1
+            if self._em_voo.get((pedido.provedor, pedido.fluxo, pedido.chave)) is pedido:
+                del self._em_voo[(pedido.provedor, pedido.fluxo, pedido.chave)]
+        # Acorda o _admitir do pedido (que desiste) e quem esperava a vaga liberada
+        self._loop.call_soon_threadsafe(self._notificar, estado)
+        return True
+
+    def estatisticas(self):
+        with self._lock:
+            saida = {}
+            for nome, estado in self._provedores.items():
+                estado._repor()
+                saida[nome] = {**estado.estatisticas, 'em_execucao': estado.em_execucao, 'na_fila': len(estado.fila),
+                               'concorrencia': estado.concorrencia, 'tpm': estado.tpm,
+                               'tokens_disponiveis': int(estado.tokens)}
+            return saida
+
+    # --- EVENT LOOP ---
+    def _notificar(self, estado):
+        # Acorda todos os que esperam vaga no provedor (cada espera pega o evento vigente)
+        if estado.evento is not None:
+            estado.evento.set()
+        estado.evento = asyncio.Event()
+
+    async def _admitir(self, estado, pedido):
+        while True:
+            with self._lock:
+                if pedido.cancelado:
+                    raise PedidoCancelado("pedido cancelado antes de começar")
+                espera = estado.espera_para(pedido)
+                if espera == 0:
+                    estado.fila.popleft()
+                    estado.em_execucao += 1
+                    estado.tokens -= pedido.estimativa
+                    pedido.iniciado = time.monotonic()
+                    estado.estatisticas['espera_total_s'] += pedido.espera_s
+                    break
+                if estado.evento is None:
+                    estado.evento = asyncio.Event()
+                evento = estado.evento
+            try:
+                await asyncio.wait_for(evento.wait(), timeout=espera if espera is not None else 1.0)
+            except asyncio.TimeoutError:
+                pass
+        # O próximo da fila pode ter ficado apto agora
+        self._notificar(estado)
+
+    def _chamar(self, pedido, funcao, iniciado):
+        if not pedido.fluxo:
+            return funcao()
+        ultimo = None
+        for item in funcao():
+            iniciado[0] = True
+            ultimo = item
+            pedido._publicar(item)
+        return ultimo
+
+    async def _rodar(self, estado, pedido, funcao):
+        loop = asyncio.get_running_loop()
+        resultado, erro, admitido = None, None, False
+        try:
+            await self._admitir(estado, pedido)
+            admitido = True
+            for tentativa in range(self.tentativas):
+                if pedido.cancelado:
+                    raise PedidoCancelado("pedido cancelado durante as tentativas")
+                pedido.tentativas = tentativa + 1
+                iniciado = [False]
+                try:
+                    resultado = await loop.run_in_executor(self._executor, self._chamar, pedido, funcao, iniciado)
+                    break
+                except Exception as e:
+                    # Fluxo que já entregou texto não pode ser repetido sem duplicar a resposta
+                    if not reexecutavel(e) or iniciado[0] or pedido.cancelado or tentativa == self.tentativas - 1:
+                        raise
+                    espera = _retry_after(e) or random.uniform(0, min(self.espera_maxima, self.espera_base * 2 ** tentativa))
+                    with self._lock:
+                        estado.estatisticas['retentativas'] += 1
+                        if _status(e) == 429 or 'RateLimit' in type(e).__name__:
+                            # Contrapressão: ninguém mais começa neste provedor até a espera passar
+                            estado.estatisticas['limites_429'] += 1
+                            estado.pausado_ate = max(estado.pausado_ate, time.monotonic() + espera)
+                    await asyncio.sleep(espera)
+        except Exception as e:
+            erro = e
+        finally:
+            with self._lock:
+                if not admitido and pedido in estado.fila:
+                    estado.fila.remove(pedido)
+                if admitido and not pedido.liberado:
+                    estado.em_execucao -= 1
+                    usados = _tokens_usados(resultado)
+                    if usados is not None:
+                        estado.tokens -= usados - pedido.estimativa   # acerta a reserva pelo uso real
+                if not pedido.cancelado:
+                    estado.estatisticas['falhas' if erro is not None else 'concluidos'] += 1
+                if self._em_voo.get((pedido.provedor, pedido.fluxo, pedido.chave)) is pedido:
+                    del self._em_voo[(pedido.provedor, pedido.fluxo, pedido.chave)]
+            self._notificar(estado)
+        pedido._encerrar(resultado, erro)
+
+
+agendador_ia = Agendador()
@@ -1,48 +1,61 @@
+import json
+import os
+import time
+from concurrent.futures import wait
+
+import litellm
 from crewai import Agent, Task, Crew, Process, LLM
 
-# --- FUNÇÃO 1: ANÁLISE ESTRATÉGICA DO MENU ---
-def executar_analise_menu(df_dados, api_key, modelo_nome):
-    
-    # Prepara os dados para o prompt
-    csv_data = df_dados.to_csv(index=False, sep=';', decimal=',')
+from src.agendador import INTERVALO_AVISO_S, agendador_ia, estimar_tokens
+from src.cache_ia import RespostaCache, cache_ia_padrao, chave_resposta
+from src.contexto import serializar_compacto
+from src.instrumentacao import medir, registrar
+from src.pool_ia import pool_ia
+from src.preanalise import MAX_ITENS_PROMPT, fatiar, preanalisar, resumo_para_prompt
 
-    # Configura o LLM
-    llm = LLM(model=modelo_nome, api_key=api_key)
+# Incremente ao alterar agentes/tarefas: invalida as respostas guardadas no cache
+VERSAO_PROMPT_ANALISE = 2
+VERSAO_PROMPT_CHAT = 2
 
-    # --- AGENTE 1: O ENGENHEIRO DE MENU (Analítico) ---
-    analista = Agent(
-        role="Engenheiro de Cardápio Sênior",
-        goal="Realizar uma autópsia financeira detalhada, diferenciando produtos de revenda e produção.",
-        backstory="""Você é um especialista em CMV (Custo de Mercadoria Vendida) e Engenharia de Menu.
+# Endpoint alternativo compatível com OpenAI (ex: servidor falso local em benchmarks/llm_falso.py)
+API_BASE = os.getenv('CHEFIA_LLM_API_BASE') or None
+
+# --- PERFIS DOS AGENTES (usados pelo CrewAI e pelo modo streaming) ---
+PERFIL_ANALISTA = dict(
+    role="Engenheiro de Cardápio Sênior",
+    goal="Realizar uma autópsia financeira detalhada, diferenciando produtos de revenda e produção.",
+    backstory="""Você é um especialista em CMV (Custo de Mercadoria Vendida) e Engenharia de Menu.
         Você sabe que uma 'Coca-Cola' (Revenda) tem uma lógica financeira totalmente diferente de um 'Risoto' (Produção/Cozinha).
         
         Seu superpoder é identificar quando um item de cozinha está com margem de item de revenda (o que é um erro fatal) 
-        ou quando um item de revenda está mal precificado.""",
-        llm=llm,
-        verbose=True,
-        allow_delegation=False
-    )
+        ou quando um item de revenda está mal precificado."""
+)
 
-    # --- AGENTE 2: O CONSULTOR DE LUCRO (Assertivo) ---
-    consultor = Agent(
-        role="Consultor de Estratégia de Restaurantes",
-        goal="Dar ordens diretas e planos de ação claros para o dono do restaurante.",
-        backstory="""Você é um consultor pragmático que foca no lucro líquido. 
+PERFIL_CONSULTOR = dict(
+    role="Consultor de Estratégia de Restaurantes",
+    goal="Dar ordens diretas e planos de ação claros para o dono do restaurante.",
+    backstory="""Você é um consultor pragmático que foca no lucro líquido. 
         Você não usa termos vagos como 'talvez' ou 'considere'. Você diz 'Aumente o preço' ou 'Tire do cardápio'.
-        Você traduz a análise técnica em dinheiro no bolso.""",
-        llm=llm,
-        verbose=True,
-        allow_delegation=False
-    )
+        Você traduz a análise técnica em dinheiro no bolso."""
+)
 
-    # --- TAREFA 1: ANÁLISE PROFUNDA ---
-    analisa_performance_cardapio = Task(
-        description=f"""
-        Analise estes dados de vendas e custos (CSV):
-        {csv_data}
+PERFIL_CFO = dict(
+    role="CFO Virtual",
+    goal="Responder perguntas financeiras com precisão baseada nos dados.",
+    backstory="Você é um assistente financeiro que tem acesso aos dados do restaurante. Você é direto e numérico."
+)
+
+# --- DESCRIÇÕES DAS TAREFAS (usadas pelo CrewAI e pelo modo streaming) ---
+def _descricao_analise(resumo):
+    return f"""
+        Analise a pré-análise do cardápio abaixo (dados de vendas e custos já processados):
+        {resumo}
+
+        O tipo de cada item (revenda/produção), o CMV %, o quadrante e os alertas JÁ FORAM CALCULADOS
+        a partir de todos os itens. Não reclassifique nem recalcule: use esses rótulos e números.
 
-        Sua missão é cruzar Popularidade (Vendas) vs Lucratividade (Margem R$) e classificar os itens, 
-        MAS com atenção à natureza do produto:
+        Sua missão é explicar o que os alertas e os agregados significam para o negócio,
+        com atenção à natureza do produto:
 
         1. **ITENS DE REVENDA (Ex: Latas, Long Necks, Água, Doces prontos):**
            - Estes itens têm custo fixo e zero mão de obra.
@@ -55,14 +68,10 @@ def executar_analise_menu(df_dados, api_key, modelo_nome):
            - Identifique 'Oportunidades' (Quebra-cabeça): Pratos de alto lucro que precisam de destaque (foto, descrição).
 
         Saída esperada: Uma análise técnica EM PORTUGUES que cita NOMES dos produtos e compara seus custos vs preços.
-        """,
-        expected_output="Relatório técnico detalhando anomalias de precificação e classificação dos itens.",
-        agent=analista
-    )
+        """
 
-    # --- TAREFA 2: PLANO DE AÇÃO ---
-    gera_recomendacoes_proativas = Task(
-        description="""
+
+DESCRICAO_RECOMENDACOES = """
         Com base na análise técnica, escreva 3 AÇÕES IMEDIATAS para o dono do restaurante.
 
         Regras de Ouro:
@@ -78,52 +87,444 @@ def executar_analise_menu(df_dados, api_key, modelo_nome):
         - Use Markdown (negrito, listas).
         - Valores em reais: 'R$ 10,00'.
         - NUNCA use cifrão ($) isolado ou notação LaTeX.
-        """,
-        expected_output="3 recomendações estratégicas curtas e diretas em Markdown limpo.",
+        """
+
+
+def _descricao_chat(pergunta, csv_contexto):
+    return f"""
+        Responda à pergunta: '{pergunta}'
+        
+        Use APENAS estes dados como base:
+        {csv_contexto}
+
+        Regras:
+        - Se a resposta não estiver nos dados, diga que não sabe.
+        - Use formato 'R$ 0,00'.
+        - Não use LaTeX ou cifrões ($) soltos.
+        """
+
+
+SAIDA_ANALISE = "Relatório técnico detalhando anomalias de precificação e classificação dos itens."
+SAIDA_RECOMENDACOES = "3 recomendações estratégicas curtas e diretas em Markdown limpo."
+SAIDA_CHAT = "Resposta direta em texto simples/markdown."
+
+
+# --- POOL DE CLIENTES E AGENTES (src/pool_ia.py) ---
+def _criar_llm(modelo_nome, api_key):
+    return LLM(model=modelo_nome, api_key=api_key, base_url=API_BASE)
+
+
+def _criar_agentes_analise(llm):
+    # --- AGENTE 1: O ENGENHEIRO DE MENU (Analítico) ---
+    analista = Agent(
+        **PERFIL_ANALISTA,
+        llm=llm,
+        verbose=True,
+        allow_delegation=False
+    )
+
+    # --- AGENTE 2: O CONSULTOR DE LUCRO (Assertivo) ---
+    consultor = Agent(
+        **PERFIL_CONSULTOR,
+        llm=llm,
+        verbose=True,
+        allow_delegation=False
+    )
+
+    return analista, consultor
+
+
+def _tarefas_analise(resumo, analista, consultor):
+    # --- TAREFA 1: ANÁLISE PROFUNDA ---
+    analisa_performance_cardapio = Task(
+        description=_descricao_analise(resumo),
+        expected_output=SAIDA_ANALISE,
+        agent=analista
+    )
+
+    # --- TAREFA 2: PLANO DE AÇÃO ---
+    gera_recomendacoes_proativas = Task(
+        description=DESCRICAO_RECOMENDACOES,
+        expected_output=SAIDA_RECOMENDACOES,
         agent=consultor,
         context=[analisa_performance_cardapio]
     )
 
-    crew = Crew(
-        agents=[analista, consultor],
-        tasks=[analisa_performance_cardapio, gera_recomendacoes_proativas],
-        process=Process.sequential,
-        verbose=True
-    )
+    return [analisa_performance_cardapio, gera_recomendacoes_proativas]
 
-    return crew.kickoff()
 
+def _registrar_uso(resultado, modelo_nome):
+    # CrewOutput.token_usage (UsageMetrics) para o painel de diagnóstico (src/instrumentacao.py)
+    uso = getattr(resultado, 'token_usage', None)
+    if uso is not None:
+        registrar('llm.tokens', modelo=modelo_nome, prompt=getattr(uso, 'prompt_tokens', None),
+                  completion=getattr(uso, 'completion_tokens', None))
 
-# --- FUNÇÃO 2: CHAT RÁPIDO (Mantida simples para velocidade) ---
-def responder_chat_dados(pergunta, df_contexto, api_key, modelo_nome):
+
+def _registrar_fila(pedido, modelo_nome):
+    # Tempo na fila do agendador (src/agendador.py), tentativas e se a chamada foi compartilhada
+    registrar('llm.fila', modelo=modelo_nome, espera_ms=round(pedido.espera_s * 1000, 1),
+              tentativas=pedido.tentativas, coalescido=pedido.assinantes > 1)
+
+
+def _resumo_analise(df_dados):
+    # Cardápio inteiro -> pré-análise local (src/preanalise.py) -> resumo de tamanho limitado para o prompt.
+    # Aceita também a tabela já pré-analisada (o app guarda a sua, com as revendas da ficha técnica)
+    pre = df_dados if 'alertas' in df_dados.columns else preanalisar(df_dados)
+    return resumo_para_prompt(pre)
+
+
+# --- FUNÇÃO 1: ANÁLISE ESTRATÉGICA DO MENU ---
+def executar_analise_menu(df_dados, api_key, modelo_nome, usar_cache=True, ao_esperar=None):
     
-    csv_contexto = df_contexto.to_csv(index=False, sep=';')
-    llm = LLM(model=modelo_nome, api_key=api_key)
+    # Prepara os dados para o prompt
+    resumo = _resumo_analise(df_dados)
+
+    # Mesmos dados + modelo + versão do prompt = mesma resposta, sem gastar tokens
+    chave = chave_resposta('analise_menu', VERSAO_PROMPT_ANALISE, modelo_nome, resumo)
+    if usar_cache and (guardada := cache_ia_padrao().obter(chave)) is not None:
+        return RespostaCache(guardada)
+
+    def rodar():
+        with pool_ia.emprestar('analise', modelo_nome, api_key, _criar_llm, _criar_agentes_analise) as (analista, consultor):
+            tarefas = _tarefas_analise(resumo, analista, consultor)
+            crew = Crew(
+                agents=[analista, consultor],
+                tasks=tarefas,
+                process=Process.sequential,
+                verbose=True
+            )
+            return crew.kickoff()
+
+    # Duas etapas do crew: reserva o prompt duas vezes no orçamento de tokens do provedor
+    pedido = agendador_ia.submeter(modelo_nome, rodar, estimar_tokens(resumo, resumo, saida=2000), chave, api_key=api_key)
+    with medir('llm.analise', modelo=modelo_nome, prompt_chars=len(resumo)):
+        resultado = pedido.resultado(ao_esperar)
+    _registrar_fila(pedido, modelo_nome)
+    _registrar_uso(resultado, modelo_nome)
+
+    if usar_cache:
+        cache_ia_padrao().guardar(chave, str(resultado.raw))
+    return resultado
 
+
+def _criar_agente_chat(llm):
     agente_chat = Agent(
-        role="CFO Virtual",
-        goal="Responder perguntas financeiras com precisão baseada nos dados.",
-        backstory="Você é um assistente financeiro que tem acesso aos dados do restaurante. Você é direto e numérico.",
+        **PERFIL_CFO,
         llm=llm,
         verbose=False
     )
 
+    return (agente_chat,)
+
+
+def _tarefa_chat(pergunta, csv_contexto, agente_chat):
     tarefa_chat = Task(
-        description=f"""
-        Responda à pergunta: '{pergunta}'
-        
-        Use APENAS estes dados como base:
-        {csv_contexto}
+        description=_descricao_chat(pergunta, csv_contexto),
+        expected_output=SAIDA_CHAT,
+        agent=agente_chat
+    )
+
+    return tarefa_chat
+
+
+# --- FUNÇÃO 2: CHAT RÁPIDO (Mantida simples para velocidade) ---
+def responder_chat_dados(pergunta, df_contexto, api_key, modelo_nome, usar_cache=True, ao_esperar=None):
+    
+    csv_contexto = serializar_compacto(df_contexto)
+
+    chave = chave_resposta('chat_dados', VERSAO_PROMPT_CHAT, modelo_nome, pergunta, csv_contexto)
+    if usar_cache and (guardada := cache_ia_padrao().obter(chave)) is not None:
+        return RespostaCache(guardada)
+
+    def rodar():
+        with pool_ia.emprestar('chat', modelo_nome, api_key, _criar_llm, _criar_agente_chat) as (agente_chat,):
+            tarefa_chat = _tarefa_chat(pergunta, csv_contexto, agente_chat)
+            crew = Crew(agents=[agente_chat], tasks=[tarefa_chat], verbose=False)
+            return crew.kickoff()
+
+    pedido = agendador_ia.submeter(modelo_nome, rodar, estimar_tokens(pergunta, csv_contexto), chave, api_key=api_key)
+    with medir('llm.chat', modelo=modelo_nome, prompt_chars=len(csv_contexto)):
+        resultado = pedido.resultado(ao_esperar)
+    _registrar_fila(pedido, modelo_nome)
+    _registrar_uso(resultado, modelo_nome)
+
+    if usar_cache:
+        cache_ia_padrao().guardar(chave, str(resultado.raw))
+    return resultado
+
+
+# --- FUNÇÃO 3: STREAMING (texto chega à interface à medida que é gerado) ---
+def _mensagens(perfil, descricao, saida_esperada, contexto=None):
+    # Mesmo papel/objetivo/história dos agentes do CrewAI, enviados direto ao modelo
+    sistema = f"Você é {perfil['role']}. {perfil['backstory']}\n\nSeu objetivo: {perfil['goal']}"
+    usuario = descricao
+    if contexto:
+        usuario += f"\n\nResultado da etapa anterior:\n{contexto}"
+    usuario += f"\n\nSaída esperada: {saida_esperada}"
+    return [{"role": "system", "content": sistema}, {"role": "user", "content": usuario}]
+
+
+def _transmitir(mensagens, api_key, modelo_nome, metricas, inicio, ao_esperar=None):
+    def abrir():
+        return litellm.completion(
+            model=modelo_nome, messages=mensagens, api_key=api_key, api_base=API_BASE, stream=True,
+            stream_options={"include_usage": True}, drop_params=True   # provedores sem include_usage ignoram a opção
+        )
+
+    # Mesmas mensagens em voo (outra sessão pedindo a mesma coisa) = um só fluxo compartilhado
+    chave = chave_resposta('fluxo', modelo_nome, mensagens)
+    pedido = agendador_ia.submeter(modelo_nome, abrir, estimar_tokens(*(m['content'] for m in mensagens)), chave, fluxo=True,
+                                   api_key=api_key)
+    inicio_chamada = time.perf_counter()
+    primeiro = None
+    for pedaco in pedido.pedacos(ao_esperar):
+        # O último pedaço traz o uso de tokens (quando o provedor suporta include_usage)
+        uso = getattr(pedaco, 'usage', None)
+        if uso is not None:
+            # Tokens de entrada servidos pelo cache de prefixo do provedor (quando ele informa)
+            em_cache = getattr(getattr(uso, 'prompt_tokens_details', None), 'cached_tokens', None)
+            registrar('llm.tokens', modelo=modelo_nome, prompt=getattr(uso, 'prompt_tokens', None),
+                      completion=getattr(uso, 'completion_tokens', None), em_cache=em_cache)
+            metricas.update(tokens_entrada=getattr(uso, 'prompt_tokens', None), tokens_em_cache=em_cache)
+        texto = pedaco.choices[0].delta.content if pedaco.choices else None
+        if texto:
+            metricas.setdefault('ttft_s', time.perf_counter() - inicio)
+            if primeiro is None:
+                primeiro = time.perf_counter() - inicio_chamada
+            yield texto
+    registrar('llm.latencia', modelo=modelo_nome, ttft_ms=round((primeiro or 0) * 1000, 1),
+              total_ms=round((time.perf_counter() - inicio_chamada) * 1000, 1))
+    _registrar_fila(pedido, modelo_nome)
+
+
+def responder_chat_dados_stream(pergunta, df_contexto, api_key, modelo_nome, usar_cache=True, metricas=None,
+                                ao_esperar=None):
+    """
+    Versão em streaming de `responder_chat_dados`: gera pedaços de texto conforme chegam.
+    `metricas` (dict opcional) recebe 'ttft_s' (tempo até o primeiro token), 'total_s' e 'do_cache'.
+    `ao_esperar(posicao)` é chamado enquanto o pedido aguarda na fila do agendador (src/agendador.py).
+    """
+    metricas = {} if metricas is None else metricas
+    inicio = time.perf_counter()
+    csv_contexto = serializar_compacto(df_contexto)
+
+    chave = chave_resposta('chat_dados', VERSAO_PROMPT_CHAT, modelo_nome, pergunta, csv_contexto)
+    metricas['do_cache'] = False
+    if usar_cache and (guardada := cache_ia_padrao().obter(chave)) is not None:
+        metricas.update(do_cache=True, ttft_s=time.perf_counter() - inicio, total_s=time.perf_counter() - inicio)
+        yield guardada
+        return
 
+    mensagens = _mensagens(PERFIL_CFO, _descricao_chat(pergunta, csv_contexto), SAIDA_CHAT)
+    partes = []
+    for texto in _transmitir(mensagens, api_key, modelo_nome, metricas, inicio, ao_esperar):
+        partes.append(texto)
+        yield texto
+    metricas['total_s'] = time.perf_counter() - inicio
+
+    if usar_cache:
+        cache_ia_padrao().guardar(chave, ''.join(partes))
+
+
+def executar_analise_menu_stream(df_dados, api_key, modelo_nome, usar_cache=True, metricas=None,
+                                 ao_esperar=None):
+    """
+    Versão em streaming de `executar_analise_menu`. Gera pares (etapa, texto), com etapa
+    'analise' (Engenheiro de Menu) e depois 'recomendacoes' (Consultor), na mesma ordem do crew.
+    """
+    metricas = {} if metricas is None else metricas
+    inicio = time.perf_counter()
+    resumo = _resumo_analise(df_dados)
+
+    chave = chave_resposta('analise_menu', VERSAO_PROMPT_ANALISE, modelo_nome, resumo)
+    metricas['do_cache'] = False
+    if usar_cache and (guardada := cache_ia_padrao().obter(chave)) is not None:
+        metricas.update(do_cache=True, ttft_s=time.perf_counter() - inicio, total_s=time.perf_counter() - inicio)
+        yield 'recomendacoes', guardada
+        return
+
+    analise = []
+    mensagens = _mensagens(PERFIL_ANALISTA, _descricao_analise(resumo), SAIDA_ANALISE)
+    for texto in _transmitir(mensagens, api_key, modelo_nome, metricas, inicio, ao_esperar):
+        analise.append(texto)
+        yield 'analise', texto
+
+    recomendacoes = []
+    mensagens = _mensagens(PERFIL_CONSULTOR, DESCRICAO_RECOMENDACOES, SAIDA_RECOMENDACOES, contexto=''.join(analise))
+    for texto in _transmitir(mensagens, api_key, modelo_nome, metricas, inicio, ao_esperar):
+        recomendacoes.append(texto)
+        yield 'recomendacoes', texto
+    metricas['total_s'] = time.perf_counter() - inicio
+
+    if usar_cache:
+        cache_ia_padrao().guardar(chave, ''.join(recomendacoes))
+
+
+# --- FUNÇÃO 4: RELATÓRIO EM FATIAS (analista por quadrante/categoria em paralelo + consolidação) ---
+TEMPO_LIMITE_FATIA_S = float(os.getenv('CHEFIA_TEMPO_FATIA', '90'))
+MAX_TOKENS_FATIA = 700            # análise curta por fatia: a consolidação recebe todas juntas
+MAX_TOKENS_RECOMENDACOES = 500    # as 3 ações imediatas
+
+
+def _completar(mensagens, api_key, modelo_nome, max_tokens=None):
+    def chamar():
+        return litellm.completion(model=modelo_nome, messages=mensagens, api_key=api_key, api_base=API_BASE,
+                                  max_tokens=max_tokens, drop_params=True)
+    return chamar
+
+
+def _texto_e_uso(resposta, modelo_nome):
+    uso = getattr(resposta, 'usage', None)
+    if uso is not None:
+        registrar('llm.tokens', modelo=modelo_nome, prompt=getattr(uso, 'prompt_tokens', None),
+                  completion=getattr(uso, 'completion_tokens', None))
+    return resposta.choices[0].message.content or ''
+
+
+def executar_analise_menu_fatiada(df_dados, api_key, modelo_nome, usar_cache=True, metricas=None, ao_esperar=None,
+                                  tempo_limite_s=None):
+    """
+    Relatório em duas fases: o Engenheiro de Menu analisa cada fatia do cardápio (quadrante, ou categoria
+    quando existe) ao mesmo tempo, pelo agendador (src/agendador.py); depois o Consultor consolida tudo
+    nas 3 ações imediatas.
+
+    Fatias que passarem de `tempo_limite_s` ou falharem ficam de fora e a consolidação segue com as
+    demais (resultado parcial); as que passaram do prazo são canceladas no agendador. Devolve dict com 'analises' {fatia: texto}, 'recomendacoes' e 'fatias'
+    (uma linha por fatia: itens, status, latencia_s). `metricas` recebe 'total_s', 'analise_s',
+    'consolidacao_s', 'parcial' e 'do_cache'.
+    """
+    metricas = {} if metricas is None else metricas
+    tempo_limite_s = TEMPO_LIMITE_FATIA_S if tempo_limite_s is None else tempo_limite_s
+    inicio = time.perf_counter()
+    pre = df_dados if 'alertas' in df_dados.columns else preanalisar(df_dados)
+    fatias = fatiar(pre)
+    if not fatias:
+        raise ValueError("Cardápio vazio: nada para analisar.")
+
+    # O limite de itens sinalizados do prompt é dividido entre as fatias: cada análise fica proporcionalmente menor
+    max_itens = max(MAX_ITENS_PROMPT // len(fatias), 5)
+    resumos = {nome: resumo_para_prompt(sub, max_itens) for nome, sub in fatias.items()}
+    chave = chave_resposta('analise_menu_fatiada', VERSAO_PROMPT_ANALISE, modelo_nome, resumos)
+    metricas['do_cache'] = False
+    if usar_cache and (guardada := cache_ia_padrao().obter(chave)) is not None:
+        metricas.update(do_cache=True, parcial=False, total_s=time.perf_counter() - inicio)
+        return json.loads(guardada)
+
+    pedidos = {}
+    for nome, resumo in resumos.items():
+        descricao = f"Recorte do cardápio: {nome}.\n" + _descricao_analise(resumo)
+        mensagens = _mensagens(PERFIL_ANALISTA, descricao, SAIDA_ANALISE)
+        pedidos[nome] = agendador_ia.submeter(
+            modelo_nome, _completar(mensagens, api_key, modelo_nome, MAX_TOKENS_FATIA),
+            estimar_tokens(descricao, saida=MAX_TOKENS_FATIA), chave_resposta('fatia', modelo_nome, mensagens),
+            api_key=api_key
+        )
+
+    # Espera todas as fatias até o prazo, avisando a posição na fila de quem ainda não começou
+    prazo = time.monotonic() + tempo_limite_s
+    pendentes = {p.futuro for p in pedidos.values()}
+    while pendentes and time.monotonic() < prazo:
+        _, pendentes = wait(pendentes, timeout=min(INTERVALO_AVISO_S, max(prazo - time.monotonic(), 0)))
+        if ao_esperar is not None:
+            posicoes = [p.posicao() for p in pedidos.values() if not p.futuro.done()]
+            if posicoes and min(posicoes):
+                ao_esperar(min(posicoes))
+
+    # Prazo vencido: o que não terminou é cancelado (sai da fila ou devolve a vaga do provedor) e, mesmo
+    # que termine depois, não entra no relatório
+    esgotados = {nome for nome, p in pedidos.items() if p.futuro in pendentes}
+    for nome in esgotados:
+        agendador_ia.cancelar(pedidos[nome])
+
+    analises, linhas = {}, []
+    for nome, pedido in pedidos.items():
+        linha = {'fatia': nome, 'itens': len(fatias[nome]), 'alertas': int((fatias[nome]['alertas'] != '').sum())}
+        if nome in esgotados:
+            linha.update(status='tempo esgotado', latencia_s=round(tempo_limite_s, 2))
+        elif pedido.futuro.exception() is not None:
+            linha.update(status=f"erro: {pedido.futuro.exception()}", latencia_s=round(pedido.latencia_s, 2))
+        else:
+            analises[nome] = _texto_e_uso(pedido.futuro.result(), modelo_nome)
+            linha.update(status='ok', latencia_s=round(pedido.latencia_s, 2))
+        _registrar_fila(pedido, modelo_nome)
+        registrar('llm.fatia', modelo=modelo_nome, **linha)
+        linhas.append(linha)
+    metricas['analise_s'] = time.perf_counter() - inicio
+    if not analises:
+        raise RuntimeError("Nenhuma fatia do cardápio foi analisada a tempo. Tente novamente em instantes.")
+
+    faltando = [l['fatia'] for l in linhas if l['status'] != 'ok']
+    contexto = '\n\n'.join(f"### {nome}\n{texto}" for nome, texto in analises.items())
+    if faltando:
+        contexto += f"\n\n(Sem análise para: {', '.join(faltando)}. Não invente dados sobre essas partes.)"
+    panorama = resumo_para_prompt(pre, max_itens=0)
+    mensagens = _mensagens(PERFIL_CONSULTOR, f"{DESCRICAO_RECOMENDACOES}\n\nPanorama do cardápio inteiro:\n{panorama}",
+                           SAIDA_RECOMENDACOES, contexto=contexto)
+    inicio_consolidacao = time.perf_counter()
+    pedido = agendador_ia.submeter(modelo_nome, _completar(mensagens, api_key, modelo_nome, MAX_TOKENS_RECOMENDACOES),
+                                   estimar_tokens(*(m['content'] for m in mensagens), saida=MAX_TOKENS_RECOMENDACOES))
+    with medir('llm.consolidacao', modelo=modelo_nome, fatias=len(analises)):
+        recomendacoes = _texto_e_uso(pedido.resultado(ao_esperar), modelo_nome)
+    _registrar_fila(pedido, modelo_nome)
+
+    metricas.update(consolidacao_s=time.perf_counter() - inicio_consolidacao, total_s=time.perf_counter() - inicio,
+                    parcial=bool(faltando))
+    relatorio = {'analises': analises, 'recomendacoes': recomendacoes, 'fatias': linhas}
+    # Resultado parcial não vai para o cache: a próxima tentativa pode completar as fatias que faltaram
+    if usar_cache and not faltando:
+        cache_ia_padrao().guardar(chave, json.dumps(relatorio, ensure_ascii=False))
+    return relatorio
+
+
+# --- FUNÇÃO 5: CONVERSA COM MEMÓRIA (src/conversa.py) ---
+REGRAS_CONVERSA = """
         Regras:
+        - Responda usando APENAS os dados do cardápio abaixo e o que foi dito nesta conversa.
         - Se a resposta não estiver nos dados, diga que não sabe.
         - Use formato 'R$ 0,00'.
         - Não use LaTeX ou cifrões ($) soltos.
-        """,
-        expected_output="Resposta direta em texto simples/markdown.",
-        agent=agente_chat
-    )
+        """
 
-    crew = Crew(agents=[agente_chat], tasks=[tarefa_chat], verbose=False)
-    
-    return crew.kickoff()
\ No newline at end of file
+
+def _mensagens_conversa(conversa, pergunta, extras=''):
+    # Sistema + dados formam o prefixo estável; depois vêm resumo, turnos recentes e só então a pergunta nova
+    sistema = (f"Você é {PERFIL_CFO['role']}. {PERFIL_CFO['backstory']}\n\nSeu objetivo: {PERFIL_CFO['goal']}\n"
+               f"{REGRAS_CONVERSA}\nSaída esperada: {SAIDA_CHAT}\n\n{conversa.dados}")
+    if extras:
+        pergunta = f"{pergunta}\n\nLinhas do cardápio citadas nesta pergunta:\n{extras}"
+    return [{"role": "system", "content": sistema}, *conversa.historico(), {"role": "user", "content": pergunta}]
+
+
+def responder_conversa_stream(pergunta, conversa, df_dados, versao_dados, api_key, modelo_nome, usar_cache=True,
+                              metricas=None, ao_esperar=None, indice=None):
+    """
+    Chat com memória: usa a `Conversa` da sessão (src/conversa.py), em que o cardápio vai num prefixo
+    fixo por versão dos dados e os turnos antigos viram um resumo. Gera pedaços de texto e, no fim,
+    registra o turno na conversa. `metricas` recebe também 'tokens_entrada' e 'tokens_em_cache'
+    (quando o provedor informa).
+    """
+    metricas = {} if metricas is None else metricas
+    inicio = time.perf_counter()
+    conversa.preparar(df_dados, versao_dados)
+    mensagens = _mensagens_conversa(conversa, pergunta, conversa.linhas_extras(pergunta, df_dados, indice))
+    metricas['prefixo_chars'] = len(mensagens[0]['content'])
+
+    chave = chave_resposta('conversa', VERSAO_PROMPT_CHAT, modelo_nome, mensagens)
+    metricas['do_cache'] = False
+    if usar_cache and (guardada := cache_ia_padrao().obter(chave)) is not None:
+        metricas.update(do_cache=True, ttft_s=time.perf_counter() - inicio, total_s=time.perf_counter() - inicio)
+        conversa.registrar_turno(pergunta, guardada)
+        yield guardada
+        return
+
+    partes = []
+    for texto in _transmitir(mensagens, api_key, modelo_nome, metricas, inicio, ao_esperar):
+        partes.append(texto)
+        yield texto
+    metricas['total_s'] = time.perf_counter() - inicio
+    resposta = ''.join(partes)
+    conversa.registrar_turno(pergunta, resposta)
+
+    if usar_cache:
+        cache_ia_padrao().guardar(chave, resposta)
@@ -0,0 +1,310 @@
+import importlib
+import importlib.util
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from src.cache import hash_conteudo
+from src.dataloader import COLUNAS_NUMERICAS_VENDAS
+from src.historico import GRANULARIDADES, _finalizar, _nome_e_data, _periodo, comparar_vendas, ler_por_loja
+from src.receitas import COLUNAS_FICHA
+
+# O duckdb só é importado ao abrir o banco: o painel não paga o import quando o banco está desligado
+DUCKDB_DISPONIVEL = importlib.util.find_spec('duckdb') is not None
+
+# --- CONFIGURAÇÃO ---
+MOTOR_BANCO = os.getenv('CHEFIA_BANCO_MOTOR', 'duckdb' if DUCKDB_DISPONIVEL else 'sqlite').lower()
+EXTENSOES = {'duckdb': '.duckdb', 'sqlite': '.sqlite3'}
+BANCO_ATIVO_PADRAO = os.getenv('CHEFIA_BANCO_ATIVO', '0') == '1'
+
+COLUNAS_FICHA_BANCO = ['produto_principal', 'produto_componente', 'quantidade', 'unidade', 'valor_custo', 'rendimento']
+COLUNAS_VENDAS_BANCO = ['data', 'mes', 'semana', 'loja', 'produto_nome'] + COLUNAS_NUMERICAS_VENDAS
+COLUNA_PERIODO = {'mensal': 'mes', 'semanal': 'semana'}
+
+# Tipos comuns aos dois motores (o SQLite aceita DOUBLE/BIGINT/DATE pela afinidade de tipo)
+ESQUEMA = [
+    """CREATE TABLE IF NOT EXISTS cardapio (
+        usuario TEXT NOT NULL, ordem BIGINT NOT NULL, produto_nome TEXT NOT NULL,
+        custo_producao DOUBLE, preco_venda DOUBLE, popularidade BIGINT)""",
+    "CREATE INDEX IF NOT EXISTS idx_cardapio_usuario_produto ON cardapio (usuario, produto_nome)",
+    """CREATE TABLE IF NOT EXISTS fichas (
+        usuario TEXT NOT NULL, ordem BIGINT NOT NULL, produto_principal TEXT, produto_componente TEXT,
+        quantidade TEXT, unidade TEXT, valor_custo TEXT, rendimento TEXT)""",
+    "CREATE INDEX IF NOT EXISTS idx_fichas_principal ON fichas (usuario, produto_principal)",
+    "CREATE INDEX IF NOT EXISTS idx_fichas_componente ON fichas (produto_componente)",
+    """CREATE TABLE IF NOT EXISTS precos_insumos (
+        usuario TEXT NOT NULL, ordem BIGINT NOT NULL, ingrediente TEXT NOT NULL, preco_unitario DOUBLE)""",
+    "CREATE INDEX IF NOT EXISTS idx_precos_usuario ON precos_insumos (usuario, ingrediente)",
+    """CREATE TABLE IF NOT EXISTS vendas (
+        data DATE NOT NULL, mes TEXT NOT NULL, semana TEXT NOT NULL, loja TEXT NOT NULL, produto_nome TEXT NOT NULL,
+        vendas_loja DOUBLE, vendas_delivery DOUBLE, receita_loja DOUBLE, receita_delivery DOUBLE)""",
+    "CREATE INDEX IF NOT EXISTS idx_vendas_produto ON vendas (produto_nome)",
+    "CREATE INDEX IF NOT EXISTS idx_vendas_loja_data ON vendas (loja, data)",
+    "CREATE INDEX IF NOT EXISTS idx_vendas_mes ON vendas (mes, loja)",
+    "CREATE INDEX IF NOT EXISTS idx_vendas_semana ON vendas (semana, loja)",
+    """CREATE TABLE IF NOT EXISTS arquivos (
+        chave TEXT PRIMARY KEY, arquivo TEXT, data TEXT, linhas BIGINT, lojas TEXT)""",
+]
+
+
+def caminho_padrao(motor=None):
+    motor = motor or MOTOR_BANCO
+    return os.getenv('CHEFIA_BANCO', os.path.join('dataset', 'chefia' + EXTENSOES.get(motor, '.sqlite3')))
+
+
+def erros_banco():
+    # Exceções dos dois motores, para o app tratar falhas do banco (arquivo travado, disco cheio) de uma vez
+    erros = (sqlite3.Error, OSError)
+    if DUCKDB_DISPONIVEL:
+        erros += (importlib.import_module('duckdb').Error,)
+    return erros
+
+
+class BancoLocal:
+    """
+    Banco embutido com cardápio, fichas técnicas e histórico de vendas: DuckDB quando instalado,
+    senão SQLite (biblioteca padrão). Os dados ficam no arquivo, fora da memória do Python; a sessão
+    carrega só o cardápio do usuário e as consultas do histórico voltam já filtradas e agregadas pelo SQL.
+
+    O histórico tem a mesma interface do HistoricoVendas (ingerir, periodos, lojas, vendas_periodo,
+    comparar_periodos), então o app usa um ou outro sem mudanças.
+    """
+
+    def __init__(self, caminho=None, motor=None):
+        self.motor = (motor or MOTOR_BANCO).lower()
+        if self.motor == 'duckdb' and not DUCKDB_DISPONIVEL:
+            self.motor = 'sqlite'
+        self.caminho = caminho or caminho_padrao(self.motor)
+        self._lock = threading.Lock()
+        self._duckdb = None
+        self._iniciado = False
+
+    # --- CONEXÃO ---
+    def iniciar(self):
+        """
+        Abre o arquivo e cria as tabelas e índices que faltarem. Devolve o próprio banco.
+        """
+        with self._conexao():
+            pass
+        return self
+
+    def _criar(self, con):
+        for comando in ESQUEMA:
+            con.execute(comando)
+
+    @contextmanager
+    def _conexao(self, escrita=False):
+        # DuckDB: uma conexão por processo (o arquivo só aceita um processo gravando) e um cursor por
+        # chamada, que é o jeito seguro de usar entre threads. SQLite: conexão curta por chamada, como no CacheIA.
+        os.makedirs(os.path.dirname(self.caminho) or '.', exist_ok=True)
+        if self.motor == 'duckdb':
+            with self._lock:
+                if self._duckdb is None:
+                    conexao = importlib.import_module('duckdb').connect(self.caminho)
+                    self._criar(conexao)
+                    self._duckdb = conexao
+                con = self._duckdb.cursor()
+        else:
+            con = sqlite3.connect(self.caminho, timeout=10)
+            if not self._iniciado:
+                with self._lock:
+                    if not self._iniciado:
+                        con.execute("PRAGMA journal_mode=WAL")
+                        self._criar(con)
+                        con.commit()
+                        self._iniciado = True
+        try:
+            if not escrita:
+                yield con
+                return
+            # Gravações em série dentro do processo; cada uma é uma transação só (apagar + inserir juntos)
+            with self._lock:
+                if self.motor == 'duckdb':
+                    con.begin()
+                try:
+                    yield con
+                    con.commit()
+                except BaseException:
+                    con.rollback()
+                    raise
+        finally:
+            con.close()
+
+    def _consultar(self, sql, parametros=()):
+        with self._conexao() as con:
+            if self.motor == 'duckdb':
+                return con.execute(sql, list(parametros)).df()
+            return pd.read_sql_query(sql, con, params=list(parametros))
+
+    def _inserir(self, con, tabela, df):
+        colunas = ', '.join(df.columns)
+        if self.motor == 'duckdb':
+            # O DuckDB lê o DataFrame direto (colunar), sem passar linha a linha pelo Python
+            con.register('_novas', df)
+            try:
+                con.execute(f"INSERT INTO {tabela} ({colunas}) SELECT {colunas} FROM _novas")
+            finally:
+                con.unregister('_novas')
+            return
+        linhas = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+        con.executemany(f"INSERT INTO {tabela} ({colunas}) VALUES ({', '.join('?' * len(df.columns))})", linhas)
+
+    # --- CARDÁPIO ---
+    def salvar_cardapio(self, usuario, tabela):
+        """
+        Substitui o cardápio guardado de `usuario` pela tabela da sessão (src/sessao.py), mantendo a ordem.
+        """
+        linhas = pd.DataFrame({
+            'usuario': str(usuario), 'ordem': np.arange(len(tabela), dtype='int64'),
+            'produto_nome': tabela['produto_nome'].astype(str).to_numpy(),
+            'custo_producao': tabela['custo_producao'].to_numpy(dtype='float64').round(4),
+            'preco_venda': tabela['preco_venda'].to_numpy(dtype='float64').round(4),
+            'popularidade': tabela['popularidade'].to_numpy(dtype='int64'),
+        })
+        with self._conexao(escrita=True) as con:
+            con.execute("DELETE FROM cardapio WHERE usuario = ?", [str(usuario)])
+            if len(linhas):
+                self._inserir(con, 'cardapio', linhas)
+
+    def carregar_cardapio(self, usuario):
+        # Colunas do backup; o app passa pelo tipar() antes de guardar na sessão
+        return self._consultar(
+            "SELECT produto_nome, custo_producao, preco_venda, popularidade FROM cardapio WHERE usuario = ? ORDER BY ordem",
+            [str(usuario)]
+        )
+
+    # --- FICHAS TÉCNICAS E PREÇOS DE INSUMOS ---
+    def salvar_ficha(self, usuario, ficha):
+        """
+        Guarda a ficha técnica crua (receitas.ler_ficha) de `usuario`, na ordem do arquivo. Os preços de
+        insumos da ficha anterior são descartados junto.
+        """
+        df = ficha.copy()
+        df.columns = df.columns.str.replace('"', '').str.strip().str.lower()
+        df = df.rename(columns=COLUNAS_FICHA)
+        linhas = pd.DataFrame({'usuario': str(usuario), 'ordem': np.arange(len(df), dtype='int64')}, index=df.index)
+        for coluna in COLUNAS_FICHA_BANCO:
+            linhas[coluna] = df[coluna].astype('object') if coluna in df.columns else None
+        with self._conexao(escrita=True) as con:
+            con.execute("DELETE FROM fichas WHERE usuario = ?", [str(usuario)])
+            con.execute("DELETE FROM precos_insumos WHERE usuario = ?", [str(usuario)])
+            if len(linhas):
+                self._inserir(con, 'fichas', linhas.reset_index(drop=True))
+
+    def ficha(self, usuario):
+        # Colunas que o arquivo original não tinha (ex: rendimento) voltam ausentes, não vazias
+        ficha = self._consultar(f"SELECT {', '.join(COLUNAS_FICHA_BANCO)} FROM fichas WHERE usuario = ? ORDER BY ordem",
+                                [str(usuario)])
+        return ficha.dropna(axis=1, how='all') if len(ficha) else ficha
+
+    def guardar_precos_insumos(self, usuario, precos):
+        """
+        Acrescenta uma lista de preços aplicada ao grafo (Series preço por insumo, como a de
+        receitas.ler_tabela_precos). Só os preços informados são guardados, não os médios do grafo:
+        reaplicar as listas em ordem reproduz os custos exatos de cada receita.
+        """
+        precos = pd.Series(precos).dropna()
+        with self._conexao(escrita=True) as con:
+            ultima = con.execute("SELECT COALESCE(MAX(ordem), -1) FROM precos_insumos WHERE usuario = ?",
+                                 [str(usuario)]).fetchone()[0]
+            linhas = pd.DataFrame({
+                'usuario': str(usuario), 'ordem': np.arange(len(precos), dtype='int64') + int(ultima) + 1,
+                'ingrediente': precos.index.astype(str).to_numpy(), 'preco_unitario': precos.to_numpy(dtype='float64'),
+            })
+            if len(linhas):
+                self._inserir(con, 'precos_insumos', linhas)
+
+    def precos_insumos(self, usuario):
+        # Último preço de cada insumo, na ordem em que foram aplicados
+        precos = self._consultar("SELECT ingrediente, preco_unitario FROM precos_insumos WHERE usuario = ? ORDER BY ordem",
+                                 [str(usuario)])
+        return precos.drop_duplicates('ingrediente', keep='last').set_index('ingrediente')['preco_unitario']
+
+    # --- HISTÓRICO DE VENDAS ---
+    def ingerir(self, arquivo, data_ref=None, loja=None, nome=None):
+        """
+        Acrescenta uma exportação de vendas, como HistoricoVendas.ingerir (mesmo leitor, com o encoding
+        farejado): somada por loja e produto, com o período (mês e semana ISO) gravado na linha.
+        Conteúdo já ingerido é ignorado.
+        """
+        nome, data_ref = _nome_e_data(arquivo, data_ref, nome)
+        chave = hash_conteudo(arquivo)
+        with self._conexao(escrita=True) as con:
+            existente = con.execute("SELECT arquivo, data, linhas, lojas FROM arquivos WHERE chave = ?", [chave]).fetchone()
+            if existente is not None:
+                return {'status': 'ignorado', 'arquivo': nome, 'motivo': 'conteúdo já ingerido',
+                        'data': existente[1], 'linhas': int(existente[2]), 'lojas': json.loads(existente[3])}
+
+            por_loja = ler_por_loja(arquivo, loja)
+            if por_loja.empty:
+                raise ValueError(f"'{nome}' não tem o layout de vendas esperado (coluna PRODUTO DE VENDA).")
+            por_loja['data'] = data_ref.isoformat()
+            por_loja['mes'] = _periodo([data_ref], 'mensal').iloc[0]
+            por_loja['semana'] = _periodo([data_ref], 'semanal').iloc[0]
+            self._inserir(con, 'vendas', por_loja[COLUNAS_VENDAS_BANCO])
+
+            registro = {'arquivo': nome, 'data': data_ref.isoformat(), 'linhas': int(len(por_loja)),
+                        'lojas': sorted(por_loja['loja'].unique().tolist())}
+            con.execute("INSERT INTO arquivos (chave, arquivo, data, linhas, lojas) VALUES (?, ?, ?, ?, ?)",
+                        [chave, nome, registro['data'], registro['linhas'], json.dumps(registro['lojas'], ensure_ascii=False)])
+        return {'status': 'ingerido', **registro}
+
+    def periodos(self, granularidade='mensal'):
+        coluna = _coluna_periodo(granularidade)
+        return self._consultar(f"SELECT DISTINCT {coluna} AS periodo FROM vendas ORDER BY periodo")['periodo'].tolist()
+
+    def lojas(self):
+        return self._consultar("SELECT DISTINCT loja FROM vendas ORDER BY loja")['loja'].tolist()
+
+    def arquivos_ingeridos(self):
+        df = self._consultar("SELECT arquivo, data, linhas, lojas FROM arquivos ORDER BY data, arquivo")
+        df['lojas'] = df['lojas'].map(json.loads)
+        return df
+
+    def vendas_periodo(self, inicio=None, fim=None, lojas=None, granularidade='mensal'):
+        """
+        Vendas por produto somadas entre os períodos `inicio` e `fim` (inclusive), no formato do
+        filtrar_vendas. Filtro e soma rodam no banco: só uma linha por produto chega ao pandas.
+        """
+        coluna = _coluna_periodo(granularidade)
+        filtros, parametros = [], []
+        if inicio is not None:
+            filtros.append(f"{coluna} >= ?")
+            parametros.append(inicio)
+        if fim is not None:
+            filtros.append(f"{coluna} <= ?")
+            parametros.append(fim)
+        if lojas:
+            filtros.append(f"loja IN ({', '.join('?' * len(lojas))})")
+            parametros += [str(l).upper() for l in lojas]
+        onde = f"WHERE {' AND '.join(filtros)}" if filtros else ''
+        somas = ', '.join(f"SUM({c}) AS {c}" for c in COLUNAS_NUMERICAS_VENDAS)
+        por_produto = self._consultar(f"SELECT produto_nome, {somas} FROM vendas {onde} GROUP BY produto_nome", parametros)
+        por_produto[COLUNAS_NUMERICAS_VENDAS] = por_produto[COLUNAS_NUMERICAS_VENDAS].astype('float64')
+        return _finalizar(por_produto)
+
+    def comparar_periodos(self, periodo_a, periodo_b, lojas=None, granularidade='mensal'):
+        a = self.vendas_periodo(periodo_a, periodo_a, lojas, granularidade)
+        b = self.vendas_periodo(periodo_b, periodo_b, lojas, granularidade)
+        return comparar_vendas(a, b, periodo_a, periodo_b)
+
+
+def _coluna_periodo(granularidade):
+    if granularidade not in GRANULARIDADES:
+        raise ValueError(f"Granularidade deve ser uma de {GRANULARIDADES}.")
+    return COLUNA_PERIODO[granularidade]
+
+
+_banco_padrao = None
+
+
+def banco_padrao():
+    global _banco_padrao
+    if _banco_padrao is None:
+        _banco_padrao = BancoLocal().iniciar()
+    return _banco_padrao
@@ -0,0 +1,168 @@
+import hashlib
+import os
+import uuid
+
+import pandas as pd
+
+from src.instrumentacao import contar
+
+try:
+    import pyarrow  # noqa: F401 (motor Parquet do pandas)
+    PARQUET_DISPONIVEL = True
+except ImportError:
+    PARQUET_DISPONIVEL = False
+
+# --- CONFIGURAÇÃO ---
+DIRETORIO_CACHE = os.getenv('CHEFIA_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'chefia'))
+LIMITE_CACHE_MB = int(os.getenv('CHEFIA_CACHE_MB', '512'))
+TAMANHO_BLOCO_HASH = 1024 * 1024
+
+
+def hash_conteudo(arquivo):
+    """
+    Hash BLAKE2b do conteúdo de um caminho ou de um arquivo aberto (ex: UploadedFile do Streamlit).
+    Arquivos abertos voltam para a posição inicial depois da leitura.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    if isinstance(arquivo, (str, os.PathLike)):
+        with open(arquivo, 'rb') as f:
+            for bloco in iter(lambda: f.read(TAMANHO_BLOCO_HASH), b''):
+                h.update(bloco)
+    elif isinstance(arquivo, (bytes, bytearray, memoryview)):
+        h.update(arquivo)
+    else:
+        posicao = arquivo.tell()
+        arquivo.seek(0)
+        for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO_HASH), b''):
+            h.update(bloco if isinstance(bloco, bytes) else bloco.encode('utf-8'))
+        arquivo.seek(posicao)
+    return h.hexdigest()
+
+
+def hash_parametros(parametros):
+    """
+    Hash estável dos argumentos extras do parser: chaves ordenadas, valores pelo repr.
+    """
+    texto = repr(sorted((str(k), repr(v)) for k, v in parametros.items()))
+    return hashlib.blake2b(texto.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class CacheColunar:
+    """
+    Cache em disco de DataFrames já limpos, endereçado pelo conteúdo do arquivo de origem.
+
+    Cada entrada é um Parquet nomeado por hash(conteúdo) + parser + versão do parser (+ hash dos
+    argumentos extras do parser, quando houver); um acerto é lido com memory-map. O mtime dos
+    arquivos serve de relógio LRU e as entradas menos usadas são removidas quando o diretório passa de `limite_mb`.
+    """
+
+    def __init__(self, diretorio=None, limite_mb=None):
+        self.diretorio = diretorio or DIRETORIO_CACHE
+        self.limite_bytes = (limite_mb if limite_mb is not None else LIMITE_CACHE_MB) * 1024 * 1024
+        self.acertos = 0
+        self.faltas = 0
+
+    def chave(self, arquivo, nome_parser, versao, parametros=None):
+        chave = f"{nome_parser}-v{versao}-{hash_conteudo(arquivo)}"
+        if parametros:
+            # Mesmo arquivo lido com argumentos diferentes (ex: chunksize) não pode dividir a entrada
+            chave += f"-{hash_parametros(parametros)}"
+        return chave
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, f"{chave}.parquet")
+
+    def obter(self, chave):
+        caminho = self._caminho(chave)
+        if not PARQUET_DISPONIVEL or not os.path.exists(caminho):
+            self.faltas += 1
+            return None
+        try:
+            df = pd.read_parquet(caminho, engine='pyarrow', memory_map=True)
+        except Exception:
+            # Entrada corrompida (ex: processo interrompido): descarta e reprocessa
+            self._remover(caminho)
+            self.faltas += 1
+            return None
+        try:
+            os.utime(caminho)
+        except OSError:
+            pass
+        self.acertos += 1
+        return df
+
+    def guardar(self, chave, df):
+        if not PARQUET_DISPONIVEL or df is None or df.empty:
+            return
+        caminho = self._caminho(chave)
+        # Escrita atômica: outro processo nunca lê um Parquet pela metade
+        temporario = f"{caminho}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(self.diretorio, exist_ok=True)
+            df.reset_index(drop=True).to_parquet(temporario, engine='pyarrow', index=False)
+            os.replace(temporario, caminho)
+        except OSError:
+            # Sem espaço ou sem permissão: o cache é só uma otimização
+            self._remover(temporario)
+            return
+        self._despejar()
+
+    def _remover(self, caminho):
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+
+    def _despejar(self):
+        entradas = []
+        with os.scandir(self.diretorio) as it:
+            for e in it:
+                if e.name.endswith('.parquet'):
+                    try:
+                        st = e.stat()
+                    except OSError:
+                        continue
+                    entradas.append((st.st_mtime, st.st_size, e.path))
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        for _, tamanho, caminho in sorted(entradas):
+            if total <= self.limite_bytes:
+                break
+            self._remover(caminho)
+            total -= tamanho
+
+    def limpar(self):
+        if os.path.isdir(self.diretorio):
+            for nome in os.listdir(self.diretorio):
+                if nome.endswith('.parquet'):
+                    self._remover(os.path.join(self.diretorio, nome))
+
+
+_cache_padrao = None
+
+
+def cache_padrao():
+    global _cache_padrao
+    if _cache_padrao is None:
+        _cache_padrao = CacheColunar()
+    return _cache_padrao
+
+
+def carregar_com_cache(arquivo, parser, nome_parser, versao, cache=None, **kwargs):
+    """
+    Executa `parser(arquivo, **kwargs)` apenas se o mesmo conteúdo ainda não foi processado
+    por esta versão do parser com os mesmos kwargs; caso contrário devolve o resultado guardado em disco.
+    """
+    cache = cache or cache_padrao()
+    if not PARQUET_DISPONIVEL:
+        return parser(arquivo, **kwargs)
+
+    chave = cache.chave(arquivo, nome_parser, versao, kwargs)
+    df = cache.obter(chave)
+    if df is not None:
+        contar('cache_parquet.acerto')
+        return df
+    contar('cache_parquet.falta')
+
+    df = parser(arquivo, **kwargs)
+    cache.guardar(chave, df)
+    return df
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from src.cache import DIRETORIO_CACHE
+from src.instrumentacao import contar
+
+# --- CONFIGURAÇÃO ---
+CAMINHO_CACHE_IA = os.getenv('CHEFIA_CACHE_IA', os.path.join(DIRETORIO_CACHE, 'respostas_ia.sqlite3'))
+TTL_CACHE_IA_HORAS = float(os.getenv('CHEFIA_CACHE_IA_TTL_HORAS', '168'))
+LIMITE_CACHE_IA_MB = float(os.getenv('CHEFIA_CACHE_IA_MB', '64'))
+
+
+class RespostaCache:
+    """
+    Resposta recuperada do cache. Expõe `.raw` como o CrewOutput, para que o app trate
+    as duas origens da mesma forma, e `do_cache` para sinalizar a origem na interface.
+    """
+
+    do_cache = True
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def __str__(self):
+        return self.raw
+
+
+def chave_resposta(*partes):
+    # Hash canônico das partes que definem a resposta (dados enviados, pergunta, modelo, versão do prompt)
+    texto = json.dumps(partes, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+class CacheIA:
+    """
+    Cache persistente de respostas da IA em SQLite, compartilhado entre sessões e processos.
+
+    Entradas expiram após `ttl_horas`; quando o total de texto guardado passa de `limite_mb`,
+    as respostas acessadas há mais tempo são removidas primeiro.
+    """
+
+    def __init__(self, caminho=None, ttl_horas=None, limite_mb=None):
+        self.caminho = caminho or CAMINHO_CACHE_IA
+        self.ttl_segundos = (ttl_horas if ttl_horas is not None else TTL_CACHE_IA_HORAS) * 3600
+        self.limite_bytes = int((limite_mb if limite_mb is not None else LIMITE_CACHE_IA_MB) * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._iniciado = False
+        self.acertos = 0
+        self.faltas = 0
+        self.erros = 0
+
+    def _conectar(self):
+        conn = sqlite3.connect(self.caminho, timeout=10)
+        if not self._iniciado:
+            with self._lock:
+                if not self._iniciado:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS respostas (
+                            chave TEXT PRIMARY KEY,
+                            resposta TEXT NOT NULL,
+                            criado REAL NOT NULL,
+                            acessado REAL NOT NULL,
+                            tamanho INTEGER NOT NULL
+                        )""")
+                    conn.execute("CREATE INDEX IF NOT EXISTS idx_respostas_acessado ON respostas (acessado)")
+                    conn.commit()
+                    self._iniciado = True
+        return conn
+
+    def _falta(self, erro=False):
+        # Erro de SQLite também é falta (a IA vai ser chamada); o contador de erros mostra o cache doente
+        self.faltas += 1
+        contar('cache_ia.falta')
+        if erro:
+            self.erros += 1
+            contar('cache_ia.erro')
+
+    def obter(self, chave):
+        try:
+            conn = self._conectar()
+        except sqlite3.Error:
+            self._falta(erro=True)
+            return None
+        try:
+            agora = time.time()
+            linha = conn.execute(
+                "SELECT resposta FROM respostas WHERE chave = ? AND criado >= ?",
+                (chave, agora - self.ttl_segundos)
+            ).fetchone()
+            if linha is None:
+                self._falta()
+                return None
+            conn.execute("UPDATE respostas SET acessado = ? WHERE chave = ?", (agora, chave))
+            conn.commit()
+            self.acertos += 1
+            contar('cache_ia.acerto')
+            return linha[0]
+        except sqlite3.Error:
+            self._falta(erro=True)
+            return None
+        finally:
+            conn.close()
+
+    def guardar(self, chave, resposta):
+        if not resposta:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.caminho) or '.', exist_ok=True)
+            conn = self._conectar()
+        except (OSError, sqlite3.Error):
+            self.erros += 1
+            contar('cache_ia.erro')
+            return
+        try:
+            agora = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO respostas (chave, resposta, criado, acessado, tamanho) VALUES (?, ?, ?, ?, ?)",
+                (chave, resposta, agora, agora, len(resposta.encode('utf-8')))
+            )
+            self._despejar(conn, agora)
+            conn.commit()
+        except sqlite3.Error:
+            self.erros += 1
+            contar('cache_ia.erro')
+        finally:
+            conn.close()
+
+    def _despejar(self, conn, agora):
+        conn.execute("DELETE FROM respostas WHERE criado < ?", (agora - self.ttl_segundos,))
+        total = conn.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0]
+        if total <= self.limite_bytes:
+            return
+        excesso = total - self.limite_bytes
+        removidas = []
+        for chave, tamanho in conn.execute("SELECT chave, tamanho FROM respostas ORDER BY acessado"):
+            if excesso <= 0:
+                break
+            removidas.append((chave,))
+            excesso -= tamanho
+        conn.executemany("DELETE FROM respostas WHERE chave = ?", removidas)
+
+
+_cache_padrao = None
+
+
+def cache_ia_padrao():
+    global _cache_padrao
+    if _cache_padrao is None:
+        _cache_padrao = CacheIA()
+    return _cache_padrao
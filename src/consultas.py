@@ -0,0 +1,250 @@
+import re
+import unicodedata
+
+import numpy as np
+
+# --- VOCABULÁRIO DAS PERGUNTAS ---
+# Ordem importa: a primeira métrica encontrada na pergunta é a usada
+METRICAS = [
+    ('receita_total', r'faturamento|faturou|faturam|receita|fatura|vendeu mais em reais'),
+    ('lucratividade', r'lucro|lucrativ\w*|margem|margens|lucratividade|rentave\w*|rentabilidade'),
+    ('custo_producao', r'custo|custa|custam|cmv'),
+    ('preco_venda', r'preco|precos|caro|caros|barato|baratos'),
+    ('popularidade', r'vendas|vendido|vendidos|vendida|vendidas|vende|vendem|venda|popularidade|pedido|pedidos|saida|quantidade'
+                     r'|(?<=mais )populares?|(?<=menos )populares?'),
+]
+NOMES_METRICAS = {
+    'receita_total': 'faturamento',
+    'lucratividade': 'lucro unitário',
+    'custo_producao': 'custo',
+    'preco_venda': 'preço',
+    'popularidade': 'volume de vendas',
+}
+METRICAS_EM_REAIS = {'receita_total', 'lucratividade', 'custo_producao', 'preco_venda'}
+
+QUADRANTES_PERGUNTA = [
+    ('⭐ Estrela', r'estrelas?'),
+    ('🛒 Popular', r'(?<!mais )(?<!menos )populares|(?<!mais )(?<!menos )popular\b(?! ?idade)'),
+    ('💎 Oportunidade', r'oportunidades?'),
+    ('⚠️ Crítico', r'criticos?'),
+]
+
+RE_MAIOR = re.compile(r'\b(maior|maiores|mais|melhor|melhores|campe\w+|caro|caros)\b')
+RE_MENOR = re.compile(r'\b(menor|menores|menos|pior|piores|barato|baratos)\b')
+RE_TOP_N = re.compile(r'\b(?:top|os|as)\s*(\d{1,3})\b|\b(\d{1,3})\s+(?:produtos|itens|pratos|mais|menos|maiores|menores|melhores|piores)\b')
+RE_CONTAGEM = re.compile(r'\bquant[oa]s\b')
+RE_MEDIA = re.compile(r'\bmedi[ao]s?\b')
+RE_TOTAL = re.compile(r'\b(total|soma|somado|geral)\b')
+RE_LISTAR = re.compile(r'\b(quais|liste|listar|lista|mostre|mostrar)\b')
+# Perguntas de opinião/estratégia vão sempre para a IA, mesmo citando uma métrica
+RE_ABERTA = re.compile(
+    r'\b(como|por que|porque|pq|devo|deveria|sugest\w*|sugira|recomend\w*|estrateg\w*|melhorar|aumentar|'
+    r'reduzir|diminuir|o que fazer|vale a pena|analise|explique|explica|compare|opiniao|ideia|ideias|dica|dicas)\b'
+)
+RE_FILTRO_PRODUTO = re.compile(r'\b(?:do|da|de|dos|das|no|na|para o|para a)\s+([a-z0-9][a-z0-9 ]*)$')
+# O cardápio não tem datas nem canais: perguntas por período ou canal vão para a IA
+RE_PERIODO = re.compile(
+    r'\b(dia|dias|diari\w*|semana|semanas|semanal|mes|meses|mensal|ano|anos|anual|trimestre\w*|periodo|hoje|ontem|'
+    r'ultim\w*|passad\w*|janeiro|fevereiro|marco|abril|maio|junho|julho|agosto|setembro|outubro|novembro|dezembro|'
+    r'natal|feriado\w*|fim de semana)\b'
+)
+RE_CANAL = re.compile(r'\b(delivery|ifood|entrega\w*|balcao|salao|frente de loja|online|aplicativo|app)\b')
+
+PALAVRAS_VAZIAS = {
+    'o', 'a', 'os', 'as', 'um', 'uma', 'de', 'do', 'da', 'dos', 'das', 'e', 'em', 'no', 'na', 'com', 'por',
+    'qual', 'quais', 'que', 'produto', 'produtos', 'item', 'itens', 'prato', 'pratos', 'cardapio', 'menu',
+    'total', 'media', 'medio', 'meu', 'minha', 'nosso', 'nossa', 'hoje', 'loja',
+}
+
+# Palavras de ligação que o roteador entende; qualquer outra palavra que nenhuma regra usou manda a pergunta à IA
+PALAVRAS_ESTRUTURA = {
+    'quanto', 'quanta', 'quantos', 'quantas', 'quais', 'qual', 'e', 'eu', 'tenho', 'tem', 'temos', 'ha', 'existe',
+    'existem', 'sao', 'foi', 'foram', 'esta', 'estao', 'me', 'mostre', 'diga', 'top', 'liste', 'lista', 'listar',
+    'mostrar', 'classificado', 'classificados', 'classificadas', 'ao', 'aos', 'todo', 'todos', 'todas', 'geral',
+    'no', 'na', 'nos', 'nas', 'para', 'pelo', 'pela', 'ser', 'seu', 'sua', 'la', 'aqui', 'agora', 'atual',
+}
+PADROES_ENTENDIDOS = [re.compile(rf'(?:{p})') for _, p in METRICAS + QUADRANTES_PERGUNTA]
+
+LIMITE_LISTA = 20
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode('ascii')
+    texto = re.sub(r'[^a-z0-9 ]+', ' ', texto.lower())
+    return re.sub(r' +', ' ', texto).strip()
+
+
+def formatar_valor(valor, coluna):
+    if coluna in METRICAS_EM_REAIS:
+        return 'R$ ' + f"{valor:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+    if float(valor).is_integer():
+        return f"{int(valor):,}".replace(',', '.')
+    return f"{valor:,.1f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def _metrica(pergunta):
+    for coluna, padrao in METRICAS:
+        if re.search(rf'\b(?:{padrao})\b', pergunta):
+            return coluna
+    return None
+
+
+def _quadrante(pergunta):
+    for quadrante, padrao in QUADRANTES_PERGUNTA:
+        if re.search(rf'\b(?:{padrao})', pergunta):
+            return quadrante
+    return None
+
+
+def normalizar_serie(nomes):
+    # Versão vetorizada de normalizar() para a coluna inteira de nomes
+    return (
+        nomes.astype(str).str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+        .str.lower().str.replace(r'[^a-z0-9 ]+', ' ', regex=True).str.replace(r' +', ' ', regex=True).str.strip()
+    )
+
+
+def _filtro_produto(pergunta, df):
+    # "margem média do pastel" -> máscara dos produtos cujo nome contém as palavras citadas
+    m = RE_FILTRO_PRODUTO.search(pergunta)
+    if not m:
+        return None, None
+    palavras = [p for p in m.group(1).split() if p not in PALAVRAS_VAZIAS and not re.fullmatch(
+        '|'.join(p for _, p in METRICAS), p)]
+    if not palavras:
+        return None, None
+    nomes_norm = normalizar_serie(df['produto_nome'])
+    mascara = np.ones(len(df), dtype=bool)
+    usadas = []
+    for p in palavras:
+        # Palavras que não aparecem em nenhum nome ("eu", "tenho") são ignoradas
+        contem = nomes_norm.str.contains(p, regex=False).to_numpy()
+        if contem.any() and (mascara & contem).any():
+            mascara &= contem
+            usadas.append(p)
+    if not usadas:
+        return None, None
+    return mascara, ' '.join(usadas)
+
+
+def _top_n(pergunta):
+    m = RE_TOP_N.search(pergunta)
+    if not m:
+        return None
+    n = int(m.group(1) or m.group(2))
+    return n if 1 <= n <= 100 else None
+
+
+def _sobras(q, termo):
+    """
+    Palavras da pergunta que nenhuma regra do roteador usou (nem métrica, quadrante, ranking, agregação
+    ou filtro de produto). Com sobras, a resposta local ignoraria parte do que foi perguntado.
+    """
+    usadas = set(termo.split()) if termo else set()
+    n = _top_n(q)
+    sobras = []
+    for palavra in q.split():
+        if palavra in PALAVRAS_VAZIAS or palavra in PALAVRAS_ESTRUTURA or palavra in usadas:
+            continue
+        if palavra.isdigit() and n is not None and int(palavra) == n:
+            continue
+        if any(r.fullmatch(palavra) for r in (RE_MAIOR, RE_MENOR, RE_CONTAGEM, RE_MEDIA, RE_TOTAL, RE_LISTAR)):
+            continue
+        if any(p.fullmatch(palavra) for p in PADROES_ENTENDIDOS):
+            continue
+        sobras.append(palavra)
+    return sobras
+
+
+def _linha_item(linha, coluna):
+    return f"**{linha['produto_nome']}**: {formatar_valor(linha[coluna], coluna)}"
+
+
+def responder_localmente(pergunta, df):
+    """
+    Responde perguntas numéricas comuns (ranking, contagem, média, total, filtro por produto)
+    com pandas sobre o cardápio inteiro. Devolve o texto em Markdown ou None quando a pergunta
+    é aberta, tem filtro numérico, período ou canal, ou traz palavras que as regras não usaram:
+    nesses casos ela deve ir para a IA, em vez de receber uma resposta confiante e errada.
+    """
+    # Import local: src.contexto importa este módulo
+    from src.contexto import tem_filtro_numerico
+
+    if df is None or df.empty:
+        return None
+    q = normalizar(pergunta)
+    if not q or RE_ABERTA.search(q) or RE_PERIODO.search(q) or RE_CANAL.search(q) or tem_filtro_numerico(q):
+        return None
+
+    metrica = _metrica(q)
+    quadrante = _quadrante(q)
+    mascara, termo = _filtro_produto(q, df)
+    if _sobras(q, termo):
+        return None
+
+    # 1. Contagem: "quantos itens críticos?", "quantos produtos tenho?"
+    if RE_CONTAGEM.search(q) and metrica is None:
+        if quadrante is not None:
+            n = int((df['classificacao'] == quadrante).sum()) if 'classificacao' in df.columns else None
+            if n is None:
+                return None
+            return f"Você tem **{n}** {'item' if n == 1 else 'itens'} classificados como **{quadrante}** (de {len(df)} no cardápio)."
+        if mascara is not None:
+            return f"Há **{int(mascara.sum())}** itens com \"{termo.upper()}\" no nome."
+        return f"Seu cardápio tem **{len(df)}** itens."
+
+    # 2. Listagem de quadrante: "quais são os itens críticos?"
+    if quadrante is not None and metrica is None and RE_LISTAR.search(q) and 'classificacao' in df.columns:
+        itens = df.loc[df['classificacao'] == quadrante, 'produto_nome'].astype(str)
+        if itens.empty:
+            return f"Nenhum item está classificado como **{quadrante}**."
+        lista = '\n'.join(f"- {nome}" for nome in itens.head(LIMITE_LISTA))
+        resto = f"\n\n…e mais {len(itens) - LIMITE_LISTA} itens." if len(itens) > LIMITE_LISTA else ''
+        return f"**{len(itens)}** itens em **{quadrante}**:\n\n{lista}{resto}"
+
+    if metrica is None:
+        return None
+
+    base = df
+    if quadrante is not None and 'classificacao' in df.columns:
+        base = df[df['classificacao'] == quadrante]
+    if mascara is not None:
+        base = base[mascara[df.index.get_indexer(base.index)]]
+    if base.empty:
+        return None
+    valores = base[metrica].astype('float64')
+    nome = NOMES_METRICAS[metrica]
+    escopo = f" de \"{termo.upper()}\"" if termo else (f" entre os itens **{quadrante}**" if quadrante else '')
+
+    maior = RE_MAIOR.search(q)
+    menor = RE_MENOR.search(q)
+    n = _top_n(q)
+
+    # 3. Agregações: média e total
+    if RE_MEDIA.search(q):
+        return f"Média de {nome}{escopo}: **{formatar_valor(valores.mean(), metrica)}** ({len(base)} itens)."
+    if RE_TOTAL.search(q) and not (maior or menor or n) and metrica in ('receita_total', 'popularidade'):
+        return f"Total de {nome}{escopo}: **{formatar_valor(valores.sum(), metrica)}** ({len(base)} itens)."
+
+    # 4. Rankings: maior/menor, top N
+    if not maior and not menor and not n:
+        # "qual o preço do pastel de carne?" -> valor direto quando o filtro identifica o(s) item(ns)
+        if mascara is None:
+            return None
+        if len(base) <= LIMITE_LISTA:
+            return '\n'.join(f"- {_linha_item(linha, metrica)}" for _, linha in base.iterrows())
+        return (f"{len(base)} itens{escopo}: {nome} médio de {formatar_valor(valores.mean(), metrica)}, "
+                f"de {formatar_valor(valores.min(), metrica)} a {formatar_valor(valores.max(), metrica)}.")
+    crescente = bool(menor) and (not maior or menor.start() < maior.start())
+    if metrica == 'preco_venda' and re.search(r'\bbarat', q):
+        crescente = True
+    n = n or 1
+    ordenado = base.assign(_v=valores).sort_values('_v', ascending=crescente, kind='stable').head(n)
+    if n == 1:
+        linha = ordenado.iloc[0]
+        sentido = 'menor' if crescente else 'maior'
+        return f"O item com {sentido} {nome}{escopo} é **{linha['produto_nome']}**, com {formatar_valor(linha[metrica], metrica)}."
+    titulo = f"Top {len(ordenado)} por {'menor' if crescente else 'maior'} {nome}{escopo}:"
+    return titulo + '\n\n' + '\n'.join(
+        f"{i}. {_linha_item(linha, metrica)}" for i, (_, linha) in enumerate(ordenado.iterrows(), start=1)
+    )
@@ -0,0 +1,198 @@
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from src.consultas import METRICAS, PALAVRAS_VAZIAS, normalizar, normalizar_serie
+
+# --- CONFIGURAÇÃO ---
+ORCAMENTO_CONTEXTO_TOKENS = int(os.getenv('CHEFIA_ORCAMENTO_CONTEXTO', '1500'))
+CARACTERES_POR_TOKEN = 4
+LIMIAR_PALAVRA = 0.6   # fração dos trigramas de uma palavra da pergunta que precisa aparecer no nome
+
+COLUNAS_COMPACTAS = {
+    'produto_nome': 'nome', 'custo_producao': 'custo', 'preco_venda': 'preco', 'popularidade': 'vendas',
+    'lucratividade': 'lucro', 'receita_total': 'receita', 'classificacao': 'quadrante',
+}
+
+COMPARADORES = {
+    'acima de': '>', 'maior que': '>', 'mais de': '>', 'superior a': '>', 'mais que': '>', 'acima': '>',
+    'abaixo de': '<', 'menor que': '<', 'menos de': '<', 'inferior a': '<', 'menos que': '<', 'ate': '<=',
+}
+RE_FILTRO = re.compile(
+    r'(?:(?P<antes>' + '|'.join(p for _, p in METRICAS) + r')\s+)?'
+    r'(?P<op>' + '|'.join(sorted(COMPARADORES, key=len, reverse=True)) + r')\s+'
+    r'(?P<real>r\s*)?(?P<valor>\d+(?:[.,]\d+)?)'
+    r'(?:\s+(?P<depois>' + '|'.join(p for _, p in METRICAS) + r'|reais))?'
+)
+RE_ENTRE = re.compile(r'entre\s+(?P<real>r\s*)?(?P<a>\d+(?:[.,]\d+)?)\s+e\s+(?:r\s*)?(?P<b>\d+(?:[.,]\d+)?)')
+
+QUADRANTES_CURTOS = {'⭐ Estrela': 'Estrela', '🛒 Popular': 'Popular', '💎 Oportunidade': 'Oportunidade', '⚠️ Crítico': 'Crítico'}
+
+
+def _trigramas(texto):
+    t = f" {texto} "
+    return {t[i:i + 3] for i in range(len(t) - 2)}
+
+
+def _metrica_de(texto):
+    for coluna, padrao in METRICAS:
+        if texto and re.fullmatch(padrao, texto):
+            return coluna
+    return None
+
+
+class IndiceProdutos:
+    """
+    Índice invertido de trigramas de caracteres sobre os nomes dos produtos.
+
+    Cada palavra da pergunta é comparada com todos os nomes de uma vez (bincount sobre as listas
+    de ocorrência), o que tolera erros de digitação, acentos e abreviações ("pastl", "refri").
+    """
+
+    def __init__(self, nomes):
+        self.n = len(nomes)
+        postings = {}
+        numeros = {}
+        for i, nome in enumerate(normalizar_serie(pd.Series(nomes)).tolist()):
+            for palavra in nome.split():
+                if palavra.isdigit():
+                    numeros.setdefault(palavra, set()).add(i)
+                for tri in _trigramas(palavra):
+                    postings.setdefault(tri, set()).add(i)
+        self._postings = {tri: np.fromiter(ids, dtype=np.int32, count=len(ids)) for tri, ids in postings.items()}
+        # Números no nome ("17CM" não, "2" sim) só casam por igualdade exata
+        self._numeros = {num: np.fromiter(ids, dtype=np.int32, count=len(ids)) for num, ids in numeros.items()}
+
+    def pontuar(self, pergunta):
+        """
+        Devolve um array (n,) com a relevância de cada produto para a pergunta (0 = nenhuma palavra bate).
+        Palavras da pergunta que não se parecem com nenhum nome (ex: "quanto", "ontem") são ignoradas.
+        """
+        pontos = np.zeros(self.n, dtype='float64')
+        usadas = 0
+        for palavra in normalizar(pergunta).split():
+            if palavra.isdigit():
+                if palavra in self._numeros and usadas:
+                    pontos[self._numeros[palavra]] += 1.0
+                    usadas += 1
+                continue
+            if len(palavra) < 3 or palavra in PALAVRAS_VAZIAS or _metrica_de(palavra):
+                continue
+            tris = _trigramas(palavra)
+            listas = [self._postings[t] for t in tris if t in self._postings]
+            if not listas:
+                continue
+            fracao = np.bincount(np.concatenate(listas), minlength=self.n) / len(tris)
+            if fracao.max() < LIMIAR_PALAVRA:
+                continue
+            pontos += np.where(fracao >= LIMIAR_PALAVRA, fracao, 0.0)
+            usadas += 1
+        return pontos / usadas if usadas else pontos
+
+
+def filtros_da_pergunta(pergunta, df):
+    """
+    Converte trechos como "preço acima de R$ 20", "menos de 50 vendas" ou "entre 10 e 20 reais"
+    em uma máscara booleana. Devolve None quando a pergunta não tem filtro numérico.
+    """
+    q = normalizar(pergunta)
+    mascara = None
+
+    def aplicar(coluna, op, valor):
+        nonlocal mascara
+        if coluna not in df.columns:
+            return
+        serie = df[coluna].astype('float64')
+        m = {'>': serie > valor, '<': serie < valor, '<=': serie <= valor}[op].to_numpy()
+        mascara = m if mascara is None else mascara & m
+
+    for f in RE_ENTRE.finditer(q):
+        coluna = 'preco_venda' if f.group('real') or 'reais' in q else (_metrica_de_pergunta(q) or 'popularidade')
+        a, b = sorted(float(v.replace(',', '.')) for v in (f.group('a'), f.group('b')))
+        aplicar(coluna, '>', a - 1e-9)
+        aplicar(coluna, '<=', b)
+    for f in RE_FILTRO.finditer(q):
+        coluna = _metrica_de(f.group('antes')) or _metrica_de(f.group('depois'))
+        if coluna is None:
+            em_reais = f.group('real') or f.group('depois') == 'reais'
+            coluna = 'preco_venda' if em_reais else (_metrica_de_pergunta(q) or 'popularidade')
+        aplicar(coluna, COMPARADORES[f.group('op')], float(f.group('valor').replace(',', '.')))
+
+    if 'classificacao' in df.columns:
+        for quadrante, curto in QUADRANTES_CURTOS.items():
+            if re.search(rf'\b{normalizar(curto)}(?:s|es)?\b', q) and not re.search(r'\bmais popular', q):
+                m = (df['classificacao'] == quadrante).to_numpy()
+                mascara = m if mascara is None else mascara & m
+    return mascara
+
+
+def tem_filtro_numerico(pergunta):
+    # Mesmos padrões do filtros_da_pergunta ("acima de R$ 20", "entre 10 e 20"), sem precisar do cardápio
+    q = normalizar(pergunta)
+    return bool(RE_FILTRO.search(q) or RE_ENTRE.search(q))
+
+
+def _metrica_de_pergunta(q):
+    for coluna, padrao in METRICAS:
+        if re.search(rf'\b(?:{padrao})\b', q):
+            return coluna
+    return None
+
+
+def serializar_compacto(df):
+    """
+    CSV enxuto para o prompt: cabeçalhos curtos, números com 2 casas e quadrante sem emoji.
+    """
+    cols = [c for c in COLUNAS_COMPACTAS if c in df.columns]
+    saida = df[cols].rename(columns=COLUNAS_COMPACTAS)
+    if 'quadrante' in saida.columns:
+        saida['quadrante'] = saida['quadrante'].astype(str).map(QUADRANTES_CURTOS).fillna(saida['quadrante'].astype(str))
+    return saida.to_csv(index=False, sep=';', decimal=',', float_format='%.2f')
+
+
+def estimar_tokens(texto):
+    return len(texto) // CARACTERES_POR_TOKEN + 1
+
+
+def selecionar_contexto(pergunta, df, orcamento_tokens=None, indice=None):
+    """
+    Escolhe só as linhas relevantes para a pergunta, dentro de um orçamento de tokens.
+
+    Ordem de prioridade: produtos citados pelo nome (índice de trigramas), restritos pelos filtros
+    numéricos/quadrante da pergunta; sem nenhum sinal, os itens ordenados pela métrica citada
+    (ou pela receita), alternando os extremos de cima e de baixo.
+    """
+    orcamento = orcamento_tokens or ORCAMENTO_CONTEXTO_TOKENS
+    if df is None or df.empty:
+        return df
+    indice = indice or IndiceProdutos(df['produto_nome'].tolist())
+
+    q = normalizar(pergunta)
+    pontos = indice.pontuar(pergunta)
+    mascara = filtros_da_pergunta(pergunta, df)
+    candidatos = np.ones(len(df), dtype=bool) if mascara is None else mascara
+
+    if (pontos > 0).any() and (candidatos & (pontos > 0)).any():
+        pos = np.flatnonzero(candidatos & (pontos > 0))
+        ordem = pos[np.argsort(-pontos[pos], kind='stable')]
+    else:
+        metrica = _metrica_de_pergunta(q) or 'receita_total'
+        pos = np.flatnonzero(candidatos)
+        valores = df[metrica].to_numpy(dtype='float64')[pos]
+        desc = pos[np.argsort(-valores, kind='stable')]
+        # Intercala maiores e menores: perguntas gerais costumam olhar os dois extremos
+        ordem = np.empty_like(desc)
+        metade = (len(desc) + 1) // 2
+        ordem[0::2] = desc[:metade]
+        ordem[1::2] = desc[::-1][:len(desc) - metade]
+
+    # Cada linha custa ~ (tamanho médio da linha compacta) tokens; o cabeçalho entra uma vez
+    if len(ordem) == 0:
+        return df.iloc[0:0]
+    amostra = serializar_compacto(df.iloc[ordem[:50]])
+    linhas_amostra = amostra.count('\n')
+    tokens_linha = max(estimar_tokens(amostra) / max(linhas_amostra, 1), 1)
+    max_linhas = max(int(orcamento / tokens_linha) - 1, 1)
+    return df.iloc[ordem[:max_linhas]]
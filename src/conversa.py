@@ -0,0 +1,92 @@
+import os
+
+from src.contexto import estimar_tokens, selecionar_contexto, serializar_compacto
+
+# --- CONFIGURAÇÃO ---
+ORCAMENTO_PREFIXO_TOKENS = int(os.getenv('CHEFIA_ORCAMENTO_PREFIXO', '6000'))   # cardápio fixo da conversa
+ORCAMENTO_EXTRA_TOKENS = 400    # linhas da pergunta que não couberam no prefixo
+TURNOS_RECENTES = 4             # turnos mantidos na íntegra
+LIMITE_RESPOSTA_RESUMO = 240    # caracteres de cada resposta que entram no resumo
+LIMITE_RESUMO = 2400            # caracteres do resumo inteiro (os turnos mais antigos saem primeiro)
+
+
+class Conversa:
+    """
+    Memória do "Perguntar aos Dados" para uma sessão.
+
+    As mensagens saem sempre na mesma ordem: prefixo com os dados (byte a byte igual enquanto a versão
+    dos dados não muda), resumo dos turnos antigos, turnos recentes e a pergunta nova. Entre uma
+    compactação e outra a conversa só cresce no fim, o que deixa o cache de prefixo dos provedores
+    (OpenAI, Gemini, DeepSeek) reaproveitar tudo que já foi enviado.
+    """
+
+    def __init__(self, turnos_recentes=TURNOS_RECENTES, orcamento_prefixo=None):
+        self.turnos_recentes = turnos_recentes
+        self.orcamento_prefixo = orcamento_prefixo or ORCAMENTO_PREFIXO_TOKENS
+        self.versao_dados = None
+        self.dados = ''
+        self.nomes_no_prefixo = None   # None = o prefixo tem o cardápio inteiro
+        self.resumo = []
+        self.turnos = []
+
+    def preparar(self, df, versao):
+        """
+        Monta o bloco de dados uma vez por versão do cardápio. Cabendo no orçamento vai o cardápio
+        inteiro; senão, os itens de maior receita (e cada pergunta traz as linhas que faltarem).
+        Devolve True quando o prefixo mudou.
+        """
+        if versao == self.versao_dados:
+            return False
+        ordenado = df.sort_values(['receita_total', 'produto_nome'], ascending=[False, True], kind='stable')
+        texto = serializar_compacto(ordenado)
+        if estimar_tokens(texto) > self.orcamento_prefixo:
+            amostra = serializar_compacto(ordenado.head(200))
+            por_linha = estimar_tokens(amostra) / max(amostra.count('\n'), 1)
+            ordenado = ordenado.head(max(int(self.orcamento_prefixo / por_linha) - 1, 1))
+            texto = serializar_compacto(ordenado)
+        parcial = len(ordenado) < len(df)
+        cabecalho = (f"Cardápio ({len(ordenado)} de {len(df)} itens, maior receita primeiro; as perguntas trazem "
+                     f"as linhas que faltarem):" if parcial else f"Cardápio completo ({len(df)} itens):")
+        self.dados = f"{cabecalho}\n{texto}"
+        self.nomes_no_prefixo = frozenset(ordenado['produto_nome'].astype(str)) if parcial else None
+        self.versao_dados = versao
+        return True
+
+    def linhas_extras(self, pergunta, df, indice=None):
+        # Linhas relevantes para a pergunta que não estão no prefixo (só quando o prefixo é parcial)
+        if self.nomes_no_prefixo is None:
+            return ''
+        relevantes = selecionar_contexto(pergunta, df, orcamento_tokens=ORCAMENTO_EXTRA_TOKENS, indice=indice)
+        fora = relevantes[~relevantes['produto_nome'].astype(str).isin(self.nomes_no_prefixo)]
+        return serializar_compacto(fora) if len(fora) else ''
+
+    def historico(self):
+        """
+        Mensagens entre o prefixo e a pergunta nova: resumo (se houver) e turnos recentes.
+        """
+        mensagens = []
+        if self.resumo:
+            mensagens.append({'role': 'user', 'content': "Resumo da conversa até aqui:\n" + '\n'.join(self.resumo)})
+            mensagens.append({'role': 'assistant', 'content': "Entendido."})
+        for pergunta, resposta in self.turnos:
+            mensagens += [{'role': 'user', 'content': pergunta}, {'role': 'assistant', 'content': resposta}]
+        return mensagens
+
+    def registrar_turno(self, pergunta, resposta):
+        """
+        Guarda o turno. Quando há o dobro de `turnos_recentes`, a metade mais antiga vai de uma vez para o
+        resumo: compactar em lote muda o histórico raramente, preservando o prefixo em cache.
+        """
+        self.turnos.append((pergunta, str(resposta)))
+        if len(self.turnos) < 2 * self.turnos_recentes:
+            return
+        antigos, self.turnos = self.turnos[:-self.turnos_recentes], self.turnos[-self.turnos_recentes:]
+        for p, r in antigos:
+            r = ' '.join(r.split())
+            r = r if len(r) <= LIMITE_RESPOSTA_RESUMO else r[:LIMITE_RESPOSTA_RESUMO].rsplit(' ', 1)[0] + '…'
+            self.resumo.append(f"- P: {p} | R: {r}")
+        while len(self.resumo) > 1 and sum(len(linha) + 1 for linha in self.resumo) > LIMITE_RESUMO:
+            self.resumo.pop(0)
+
+    def limpar(self):
+        self.resumo, self.turnos = [], []
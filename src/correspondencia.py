@@ -0,0 +1,285 @@
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.cache import DIRETORIO_CACHE
+from src.travas import trava_arquivo
+
+# --- CONFIGURAÇÃO ---
+CAMINHO_ALIASES = os.getenv('CHEFIA_ALIASES', os.path.join(DIRETORIO_CACHE, 'aliases_produtos.csv'))
+LIMIAR_SIMILARIDADE = 0.8
+# Palavras com grafia diferente só se casam com esse Dice e a partir desse tamanho ("CARNNE" ~ "CARNE");
+# palavras curtas ("P", "G", "SECA", "SECO") só casam iguais
+LIMIAR_PALAVRA = 0.7
+TAMANHO_MINIMO_PALAVRA = 5
+# Candidatos do índice de trigramas conferidos, do mais parecido ao menos, até um passar nas regras
+CANDIDATOS = 5
+# Palavras que podem sobrar de um lado sem mudar o produto ("PASTEL CARNE" = "PASTEL DE CARNE")
+CONECTIVOS = {'DE', 'DA', 'DO', 'DAS', 'DOS', 'E'}
+
+# Abreviações comuns nos cadastros de PDV e fichas técnicas (aplicadas por palavra inteira)
+ABREVIACOES = {
+    'C': 'COM', 'S': 'SEM', 'REFRI': 'REFRIGERANTE', 'REFRIG': 'REFRIGERANTE', 'TRAD': 'TRADICIONAL',
+    'PQ': 'PEQUENO', 'PEQ': 'PEQUENO', 'GDE': 'GRANDE', 'GD': 'GRANDE', 'MED': 'MEDIO', 'CHOC': 'CHOCOLATE',
+    'QJO': 'QUEIJO', 'FGO': 'FRANGO', 'FRANG': 'FRANGO', 'CARN': 'CARNE', 'ESP': 'ESPECIAL', 'UN': 'UNIDADE',
+}
+_RE_ABREVIACOES = re.compile(r'\b(' + '|'.join(sorted(ABREVIACOES, key=len, reverse=True)) + r')\b')
+
+
+def normalizar_nomes(nomes):
+    """
+    Normalização agressiva para comparação: maiúsculas, sem acentos nem pontuação,
+    espaços únicos e abreviações expandidas ("REFRI C/ GELO." -> "REFRIGERANTE COM GELO").
+    """
+    s = (
+        pd.Series(nomes, dtype='object').astype(str)
+        .str.upper().str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+        .str.replace(r'[^A-Z0-9 ]+', ' ', regex=True).str.replace(r' +', ' ', regex=True).str.strip()
+    )
+    return s.str.replace(_RE_ABREVIACOES, lambda m: ABREVIACOES[m.group(1)], regex=True)
+
+
+_RE_NUMEROS = re.compile(r'\d+')
+
+
+def _trigramas(texto):
+    t = f"  {texto} "
+    return {t[i:i + 3] for i in range(len(t) - 2)}
+
+
+def _dice(a, b):
+    ta, tb = _trigramas(a), _trigramas(b)
+    return 2.0 * len(ta & tb) / (len(ta) + len(tb))
+
+
+def mesmas_palavras(nome, canonico):
+    """
+    Confere o par aproximado palavra a palavra: cada palavra de um lado precisa de uma igual (ou
+    com grafia parecida) do outro, e só conectivos podem sobrar. Uma palavra a mais é outro
+    produto: "PASTEL DE CARNE SECA" não é "PASTEL DE CARNE", "PIZZA CALABRESA GRANDE" não é
+    "PIZZA CALABRESA".
+    """
+    restantes = canonico.split()
+    for palavra in nome.split():
+        if palavra in restantes:
+            restantes.remove(palavra)
+            continue
+        parecida = None
+        if len(palavra) >= TAMANHO_MINIMO_PALAVRA:
+            parecida = next((r for r in restantes if len(r) >= TAMANHO_MINIMO_PALAVRA
+                             and _dice(palavra, r) >= LIMIAR_PALAVRA), None)
+        if parecida is not None:
+            restantes.remove(parecida)
+        elif palavra not in CONECTIVOS:
+            return False
+    return all(r in CONECTIVOS for r in restantes)
+
+
+class _IndiceBloco:
+    # Índice de trigramas dos nomes da ficha de um bloco (mesma primeira letra)
+    def __init__(self, ids, nomes):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.tamanhos = np.empty(len(ids), dtype='float64')
+        postings = {}
+        for local, nome in enumerate(nomes):
+            tris = _trigramas(nome)
+            self.tamanhos[local] = len(tris)
+            for t in tris:
+                postings.setdefault(t, []).append(local)
+        self.postings = {t: np.asarray(v, dtype=np.int32) for t, v in postings.items()}
+
+    def melhores(self, nome, limiar, k=CANDIDATOS):
+        # Dice dos conjuntos de trigramas: 2|A∩B| / (|A| + |B|), calculado para o bloco inteiro de uma vez.
+        # Devolve até k pares (id, similaridade) acima do limiar, do mais parecido ao menos
+        tris = _trigramas(nome)
+        listas = [self.postings[t] for t in tris if t in self.postings]
+        if not listas:
+            return []
+        inter = np.bincount(np.concatenate(listas), minlength=len(self.ids))
+        sim = 2.0 * inter / (len(tris) + self.tamanhos)
+        if len(sim) > k:
+            topo = np.argpartition(-sim, k - 1)[:k]
+        else:
+            topo = np.arange(len(sim))
+        topo = topo[np.argsort(-sim[topo], kind='stable')]
+        return [(int(self.ids[p]), float(sim[p])) for p in topo if sim[p] >= limiar]
+
+
+class CorrespondenciaProdutos:
+    """
+    Casa nomes de produtos das vendas com os nomes da ficha técnica.
+
+    1. Caminho rápido: igualdade depois da normalização (lookup em dicionário).
+    2. Tabela de aliases persistida de execuções anteriores (lookup em dicionário).
+    3. Para o resto: bloqueio pela primeira letra + índice de trigramas para gerar candidatos
+       e similaridade de Dice vetorizada; o primeiro dos `CANDIDATOS` melhores acima de `limiar`
+       com os mesmos números e as mesmas palavras (`mesmas_palavras`) é usado nesta execução e
+       guardado como sugestão pendente. Só vira alias depois de `confirmar_sugestoes`.
+
+    Depois de `casar`, `relatorio` traz contagens por método, itens sem par e a vazão.
+    """
+
+    def __init__(self, caminho_aliases=None, limiar=LIMIAR_SIMILARIDADE):
+        self.caminho_aliases = caminho_aliases or CAMINHO_ALIASES
+        self.caminho_sugestoes = f"{os.path.splitext(self.caminho_aliases)[0]}_sugestoes.csv"
+        self.limiar = limiar
+        self.aliases = self._ler(self.caminho_aliases)
+        self.sugestoes = self._ler(self.caminho_sugestoes)
+        self.relatorio = {}
+
+    def _ler(self, caminho):
+        if not os.path.exists(caminho):
+            return {}
+        try:
+            df = pd.read_csv(caminho, sep=';', dtype=str, keep_default_na=False)
+            return dict(zip(df['alias'], df['canonico']))
+        except (OSError, KeyError, pd.errors.ParserError):
+            return {}
+
+    def _gravar(self, caminho, pares):
+        # Temporário por processo + os.replace: quem lê nunca vê o CSV pela metade
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        pd.DataFrame({'alias': list(pares), 'canonico': list(pares.values())}).to_csv(temporario, sep=';', index=False)
+        os.replace(temporario, caminho)
+
+    def _salvar(self, novos_aliases=None, novas_sugestoes=None, descartar=()):
+        # O lote (src/lote.py) salva de vários processos ao mesmo tempo: relê o que está no disco sob
+        # a trava e mescla, em vez de sobrescrever com a visão deste processo
+        try:
+            with trava_arquivo(f"{self.caminho_aliases}.lock"):
+                aliases = {**self._ler(self.caminho_aliases), **(novos_aliases or {})}
+                sugestoes = {**self._ler(self.caminho_sugestoes), **(novas_sugestoes or {})}
+                for alias in set(descartar) | set(aliases):
+                    sugestoes.pop(alias, None)
+                if novos_aliases:
+                    self._gravar(self.caminho_aliases, aliases)
+                self._gravar(self.caminho_sugestoes, sugestoes)
+        except OSError:
+            # Sem permissão ou sem espaço: os aliases são só uma otimização
+            return
+        self.aliases, self.sugestoes = aliases, sugestoes
+
+    def salvar_aliases(self):
+        if self.aliases:
+            self._salvar(novos_aliases=self.aliases)
+
+    def confirmar_sugestoes(self, nomes=None):
+        """
+        Promove sugestões pendentes (todas, ou só as de `nomes`, já normalizados) a aliases
+        permanentes. Devolve quantas foram confirmadas.
+        """
+        self.sugestoes.update(self._ler(self.caminho_sugestoes))
+        nomes = None if nomes is None else set(nomes)
+        escolhidas = {a: c for a, c in self.sugestoes.items() if nomes is None or a in nomes}
+        if escolhidas:
+            self._salvar(novos_aliases=escolhidas)
+        return len(escolhidas)
+
+    def descartar_sugestoes(self, nomes):
+        self._salvar(descartar=nomes)
+
+    def casar(self, nomes_vendas, nomes_ficha):
+        """
+        Devolve um DataFrame com uma linha por nome de venda distinto:
+        produto_nome (vendas), produto_ficha (None se sem par), metodo e similaridade.
+        """
+        inicio = time.perf_counter()
+        vendas = pd.Series(pd.unique(pd.Series(nomes_vendas, dtype='object').astype(str)))
+        ficha = pd.Series(pd.unique(pd.Series(nomes_ficha, dtype='object').astype(str)))
+        vendas_norm = normalizar_nomes(vendas).tolist()
+        ficha_norm = normalizar_nomes(ficha).tolist()
+
+        # Nome normalizado -> nome original da ficha (o primeiro vence em caso de colisão)
+        por_norm = {}
+        for original, norm in zip(ficha.tolist(), ficha_norm):
+            por_norm.setdefault(norm, original)
+
+        destino = [None] * len(vendas)
+        metodo = ['sem_par'] * len(vendas)
+        similaridade = np.zeros(len(vendas))
+        pendentes = []
+        for i, norm in enumerate(vendas_norm):
+            if norm in por_norm:
+                destino[i], metodo[i], similaridade[i] = por_norm[norm], 'exato', 1.0
+            elif norm in self.aliases and self.aliases[norm] in por_norm:
+                destino[i], metodo[i], similaridade[i] = por_norm[self.aliases[norm]], 'alias', 1.0
+            else:
+                pendentes.append(i)
+
+        if pendentes:
+            normas_ficha = list(por_norm)
+            blocos = {}
+            for j, norm in enumerate(normas_ficha):
+                blocos.setdefault(norm[:1], []).append(j)
+            indices = {b: _IndiceBloco(ids, [normas_ficha[j] for j in ids]) for b, ids in blocos.items()}
+
+            novas_sugestoes = {}
+            for i in pendentes:
+                norm = vendas_norm[i]
+                indice = indices.get(norm[:1])
+                if indice is None:
+                    continue
+                # O mais parecido pode ser outro produto ("PASTEL CARNE 1" e "PASTEL CARNE SECA" vêm antes de
+                # "PASTEL DE CARNE" para "PASTEL CARNE"):
+                # vale o primeiro candidato que passa nas regras. Números precisam bater exatamente:
+                # "PASTEL 17CM" nunca é "PASTEL 18CM"
+                numeros = _RE_NUMEROS.findall(norm)
+                for j, sim in indice.melhores(norm, self.limiar):
+                    if _RE_NUMEROS.findall(normas_ficha[j]) == numeros and mesmas_palavras(norm, normas_ficha[j]):
+                        break
+                else:
+                    continue
+                canonico = normas_ficha[j]
+                destino[i], metodo[i], similaridade[i] = por_norm[canonico], 'aproximado', sim
+                if self.sugestoes.get(norm) != canonico:
+                    novas_sugestoes[norm] = canonico
+            if novas_sugestoes:
+                self._salvar(novas_sugestoes=novas_sugestoes)
+
+        resultado = pd.DataFrame({
+            'produto_nome': vendas, 'produto_ficha': destino, 'metodo': metodo, 'similaridade': similaridade
+        })
+        duracao = time.perf_counter() - inicio
+        contagem = resultado['metodo'].value_counts()
+        self.relatorio = {
+            'nomes_vendas': len(vendas),
+            'nomes_ficha': len(ficha),
+            'exato': int(contagem.get('exato', 0)),
+            'alias': int(contagem.get('alias', 0)),
+            'aproximado': int(contagem.get('aproximado', 0)),
+            'sem_par': int(contagem.get('sem_par', 0)),
+            'sem_par_nomes': resultado.loc[resultado['metodo'] == 'sem_par', 'produto_nome'].tolist(),
+            'sugestoes_pendentes': len(self.sugestoes),
+            'caminho_sugestoes': self.caminho_sugestoes,
+            'tempo_s': duracao,
+            'nomes_por_s': len(vendas) / duracao if duracao > 0 else float('inf'),
+        }
+        return resultado
+
+    def juntar(self, df_vendas, df_custos):
+        """
+        Equivalente ao pd.merge(..., on='produto_nome', how='inner') entre vendas e ficha,
+        mas tolerante a pontuação, acentos, abreviações e pequenas diferenças de grafia.
+        """
+        mapa = self.casar(df_vendas['produto_nome'], df_custos['produto_nome'])
+        mapa = mapa.loc[mapa['produto_ficha'].notna(), ['produto_nome', 'produto_ficha']]
+        custos = df_custos.rename(columns={'produto_nome': 'produto_ficha'})
+        df = df_vendas.merge(mapa, on='produto_nome', how='inner').merge(custos, on='produto_ficha', how='inner')
+        return df.drop(columns='produto_ficha')
+
+
+def imprimir_relatorio(relatorio, limite=20):
+    print(
+        f"Correspondência: {relatorio['exato']} exatos, {relatorio['alias']} por alias, "
+        f"{relatorio['aproximado']} aproximados, {relatorio['sem_par']} sem par "
+        f"({relatorio['nomes_vendas']} nomes em {relatorio['tempo_s']:.2f}s, {relatorio['nomes_por_s']:,.0f} nomes/s)"
+    )
+    if relatorio.get('sugestoes_pendentes'):
+        print(f"  {relatorio['sugestoes_pendentes']} pares aproximados aguardando confirmação em {relatorio['caminho_sugestoes']}")
+    for nome in relatorio['sem_par_nomes'][:limite]:
+        print(f"  sem par: {nome}")
+    if relatorio['sem_par'] > limite:
+        print(f"  ... e mais {relatorio['sem_par'] - limite}")
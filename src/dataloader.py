@@ -1,9 +1,52 @@
 import pandas as pd
 import numpy as np
 
+from src.cache import carregar_com_cache
+from src.formato import farejar_encoding, ler_amostra
+from src.instrumentacao import cronometrado
+
+# Incremente ao mudar a limpeza/agregação: invalida os resultados guardados no cache
+VERSAO_PARSER_FICHA = 3
+VERSAO_PARSER_VENDAS = 5
+
+# Falhas esperadas de leitura de um CSV ruim; qualquer outra coisa é bug e deve aparecer
+ERROS_LEITURA = (OSError, ValueError, KeyError, UnicodeDecodeError, pd.errors.ParserError)
+
+
+def _encoding(arquivo):
+    # Exportações antigas do PDV vêm em latin1; planilhas salvas de novo costumam vir em UTF-8
+    return farejar_encoding(ler_amostra(arquivo))
+
+
+def _posicao(arquivo):
+    return arquivo.tell() if hasattr(arquivo, 'seek') else None
+
+
+def _voltar(arquivo, posicao):
+    if posicao is not None:
+        arquivo.seek(posicao)
+
+
+def com_encoding(arquivo, ler):
+    """
+    Chama `ler(encoding)` com o encoding farejado na amostra. O farejo só vê os primeiros 64 KB: se um
+    byte mais adiante não for UTF-8 (latin1 com acento depois de um começo todo ASCII), relê em latin1.
+    """
+    posicao = _posicao(arquivo)
+    encoding = _encoding(arquivo)
+    try:
+        return ler(encoding)
+    except UnicodeDecodeError:
+        if encoding == 'latin1':
+            raise
+        _voltar(arquivo, posicao)
+        return ler('latin1')
+
+
+@cronometrado('ficha.leitura')
 def processar_nova_ficha(arquivo):
     try:
-        df_ficha = pd.read_csv(arquivo, sep=';', encoding='latin1')
+        df_ficha = com_encoding(arquivo, lambda encoding: pd.read_csv(arquivo, sep=';', encoding=encoding))
         df_ficha.columns = df_ficha.columns.str.replace('"', '').str.strip().str.lower()
 
         if 'valor_custo' not in df_ficha.columns and 'valor custo' not in df_ficha.columns:
@@ -26,57 +69,118 @@ def processar_nova_ficha(arquivo):
             return df_custos
 
         return pd.DataFrame()
-    except:
+    except ERROS_LEITURA:
         return pd.DataFrame()
 
-def filtrar_vendas(arquivo):
-    try:
-        df_vendas = pd.read_csv(arquivo, sep=';', encoding='latin1')
-        df_vendas.columns = df_vendas.columns.str.replace('"', '').str.strip().str.upper()
+COLUNAS_VENDAS = {
+    'PRODUTO DE VENDA': 'produto_nome', 'VENDA DE FRENTE DE LOJA': 'vendas_loja',
+    'VENDA DELIVERY': 'vendas_delivery', 'RECEITA FRENTE DE LOJA': 'receita_loja',
+    'RECEITA DELIVERY': 'receita_delivery'
+}
+COLUNAS_NUMERICAS_VENDAS = ['vendas_loja', 'vendas_delivery', 'receita_loja', 'receita_delivery']
 
-        if 'PRODUTO DE VENDA' not in df_vendas.columns:
-            return pd.DataFrame()
 
-        if 'UNIDADE' in df_vendas.columns:
+def _limpar_bloco_vendas(df_vendas, manter_unidade=False, numeros_convertidos=False):
+    # Limpeza comum aos modos completo e em blocos: nomes de colunas, nome do produto e números no formato BR.
+    # Os blocos chegam como texto (dtype=str); só o src/importacao.py passa números já convertidos.
+    df_vendas.columns = df_vendas.columns.str.replace('"', '').str.strip().str.upper()
+
+    if 'PRODUTO DE VENDA' not in df_vendas.columns:
+        return None
+
+    if 'UNIDADE' in df_vendas.columns:
+        if manter_unidade:
+            # Usado pelo histórico (src/historico.py), que particiona as vendas por loja
+            df_vendas['loja'] = df_vendas.pop('UNIDADE').astype(str).str.strip().str.upper()
+        else:
             df_vendas.drop(['UNIDADE'], axis=1, inplace=True)
 
-        df_vendas = df_vendas.rename(columns={
-            'PRODUTO DE VENDA': 'produto_nome', 'VENDA DE FRENTE DE LOJA': 'vendas_loja',
-            'VENDA DELIVERY': 'vendas_delivery', 'RECEITA FRENTE DE LOJA': 'receita_loja',
-            'RECEITA DELIVERY': 'receita_delivery'
-        })
-
-        df_vendas['produto_nome'] = (
-            df_vendas['produto_nome'].astype(str).str.strip().str.replace(' +', ' ', regex=True).str.upper()
-        )
-
-        for col in ['vendas_loja', 'vendas_delivery', 'receita_loja', 'receita_delivery']:
-            if col in df_vendas.columns:
-                df_vendas[col] = pd.to_numeric(
-                    df_vendas[col].astype(str).str.replace('.', '', regex=False).str.replace(',', '.', regex=False),
-                    errors='coerce'
-                )
-
-        df_vendas = df_vendas.fillna(0)
-        df_vendas['popularidade'] = df_vendas['vendas_loja'] + df_vendas['vendas_delivery']
-        df_vendas['receita_total'] = df_vendas['receita_loja'] + df_vendas['receita_delivery']
-        
-        df_vendas['preco_venda'] = np.where(
-            df_vendas['popularidade'] > 0,
-            df_vendas['receita_total'] / df_vendas['popularidade'],
-            0
-        )
-
-        return df_vendas[['produto_nome', 'popularidade', 'preco_venda', 'receita_total']]
-    except:
+    df_vendas = df_vendas.rename(columns=COLUNAS_VENDAS)
+
+    df_vendas['produto_nome'] = (
+        df_vendas['produto_nome'].astype(str).str.strip().str.replace(' +', ' ', regex=True).str.upper()
+    )
+
+    for col in COLUNAS_NUMERICAS_VENDAS:
+        if col in df_vendas.columns and not numeros_convertidos:
+            df_vendas[col] = pd.to_numeric(
+                df_vendas[col].astype(str).str.replace('.', '', regex=False).str.replace(',', '.', regex=False),
+                errors='coerce'
+            )
+
+    return df_vendas.fillna(0)
+
+
+def _finalizar_vendas(df_vendas):
+    df_vendas['popularidade'] = df_vendas['vendas_loja'] + df_vendas['vendas_delivery']
+    df_vendas['receita_total'] = df_vendas['receita_loja'] + df_vendas['receita_delivery']
+    
+    df_vendas['preco_venda'] = np.where(
+        df_vendas['popularidade'] > 0,
+        df_vendas['receita_total'] / df_vendas['popularidade'],
+        0
+    )
+
+    return df_vendas[['produto_nome', 'popularidade', 'preco_venda', 'receita_total']]
+
+
+@cronometrado('vendas.leitura')
+def filtrar_vendas(arquivo, chunksize=None):
+    """
+    Lê a exportação de vendas do PDV (produtosdevenda-*.csv) e devolve uma linha por produto,
+    somando as linhas repetidas (ex: o mesmo produto em dias ou lojas diferentes).
+
+    Com `chunksize`, o arquivo é lido em blocos de N linhas e cada bloco é limpo e somado
+    em totais acumulados por produto, de modo que a memória fica limitada ao número de
+    produtos distintos e não ao tamanho do arquivo. O resultado é o mesmo do modo completo.
+    """
+    if chunksize:
+        return _filtrar_vendas_em_blocos(arquivo, chunksize)
+
+    try:
+        df_vendas = com_encoding(arquivo, lambda encoding: pd.read_csv(arquivo, sep=';', encoding=encoding, dtype=str))
+        df_vendas = _limpar_bloco_vendas(df_vendas)
+        if df_vendas is None:
+            return pd.DataFrame()
+        # Mesma soma por produto do modo em blocos (sort=False: ordem da primeira aparição)
+        totais = df_vendas.groupby('produto_nome', sort=False)[COLUNAS_NUMERICAS_VENDAS].sum()
+        return _finalizar_vendas(totais.reset_index())
+    except ERROS_LEITURA:
+        return pd.DataFrame()
+
+
+def _somar_blocos(arquivo, chunksize, encoding):
+    # O erro de encoding pode aparecer só num bloco do meio: com_encoding refaz a soma desde o início
+    totais = None
+    leitor = pd.read_csv(arquivo, sep=';', encoding=encoding, dtype=str, chunksize=chunksize)
+    for bloco in leitor:
+        bloco = _limpar_bloco_vendas(bloco)
+        if bloco is None:
+            return None
+
+        # Soma parcial do bloco; sort=False preserva a ordem da primeira aparição de cada produto
+        parcial = bloco.groupby('produto_nome', sort=False)[COLUNAS_NUMERICAS_VENDAS].sum()
+        if totais is None:
+            totais = parcial
+        else:
+            totais = pd.concat([totais, parcial]).groupby(level=0, sort=False).sum()
+    return totais
+
+
+def _filtrar_vendas_em_blocos(arquivo, chunksize):
+    try:
+        totais = com_encoding(arquivo, lambda encoding: _somar_blocos(arquivo, chunksize, encoding))
+        if totais is None:
+            return pd.DataFrame()
+        return _finalizar_vendas(totais.reset_index())
+    except ERROS_LEITURA:
         return pd.DataFrame()
 
-def classificar_produto(row, pop_media, luc_media):
-    if row['popularidade'] >= pop_media and row['lucratividade'] >= luc_media:
-        return '⭐ Estrela'
-    elif row['popularidade'] >= pop_media and row['lucratividade'] < luc_media:
-        return '🐴 Burro de Carga'
-    elif row['popularidade'] < pop_media and row['lucratividade'] >= luc_media:
-        return '🧩 Quebra-cabeça'
-    else:
-        return '🐶 Cão'
\ No newline at end of file
+
+# --- LEITURA COM CACHE (src/cache.py) ---
+def carregar_ficha(arquivo):
+    return carregar_com_cache(arquivo, processar_nova_ficha, 'ficha', VERSAO_PARSER_FICHA)
+
+
+def carregar_vendas(arquivo, chunksize=None):
+    return carregar_com_cache(arquivo, filtrar_vendas, 'vendas', VERSAO_PARSER_VENDAS, chunksize=chunksize)
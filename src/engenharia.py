@@ -0,0 +1,135 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# --- QUADRANTES DA MATRIZ DE ENGENHARIA DE MENU ---
+# A ordem define os códigos do Categorical: 0 = Estrela, 1 = Popular, 2 = Oportunidade, 3 = Crítico
+QUADRANTES = ['⭐ Estrela', '🛒 Popular', '💎 Oportunidade', '⚠️ Crítico']
+TIPO_QUADRANTE = pd.CategoricalDtype(categories=QUADRANTES, ordered=False)
+
+# Kasavana & Smith: um item é popular se vende pelo menos 70% da participação "justa" (1/N) do grupo
+FATOR_KASAVANA_SMITH = 0.7
+
+METODOS_REFERENCIA = ('media', 'mediana', 'kasavana_smith', 'ponderada')
+
+
+def _media_ponderada(valores, pesos, chaves):
+    # Média ponderada por grupo em uma única passada: soma(v * p) / soma(p)
+    if chaves is None:
+        total = pesos.sum()
+        return (valores * pesos).sum() / total if total else valores.mean()
+    aux = pd.DataFrame({'vp': valores * pesos, 'p': pesos, 'v': valores})
+    g = aux.groupby(chaves, sort=False, observed=True, dropna=False)
+    soma_vp = g['vp'].transform('sum')
+    soma_p = g['p'].transform('sum')
+    return (soma_vp / soma_p.where(soma_p != 0)).fillna(g['v'].transform('mean'))
+
+
+def calcular_referencias(df, metodo='media', agrupar_por=None):
+    """
+    Calcula os pontos de corte (popularidade, lucratividade) da matriz.
+
+    Sem agrupamento devolve dois floats; com `agrupar_por` (ex: 'loja', 'categoria', 'periodo')
+    devolve duas Series alinhadas ao índice de `df`, com o corte do grupo de cada linha.
+
+    Métodos:
+    - 'media': média simples das duas métricas.
+    - 'mediana': mediana das duas métricas.
+    - 'kasavana_smith': regra dos 70% na popularidade e margem média ponderada pelas vendas.
+    - 'ponderada': popularidade média e margem média ponderada pela receita.
+    """
+    if metodo not in METODOS_REFERENCIA:
+        raise ValueError(f"Método de referência desconhecido: {metodo}. Use um de {METODOS_REFERENCIA}.")
+
+    pop = df['popularidade'].astype('float64')
+    luc = df['lucratividade'].astype('float64')
+    chaves = None
+    if agrupar_por is not None:
+        chaves = [df[c] for c in ([agrupar_por] if isinstance(agrupar_por, str) else agrupar_por)]
+
+    if chaves is None:
+        if metodo == 'mediana':
+            return pop.median(), luc.median()
+        if metodo == 'kasavana_smith':
+            return FATOR_KASAVANA_SMITH * pop.mean(), _media_ponderada(luc, pop, None)
+        if metodo == 'ponderada':
+            receita = df['receita_total'] if 'receita_total' in df.columns else df['preco_venda'] * pop
+            return pop.mean(), _media_ponderada(luc, receita.astype('float64'), None)
+        return pop.mean(), luc.mean()
+
+    g_pop = pop.groupby(chaves, sort=False, observed=True, dropna=False)
+    g_luc = luc.groupby(chaves, sort=False, observed=True, dropna=False)
+    if metodo == 'mediana':
+        return g_pop.transform('median'), g_luc.transform('median')
+    if metodo == 'kasavana_smith':
+        return FATOR_KASAVANA_SMITH * g_pop.transform('mean'), _media_ponderada(luc, pop, chaves)
+    if metodo == 'ponderada':
+        receita = df['receita_total'] if 'receita_total' in df.columns else df['preco_venda'] * pop
+        return g_pop.transform('mean'), _media_ponderada(luc, receita.astype('float64'), chaves)
+    return g_pop.transform('mean'), g_luc.transform('mean')
+
+
+def classificar_quadrantes(popularidade, lucratividade, ref_pop, ref_luc):
+    """
+    Classifica arrays inteiros de uma vez. Devolve um pd.Categorical com os QUADRANTES.
+    """
+    pop = np.asarray(popularidade, dtype='float64')
+    luc = np.asarray(lucratividade, dtype='float64')
+    ref_pop = np.asarray(ref_pop, dtype='float64')
+    ref_luc = np.asarray(ref_luc, dtype='float64')
+    alta_pop, baixa_pop = pop >= ref_pop, pop < ref_pop
+    alta_luc, baixa_luc = luc >= ref_luc, luc < ref_luc
+    # Valores ausentes caem em 'Crítico', como na antiga classificação linha a linha
+    codigos = np.select(
+        [alta_pop & alta_luc, alta_pop & baixa_luc, baixa_pop & alta_luc],
+        [0, 1, 2],
+        default=3
+    ).astype(np.int8)
+    return pd.Categorical.from_codes(codigos, dtype=TIPO_QUADRANTE)
+
+
+def classificar_menu(df, metodo='media', agrupar_por=None):
+    """
+    Motor único de classificação do cardápio (app, dataloader e scripts em lote).
+
+    Espera as colunas 'popularidade' e 'lucratividade' (e 'receita_total' para o método 'ponderada').
+    Devolve (classificacao, ref_pop, ref_luc), onde `classificacao` é uma Series categórica
+    alinhada ao índice de `df`.
+    """
+    ref_pop, ref_luc = calcular_referencias(df, metodo=metodo, agrupar_por=agrupar_por)
+    cat = classificar_quadrantes(df['popularidade'], df['lucratividade'], ref_pop, ref_luc)
+    return pd.Series(cat, index=df.index, name='classificacao'), ref_pop, ref_luc
+
+
+# --- NATUREZA DO ITEM: REVENDA x PRODUÇÃO ---
+# Revenda = item comprado pronto (latas, long necks, água, doces industrializados): custo fixo, sem cozinha.
+# Mesma distinção que o agente consultor usa (src/agentedeia.py); aqui decidida pelo nome do produto.
+TIPOS_PRODUTO = ('revenda', 'producao')
+_RE_REVENDA = re.compile(
+    r'\b(?:LATA|LONG ?NECK|GARRAFA|PET|\d+ ?ML|\d+(?:[,.]\d+)? ?L|AGUA|ÁGUA|REFRI\w*|COCA|PEPSI|GUARAN[AÁ]|FANTA|SPRITE|'
+    r'SCHWEPPES|H2OH|CERVEJA|HEINEKEN|BUDWEISER|BRAHMA|SKOL|STELLA|CORONA|ENERG[EÉ]TICO|RED ?BULL|MONSTER|'
+    r'ISOT[OÔ]NICO|GATORADE|CHOCOLATE|BOMBOM|BALA|CHICLETE|SORVETE|PICOL[EÉ])\b'
+)
+
+
+def eh_revenda(nomes):
+    """
+    Máscara booleana (numpy) dos itens de revenda, pelo nome. O resto é produção.
+    Aceita Series/lista de nomes em qualquer caixa.
+    """
+    nomes = pd.Series(nomes, dtype='object').astype(str).str.upper()
+    return nomes.str.contains(_RE_REVENDA, regex=True).to_numpy(dtype=bool)
+
+
+def tipo_produto(df):
+    """
+    Natureza de cada item ('revenda' ou 'producao'). Usa a coluna 'tipo' quando o cardápio
+    já a traz (preenchida pelo usuário) e a heurística de nomes nas demais linhas.
+    """
+    tipos = np.where(eh_revenda(df['produto_nome']), 'revenda', 'producao').astype(object)
+    if 'tipo' in df.columns:
+        informado = df['tipo'].astype(str).str.strip().str.lower().to_numpy()
+        informado = np.where(informado == 'produção', 'producao', informado)
+        tipos = np.where(np.isin(informado, TIPOS_PRODUTO), informado, tipos)
+    return pd.Series(tipos, index=df.index, name='tipo')
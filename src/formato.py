@@ -0,0 +1,85 @@
+import codecs
+import re
+
+# --- DETECÇÃO DE FORMATO DE CSV ---
+TAMANHO_AMOSTRA = 64 * 1024
+SEPARADORES = (';', ',', '\t', '|')
+
+_RE_DECIMAL_VIRGULA = re.compile(r'(?<![\d.,])\d{1,3}(?:\.\d{3})*,\d+(?![\d.,])')
+_RE_DECIMAL_PONTO = re.compile(r'(?<![\d.,])\d{1,3}(?:,\d{3})*\.\d+(?![\d.,])')
+_RE_MILHAR_PONTO = re.compile(r'\d\.\d{3},')
+_RE_MILHAR_VIRGULA = re.compile(r'\d,\d{3}\.')
+
+
+def ler_amostra(arquivo, tamanho=TAMANHO_AMOSTRA):
+    """
+    Primeiros `tamanho` bytes de um caminho, bytes ou arquivo aberto (volta à posição original).
+    """
+    if isinstance(arquivo, (bytes, bytearray, memoryview)):
+        return bytes(arquivo[:tamanho])
+    if hasattr(arquivo, 'read'):
+        posicao = arquivo.tell()
+        amostra = arquivo.read(tamanho)
+        arquivo.seek(posicao)
+        return amostra if isinstance(amostra, bytes) else amostra.encode('utf-8')
+    with open(arquivo, 'rb') as f:
+        return f.read(tamanho)
+
+
+def farejar_encoding(amostra):
+    if amostra.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        # Amostra pode terminar no meio de um caractere multibyte: tolera só o final cortado
+        amostra.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError as e:
+        if e.start >= len(amostra) - 3:
+            return 'utf-8'
+        return 'latin1'
+
+
+def farejar(arquivo):
+    """
+    Descobre encoding, separador e convenção numérica olhando o começo do arquivo (o encoding
+    UTF-8 é conferido no conteúdo inteiro quando ele vem em bytes).
+    Devolve {'encoding', 'separador', 'decimal', 'milhar', 'colunas'}.
+    """
+    amostra = ler_amostra(arquivo)
+    encoding = farejar_encoding(amostra)
+    if encoding == 'utf-8' and isinstance(arquivo, (bytes, bytearray, memoryview)) and len(arquivo) > len(amostra):
+        # Conteúdo inteiro em memória: confere o resto (um "AÇAÍ" em latin1 depois dos primeiros 64 KB)
+        try:
+            bytes(arquivo).decode('utf-8')
+        except UnicodeDecodeError:
+            encoding = 'latin1'
+    texto = amostra.decode(encoding, errors='replace')
+    linhas = [l for l in texto.splitlines()[:50] if l.strip()]
+    if len(amostra) >= TAMANHO_AMOSTRA and len(linhas) > 1:
+        linhas = linhas[:-1]   # última linha provavelmente cortada
+    cabecalho = linhas[0] if linhas else ''
+
+    # Separador: o candidato que aparece no cabeçalho e com a contagem mais estável entre as linhas
+    separador, melhor = ';', None
+    for candidato in SEPARADORES:
+        n_cab = cabecalho.count(candidato)
+        if n_cab == 0:
+            continue
+        iguais = sum(1 for l in linhas[1:] if l.count(candidato) == n_cab)
+        nota = (iguais, n_cab)
+        if melhor is None or nota > melhor:
+            separador, melhor = candidato, nota
+
+    # Decimal: vírgula quando os números com casas decimais seguem o padrão BR (e o separador não é vírgula)
+    corpo = '\n'.join(linhas[1:])
+    virgula = len(_RE_DECIMAL_VIRGULA.findall(corpo)) if separador != ',' else 0
+    ponto = len(_RE_DECIMAL_PONTO.findall(corpo))
+    decimal = ',' if virgula > ponto else '.'
+    milhar = None
+    if decimal == ',' and _RE_MILHAR_PONTO.search(corpo):
+        milhar = '.'
+    elif decimal == '.' and separador != ',' and _RE_MILHAR_VIRGULA.search(corpo):
+        milhar = ','
+
+    colunas = [c.strip().strip('"').strip() for c in cabecalho.lstrip('﻿').split(separador)] if cabecalho else []
+    return {'encoding': encoding, 'separador': separador, 'decimal': decimal, 'milhar': milhar, 'colunas': colunas}
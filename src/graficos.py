@@ -0,0 +1,140 @@
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+
+from src.engenharia import QUADRANTES
+
+# --- CONFIGURAÇÃO ---
+LIMIAR_WEBGL = 1_000        # acima disso: traços WebGL (scattergl) e rótulos só nos itens escolhidos
+LIMIAR_DENSIDADE = 20_000   # acima disso: mapa de densidade agregado no servidor + pontos de destaque
+LIMITE_ROTULOS = 30
+BINS_DENSIDADE = 120
+EXTREMOS_POR_EIXO = 5
+
+
+def itens_rotulados(df, limite=LIMITE_ROTULOS, busca=None, quadrante=None):
+    """
+    Posições (iloc) dos itens que recebem rótulo no gráfico, em ordem de prioridade:
+    1. nomes que contêm o texto buscado; 2. os melhores do quadrante em foco (por receita);
+    3. extremos de popularidade e lucratividade. Busca e quadrante ocupam no máximo metade e um
+    terço dos rótulos, para os extremos continuarem visíveis. Nunca passa de `limite`.
+    """
+    escolhidos = []
+    if busca:
+        acertos = df['produto_nome'].astype(str).str.contains(busca.strip(), case=False, regex=False).to_numpy()
+        escolhidos.extend(np.flatnonzero(acertos)[:limite // 2].tolist())
+    if quadrante and 'classificacao' in df.columns:
+        no_quadrante = np.flatnonzero((df['classificacao'].astype(str) == quadrante).to_numpy())
+        if len(no_quadrante):
+            receita = (df['popularidade'].to_numpy(dtype='float64') * df['preco_venda'].to_numpy(dtype='float64'))[no_quadrante]
+            escolhidos.extend(no_quadrante[np.argsort(-receita, kind='stable')][:limite // 3].tolist())
+    for coluna in ('popularidade', 'lucratividade'):
+        valores = df[coluna].to_numpy(dtype='float64')
+        ordem = np.argsort(valores, kind='stable')
+        escolhidos.extend(ordem[::-1][:EXTREMOS_POR_EIXO].tolist())
+        escolhidos.extend(ordem[:EXTREMOS_POR_EIXO].tolist())
+    # Remove repetidos mantendo a prioridade
+    return list(dict.fromkeys(escolhidos))[:limite]
+
+
+def densidade(x, y, bins=BINS_DENSIDADE):
+    """
+    Contagem de itens por célula de uma grade bins x bins (agregação no servidor).
+    Devolve (centros_x, centros_y, contagens[y, x]) com zeros trocados por NaN para não pintar o vazio.
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    validos = np.isfinite(x) & np.isfinite(y)
+    contagens, bordas_x, bordas_y = np.histogram2d(x[validos], y[validos], bins=bins)
+    contagens = contagens.T.astype('float32')
+    contagens[contagens == 0] = np.nan
+    return (bordas_x[:-1] + bordas_x[1:]) / 2, (bordas_y[:-1] + bordas_y[1:]) / 2, contagens
+
+
+def _tamanhos(popularidade, minimo=4, maximo=18):
+    # Mesmo papel do size="popularidade" do px.scatter, em escala de raiz para não estourar
+    p = np.sqrt(np.clip(np.asarray(popularidade, dtype='float64'), 0, None))
+    topo = p.max() if len(p) else 0
+    return (minimo + (maximo - minimo) * (p / topo if topo > 0 else p)).astype('float32')
+
+
+def _linhas_referencia(fig, ref_pop, ref_luc):
+    fig.add_vline(x=ref_pop, line_dash="dash", line_color="gray", annotation_text="Média Pop.")
+    fig.add_hline(y=ref_luc, line_dash="dash", line_color="gray", annotation_text="Média Lucro")
+
+
+def _figura_pequena(df, ref_pop, ref_luc, cores):
+    # Poucos itens: o gráfico original, com o nome de todos os produtos
+    fig = px.scatter(
+        df, x="popularidade", y="lucratividade", color="classificacao",
+        size="popularidade", hover_name="produto_nome", text="produto_nome",
+        color_discrete_map=cores, template="plotly_white", title="Matriz de Engenharia de Menu"
+    )
+    _linhas_referencia(fig, ref_pop, ref_luc)
+    fig.update_traces(textposition='top center')
+    return fig
+
+
+def _rotulos(fig, df, posicoes):
+    if not posicoes:
+        return
+    destaque = df.iloc[posicoes]
+    # Poucos pontos: traço SVG comum, para o texto ficar nítido por cima do WebGL
+    fig.add_trace(go.Scatter(
+        x=destaque['popularidade'].to_numpy(dtype='float32'), y=destaque['lucratividade'].to_numpy(dtype='float32'),
+        mode='markers+text', text=destaque['produto_nome'].astype(str).tolist(), textposition='top center',
+        marker=dict(size=9, color='rgba(0,0,0,0)', line=dict(width=1.5, color='black')),
+        name='Destaques', hoverinfo='text'
+    ))
+
+
+def montar_matriz(df, ref_pop, ref_luc, cores, busca=None, quadrante=None,
+                  limiar_webgl=LIMIAR_WEBGL, limiar_densidade=LIMIAR_DENSIDADE):
+    """
+    Matriz de Engenharia de Menu com nível de detalhe pelo tamanho do cardápio:
+    - até `limiar_webgl` itens: scatter SVG com todos os nomes (comportamento original);
+    - até `limiar_densidade`: um scattergl por quadrante, sem texto, com rótulos só nos destaques;
+    - acima: mapa de densidade calculado no servidor + quadrante em foco/destaques como pontos.
+    """
+    n = len(df)
+    if n <= limiar_webgl:
+        return _figura_pequena(df, ref_pop, ref_luc, cores)
+
+    fig = go.Figure()
+    x = df['popularidade'].to_numpy(dtype='float32')
+    y = df['lucratividade'].to_numpy(dtype='float32')
+    classes = df['classificacao'].astype(str).to_numpy()
+
+    if n <= limiar_densidade:
+        tamanhos = _tamanhos(x)
+        nomes = df['produto_nome'].astype(str).to_numpy()
+        for q in QUADRANTES:
+            m = classes == q
+            if not m.any():
+                continue
+            fig.add_trace(go.Scattergl(
+                x=x[m], y=y[m], mode='markers', name=q, text=nomes[m],
+                marker=dict(size=tamanhos[m], color=cores.get(q), opacity=0.7, line=dict(width=0)),
+                hovertemplate='<b>%{text}</b><br>Vendas: %{x:.0f}<br>Lucro: R$ %{y:.2f}<extra></extra>'
+            ))
+    else:
+        cx, cy, contagens = densidade(x, y)
+        fig.add_trace(go.Heatmap(
+            x=cx, y=cy, z=np.log10(contagens), colorscale='Greys', showscale=False, name='Densidade',
+            customdata=contagens, hovertemplate='Vendas ~%{x:.0f}<br>Lucro ~R$ %{y:.2f}<br>%{customdata:.0f} itens<extra></extra>'
+        ))
+        # Quadrante em foco continua visível ponto a ponto (WebGL)
+        if quadrante:
+            m = classes == quadrante
+            fig.add_trace(go.Scattergl(
+                x=x[m], y=y[m], mode='markers', name=quadrante,
+                marker=dict(size=4, color=cores.get(quadrante), opacity=0.6)
+            ))
+
+    _rotulos(fig, df, itens_rotulados(df, busca=busca, quadrante=quadrante))
+    _linhas_referencia(fig, ref_pop, ref_luc)
+    fig.update_layout(
+        template="plotly_white", title=f"Matriz de Engenharia de Menu ({n:,} itens)".replace(',', '.'),
+        xaxis_title="popularidade", yaxis_title="lucratividade", legend_title_text="classificacao"
+    )
+    return fig
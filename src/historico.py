@@ -0,0 +1,238 @@
+import json
+import os
+import re
+import threading
+import uuid
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from src.cache import hash_conteudo
+from src.dataloader import COLUNAS_NUMERICAS_VENDAS, _limpar_bloco_vendas, com_encoding
+from src.travas import trava_arquivo
+
+# --- CONFIGURAÇÃO ---
+DIRETORIO_HISTORICO = os.getenv('CHEFIA_HISTORICO', os.path.join('dataset', 'historico'))
+LINHAS_POR_BLOCO = 200_000
+LOJA_PADRAO = 'UNICA'
+GRANULARIDADES = ('semanal', 'mensal')
+
+RE_DATA_ARQUIVO = re.compile(r'(\d{4})-(\d{2})-(\d{2})')
+
+# Uma trava por diretório no processo inteiro: duas instâncias (ex: uma por rerun do Streamlit)
+# apontando para o mesmo histórico ainda se excluem
+_travas_diretorio = {}
+_travas_lock = threading.Lock()
+
+
+def _trava_do_diretorio(diretorio):
+    with _travas_lock:
+        return _travas_diretorio.setdefault(os.path.abspath(diretorio), threading.Lock())
+
+
+def data_do_arquivo(nome):
+    # "produtosdevenda-2025-10-13.csv" -> date(2025, 10, 13)
+    m = RE_DATA_ARQUIVO.search(os.path.basename(str(nome)))
+    return date(int(m.group(1)), int(m.group(2)), int(m.group(3))) if m else None
+
+
+def _slug(texto):
+    return re.sub(r'[^A-Za-z0-9_-]+', '_', str(texto)).strip('_') or LOJA_PADRAO
+
+
+def _periodo(datas, granularidade):
+    datas = pd.to_datetime(pd.Series(datas))
+    if granularidade == 'semanal':
+        iso = datas.dt.isocalendar()
+        return iso['year'].astype(str) + '-S' + iso['week'].astype(str).str.zfill(2)
+    return datas.dt.strftime('%Y-%m')
+
+
+def _gravar_json(caminho, dados):
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False, indent=1)
+
+
+def _finalizar(df):
+    # Mesmo formato de saída do filtrar_vendas
+    df['popularidade'] = df['vendas_loja'] + df['vendas_delivery']
+    df['receita_total'] = df['receita_loja'] + df['receita_delivery']
+    df['preco_venda'] = np.where(df['popularidade'] > 0, df['receita_total'] / df['popularidade'].where(df['popularidade'] > 0), 0)
+    return df[['produto_nome', 'popularidade', 'preco_venda', 'receita_total']]
+
+
+def _nome_e_data(arquivo, data_ref, nome):
+    nome = nome or getattr(arquivo, 'name', None) or str(arquivo)
+    data_ref = data_ref or data_do_arquivo(nome)
+    if data_ref is None:
+        raise ValueError(f"Não foi possível descobrir a data de '{nome}'. Informe data_ref.")
+    return nome, pd.Timestamp(data_ref).date()
+
+
+def ler_por_loja(arquivo, loja=None):
+    # Exportação do PDV somada por (loja, produto), lida em blocos; vazio quando o layout não é de vendas.
+    # Encoding farejado como no filtrar_vendas: uma exportação UTF-8 lida como latin1 viraria outros produtos
+    if hasattr(arquivo, 'seek'):
+        arquivo.seek(0)
+    return com_encoding(arquivo, lambda encoding: _somar_por_loja(arquivo, loja, encoding))
+
+
+def _somar_por_loja(arquivo, loja, encoding):
+    totais = []
+    leitor = pd.read_csv(arquivo, sep=';', encoding=encoding, dtype=str, chunksize=LINHAS_POR_BLOCO)
+    for bloco in leitor:
+        bloco = _limpar_bloco_vendas(bloco, manter_unidade=True)
+        if bloco is None:
+            return pd.DataFrame()
+        if 'loja' not in bloco.columns:
+            bloco['loja'] = (loja or LOJA_PADRAO).upper()
+        for col in COLUNAS_NUMERICAS_VENDAS:
+            if col not in bloco.columns:
+                bloco[col] = 0.0
+        totais.append(bloco.groupby(['loja', 'produto_nome'], sort=False)[COLUNAS_NUMERICAS_VENDAS].sum())
+    if not totais:
+        return pd.DataFrame()
+    return pd.concat(totais).groupby(level=[0, 1], sort=False).sum().reset_index()
+
+
+def comparar_vendas(a, b, periodo_a, periodo_b):
+    # Lado a lado por produto (saídas de vendas_periodo), maiores variações de receita primeiro
+    comp = a.merge(b, on='produto_nome', how='outer', suffixes=(f'_{periodo_a}', f'_{periodo_b}')).fillna(0)
+    comp['variacao_popularidade'] = comp[f'popularidade_{periodo_b}'] - comp[f'popularidade_{periodo_a}']
+    comp['variacao_receita'] = comp[f'receita_total_{periodo_b}'] - comp[f'receita_total_{periodo_a}']
+    return comp.sort_values('variacao_receita', key=np.abs, ascending=False, kind='stable').reset_index(drop=True)
+
+
+class HistoricoVendas:
+    """
+    Armazém local, só de acréscimo, das exportações de vendas do PDV.
+
+    Cada arquivo ingerido vira um Parquet em `vendas/loja=<loja>/data=<AAAA-MM-DD>/`, já somado
+    por produto. Arquivos com conteúdo já ingerido são ignorados (manifesto por hash). A cada
+    ingestão, os agregados semanais e mensais por loja e produto são atualizados só com as
+    linhas novas, então trocar ou comparar períodos nunca relê os CSVs brutos.
+
+    A ingestão é serializada por diretório: entre threads do processo por uma trava compartilhada
+    e entre processos (outras instâncias do painel, scripts) por uma trava de arquivo.
+    """
+
+    def __init__(self, diretorio=None):
+        self.diretorio = diretorio or DIRETORIO_HISTORICO
+        self._lock = _trava_do_diretorio(self.diretorio)
+
+    # --- CAMINHOS ---
+    @property
+    def _manifesto_caminho(self):
+        return os.path.join(self.diretorio, 'manifesto.json')
+
+    def _agregado_caminho(self, granularidade):
+        return os.path.join(self.diretorio, 'agregados', f'{granularidade}.parquet')
+
+    def _manifesto(self):
+        if not os.path.exists(self._manifesto_caminho):
+            return {}
+        with open(self._manifesto_caminho, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _gravar_atomico(self, caminho, escrever):
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.{uuid.uuid4().hex}.tmp"
+        escrever(temporario)
+        os.replace(temporario, caminho)
+
+    # --- INGESTÃO ---
+    def ingerir(self, arquivo, data_ref=None, loja=None, nome=None):
+        """
+        Acrescenta uma exportação ao histórico. A data vem de `data_ref` ou do nome do arquivo
+        (AAAA-MM-DD); a loja vem da coluna UNIDADE, de `loja` ou do padrão 'UNICA'.
+        Devolve um dict com o resultado ('ingerido' ou 'ignorado') e as linhas gravadas.
+        """
+        nome, data_ref = _nome_e_data(arquivo, data_ref, nome)
+        chave = hash_conteudo(arquivo)
+        with self._lock, trava_arquivo(os.path.join(self.diretorio, '.trava')):
+            manifesto = self._manifesto()
+            if chave in manifesto:
+                return {'status': 'ignorado', 'arquivo': nome, 'motivo': 'conteúdo já ingerido', **manifesto[chave]}
+
+            por_loja = ler_por_loja(arquivo, loja)
+            if por_loja.empty:
+                raise ValueError(f"'{nome}' não tem o layout de vendas esperado (coluna PRODUTO DE VENDA).")
+            por_loja['data'] = pd.Timestamp(data_ref)
+
+            for loja_atual, parte in por_loja.groupby('loja', sort=False):
+                caminho = os.path.join(
+                    self.diretorio, 'vendas', f'loja={_slug(loja_atual)}', f'data={data_ref.isoformat()}',
+                    f'{chave[:16]}.parquet'
+                )
+                self._gravar_atomico(caminho, lambda tmp, p=parte: p.to_parquet(tmp, index=False))
+
+            self._atualizar_agregados(por_loja)
+
+            registro = {'arquivo': nome, 'data': data_ref.isoformat(), 'linhas': int(len(por_loja)),
+                        'lojas': sorted(por_loja['loja'].unique().tolist())}
+            manifesto[chave] = registro
+            self._gravar_atomico(self._manifesto_caminho, lambda tmp: _gravar_json(tmp, manifesto))
+        return {'status': 'ingerido', **registro}
+
+    def _atualizar_agregados(self, novas):
+        for granularidade in GRANULARIDADES:
+            caminho = self._agregado_caminho(granularidade)
+            novas_periodo = novas.assign(periodo=_periodo(novas['data'], granularidade).to_numpy())
+            novas_periodo = novas_periodo.drop(columns='data')
+            if os.path.exists(caminho):
+                novas_periodo = pd.concat([pd.read_parquet(caminho), novas_periodo], ignore_index=True)
+            agregado = novas_periodo.groupby(['periodo', 'loja', 'produto_nome'], sort=False)[COLUNAS_NUMERICAS_VENDAS].sum()
+            agregado = agregado.reset_index().sort_values(['periodo', 'loja'], kind='stable')
+            self._gravar_atomico(caminho, lambda tmp, a=agregado: a.to_parquet(tmp, index=False))
+
+    # --- CONSULTAS (sempre sobre os agregados) ---
+    def _agregado(self, granularidade):
+        if granularidade not in GRANULARIDADES:
+            raise ValueError(f"Granularidade deve ser uma de {GRANULARIDADES}.")
+        caminho = self._agregado_caminho(granularidade)
+        if not os.path.exists(caminho):
+            return pd.DataFrame(columns=['periodo', 'loja', 'produto_nome'] + COLUNAS_NUMERICAS_VENDAS)
+        return pd.read_parquet(caminho, memory_map=True)
+
+    def periodos(self, granularidade='mensal'):
+        return sorted(self._agregado(granularidade)['periodo'].unique().tolist())
+
+    def lojas(self):
+        return sorted(self._agregado('mensal')['loja'].unique().tolist())
+
+    def arquivos_ingeridos(self):
+        return pd.DataFrame(list(self._manifesto().values()))
+
+    def vendas_periodo(self, inicio=None, fim=None, lojas=None, granularidade='mensal'):
+        """
+        Vendas por produto somadas entre os períodos `inicio` e `fim` (inclusive, ex: '2025-09'),
+        no mesmo formato do filtrar_vendas (produto_nome, popularidade, preco_venda, receita_total).
+        """
+        ag = self._agregado(granularidade)
+        if inicio is not None:
+            ag = ag[ag['periodo'] >= inicio]
+        if fim is not None:
+            ag = ag[ag['periodo'] <= fim]
+        if lojas:
+            ag = ag[ag['loja'].isin([str(l).upper() for l in lojas])]
+        por_produto = ag.groupby('produto_nome', sort=False)[COLUNAS_NUMERICAS_VENDAS].sum().reset_index()
+        return _finalizar(por_produto)
+
+    def comparar_periodos(self, periodo_a, periodo_b, lojas=None, granularidade='mensal'):
+        """
+        Lado a lado por produto: popularidade e receita em A e B, com as variações absolutas.
+        """
+        a = self.vendas_periodo(periodo_a, periodo_a, lojas, granularidade)
+        b = self.vendas_periodo(periodo_b, periodo_b, lojas, granularidade)
+        return comparar_vendas(a, b, periodo_a, periodo_b)
+
+
+_historico_padrao = None
+
+
+def historico_padrao():
+    global _historico_padrao
+    if _historico_padrao is None:
+        _historico_padrao = HistoricoVendas()
+    return _historico_padrao
@@ -0,0 +1,62 @@
+import importlib
+import threading
+import time
+
+from src.instrumentacao import medir
+
+# O src.agentedeia puxa crewai + litellm + SDKs dos provedores (segundos de import a frio).
+# O painel não precisa de nada disso: a camada de IA só é importada quando um relatório ou
+# uma pergunta chega, ou em segundo plano depois que a página já foi desenhada.
+MODULO_IA = 'src.agentedeia'
+
+_lock = threading.Lock()
+_aquecimento = None
+_modulo = None
+tempo_importacao_s = None
+
+
+def ia_carregada():
+    # Só depois que o import terminou: durante o aquecimento a chave já existe em sys.modules,
+    # mas o módulo ainda está executando e as funções dele podem não existir
+    return _modulo is not None
+
+
+def carregar_ia():
+    """
+    Importa (uma vez por processo) e devolve o módulo src.agentedeia. Se o aquecimento em
+    segundo plano estiver em andamento, o lock de import do Python faz esta chamada esperar
+    por ele em vez de importar duas vezes. Levanta ImportError se o crewai não estiver instalado.
+    """
+    global _modulo, tempo_importacao_s
+    if _modulo is not None:
+        return _modulo
+    with medir('ia.importacao'):
+        inicio = time.perf_counter()
+        # Com o módulo pela metade em sys.modules (aquecimento), o import_module espera o lock do módulo
+        modulo = importlib.import_module(MODULO_IA)
+    with _lock:
+        if tempo_importacao_s is None:
+            tempo_importacao_s = time.perf_counter() - inicio
+        _modulo = modulo
+    return modulo
+
+
+def _aquecer():
+    try:
+        carregar_ia()
+    except ImportError:
+        # Sem crewai o erro aparece quando o usuário pedir a IA, com a mensagem certa
+        pass
+
+
+def aquecer_em_segundo_plano():
+    """
+    Dispara o import da camada de IA numa thread daemon (no máximo uma vez por processo).
+    """
+    global _aquecimento
+    if ia_carregada():
+        return
+    with _lock:
+        if _aquecimento is None:
+            _aquecimento = threading.Thread(target=_aquecer, name='aquecimento-ia', daemon=True)
+            _aquecimento.start()
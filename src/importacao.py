@@ -0,0 +1,256 @@
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.dataloader import COLUNAS_NUMERICAS_VENDAS, COLUNAS_VENDAS, _finalizar_vendas, _limpar_bloco_vendas
+from src.formato import farejar
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    ARROW_DISPONIVEL = True
+except ImportError:
+    ARROW_DISPONIVEL = False
+
+# --- LAYOUTS ACEITOS (validados só pelo cabeçalho, antes de ler o arquivo) ---
+LAYOUTS = {
+    # Backup do próprio app / cardápio digitado
+    'cardapio': {'produto_nome', 'custo_producao', 'preco_venda', 'popularidade'},
+    # Exportação de vendas do PDV (produtosdevenda-*.csv)
+    'vendas': {'PRODUTO DE VENDA'},
+    # Ficha técnica (lbox_unidades_cardapio.csv)
+    'ficha': {'produto_principal', 'valor_custo'},
+}
+NUMERICAS_CARDAPIO = ['custo_producao', 'preco_venda', 'popularidade']
+LIMITE_REJEITADAS = 1_000   # linhas rejeitadas guardadas por arquivo (a contagem é sempre completa)
+
+
+def _normalizar_coluna(nome, layout):
+    nome = str(nome).replace('"', '').strip()
+    return nome.upper() if layout == 'vendas' else nome.lower().replace(' ', '_')
+
+
+def detectar_layout(colunas):
+    """
+    Layout do arquivo pelo cabeçalho, ou None. Aceita variações de caixa, aspas e espaços.
+    """
+    maiusculas = {str(c).replace('"', '').strip().upper() for c in colunas}
+    minusculas = {str(c).replace('"', '').strip().lower().replace(' ', '_') for c in colunas}
+    if LAYOUTS['cardapio'] <= minusculas:
+        return 'cardapio'
+    if LAYOUTS['vendas'] <= maiusculas and maiusculas & set(COLUNAS_VENDAS) - {'PRODUTO DE VENDA'}:
+        return 'vendas'
+    if LAYOUTS['ficha'] <= minusculas:
+        return 'ficha'
+    return None
+
+
+def _ler_texto(conteudo, formato):
+    """
+    Lê todas as colunas como texto. Com pyarrow, o parse é multithread (use_threads); a conversão
+    numérica fica para depois, vetorizada, para saber exatamente quais linhas falharam.
+    """
+    if ARROW_DISPONIVEL:
+        colunas = formato['colunas']
+        if formato['encoding'] == 'utf-8-sig':
+            conteudo = conteudo[3:]   # o Arrow não remove o BOM sozinho
+        tabela = pa_csv.read_csv(
+            pa.BufferReader(conteudo),
+            read_options=pa_csv.ReadOptions(encoding=formato['encoding'].replace('-sig', ''), use_threads=True,
+                                            block_size=4 << 20),
+            parse_options=pa_csv.ParseOptions(delimiter=formato['separador'], newlines_in_values=False),
+            convert_options=pa_csv.ConvertOptions(column_types={c: pa.string() for c in colunas},
+                                                  strings_can_be_null=False, quoted_strings_can_be_null=False),
+        )
+        return tabela.to_pandas()
+    return pd.read_csv(io.BytesIO(conteudo), sep=formato['separador'], encoding=formato['encoding'],
+                       dtype=str, keep_default_na=False)
+
+
+def _numeros(serie, formato):
+    # Texto -> float conforme a convenção farejada; vazio/inválido vira NaN
+    s = serie.astype(str).str.strip().str.strip('"')
+    if formato['milhar']:
+        s = s.str.replace(formato['milhar'], '', regex=False)
+    if formato['decimal'] == ',':
+        s = s.str.replace(',', '.', regex=False)
+    return pd.to_numeric(s.where(s != ''), errors='coerce')
+
+
+def _rejeitar(df, mascara, motivo, rejeitadas):
+    # Anota as linhas de `mascara` (número da linha no arquivo + motivo) e devolve a máscara das que ficam
+    posicoes = np.flatnonzero(mascara.to_numpy())
+    if len(posicoes):
+        rejeitadas['total'] += len(posicoes)
+        amostra = posicoes[:max(LIMITE_REJEITADAS - sum(len(q) for q in rejeitadas['quadros']), 0)]
+        if len(amostra):
+            rejeitadas['quadros'].append(pd.DataFrame({
+                'linha': amostra + 2,   # +1 do cabeçalho, +1 porque o arquivo começa na linha 1
+                'motivo': motivo,
+                'conteudo': df.iloc[amostra].astype(str).agg(' | '.join, axis=1).to_numpy(),
+            }))
+    return ~mascara
+
+
+def _processar_cardapio(df, formato, rejeitadas):
+    df.columns = [_normalizar_coluna(c, 'cardapio') for c in df.columns]
+    # Nomes do backup voltam como o usuário digitou (só sem espaços sobrando)
+    nomes = df['produto_nome'].astype(str).str.strip().str.replace(' +', ' ', regex=True)
+    valido = _rejeitar(df, nomes == '', 'nome vazio', rejeitadas)
+    saida = pd.DataFrame({'produto_nome': nomes})
+    for coluna in NUMERICAS_CARDAPIO:
+        valores = _numeros(df[coluna], formato)
+        valido &= _rejeitar(df, valido & valores.isna(), f'{coluna} não numérico', rejeitadas)
+        valido &= _rejeitar(df, valido & (valores < 0), f'{coluna} negativo', rejeitadas)
+        saida[coluna] = valores
+    saida = saida[valido.to_numpy()]
+    saida['popularidade'] = saida['popularidade'].round().astype('int64')
+    return saida.reset_index(drop=True)
+
+
+def _processar_vendas(df, formato, rejeitadas):
+    df.columns = [_normalizar_coluna(c, 'vendas') for c in df.columns]
+    valido = _rejeitar(df, df['PRODUTO DE VENDA'].astype(str).str.strip() == '', 'produto vazio', rejeitadas)
+    numeros = {}
+    for original, coluna in COLUNAS_VENDAS.items():
+        if coluna in COLUNAS_NUMERICAS_VENDAS and original in df.columns:
+            texto = df[original].astype(str).str.strip()
+            numeros[original] = _numeros(texto, formato)
+            invalido = valido & (texto != '') & numeros[original].isna()
+            valido &= _rejeitar(df, invalido, f'{original} não numérico', rejeitadas)
+    # Mesma limpeza/agregação do filtrar_vendas para as linhas aceitas (números já convertidos)
+    limpo = _limpar_bloco_vendas(df.assign(**numeros)[valido.to_numpy()].copy(), numeros_convertidos=True)
+    for coluna in COLUNAS_NUMERICAS_VENDAS:
+        if coluna not in limpo.columns:
+            limpo[coluna] = 0.0
+    somado = limpo.groupby('produto_nome', sort=False)[COLUNAS_NUMERICAS_VENDAS].sum().reset_index()
+    return _finalizar_vendas(somado)
+
+
+def _processar_ficha(df, formato, rejeitadas):
+    df.columns = [_normalizar_coluna(c, 'ficha') for c in df.columns]
+    custo = _numeros(df['valor_custo'], formato)
+    valido = _rejeitar(df, custo.isna(), 'valor_custo não numérico', rejeitadas)
+    nomes = df['produto_principal'].astype(str).str.strip().str.replace(' +', ' ', regex=True).str.upper().str.rstrip('.')
+    valido &= _rejeitar(df, valido & (nomes == ''), 'produto vazio', rejeitadas)
+    ficha = pd.DataFrame({'produto_nome': nomes, 'custo_producao': custo})[valido.to_numpy()]
+    return ficha.groupby('produto_nome', sort=False)['custo_producao'].sum().reset_index()
+
+
+PROCESSADORES = {'cardapio': _processar_cardapio, 'vendas': _processar_vendas, 'ficha': _processar_ficha}
+
+
+def importar_arquivo(arquivo, nome=None):
+    """
+    Fareja o formato, valida o layout pelo cabeçalho, lê e converte um arquivo.
+    Nunca levanta exceção: o resultado traz 'erro', as linhas rejeitadas (com motivo) e a vazão.
+    """
+    inicio = time.perf_counter()
+    nome = nome or getattr(arquivo, 'name', None) or os.path.basename(str(arquivo))
+    resultado = {'arquivo': nome, 'layout': None, 'erro': None, 'aviso': None, 'linhas': 0, 'aceitas': 0, 'rejeitadas': 0,
+                 'df': None, 'rejeicoes': pd.DataFrame(columns=['linha', 'motivo', 'conteudo'])}
+    try:
+        if hasattr(arquivo, 'getvalue'):
+            conteudo = arquivo.getvalue()
+        elif hasattr(arquivo, 'read'):
+            arquivo.seek(0)
+            conteudo = arquivo.read()
+        elif isinstance(arquivo, (bytes, bytearray)):
+            conteudo = bytes(arquivo)
+        else:
+            with open(arquivo, 'rb') as f:
+                conteudo = f.read()
+        formato = farejar(conteudo)
+        resultado.update({k: formato[k] for k in ('encoding', 'separador', 'decimal')}, bytes=len(conteudo))
+
+        layout = detectar_layout(formato['colunas'])
+        if layout is None:
+            raise ValueError(f"cabeçalho não reconhecido: {', '.join(formato['colunas'][:8]) or '(vazio)'}")
+        resultado['layout'] = layout
+
+        df = _ler_texto(conteudo, formato)
+        rejeitadas = {'quadros': [], 'total': 0}
+        resultado['df'] = PROCESSADORES[layout](df, formato, rejeitadas)
+        resultado['linhas'] = len(df)
+        if rejeitadas['quadros']:
+            resultado['rejeicoes'] = pd.concat(rejeitadas['quadros'], ignore_index=True).sort_values('linha', kind='stable')
+        resultado['rejeitadas'] = rejeitadas['total']
+        resultado['aceitas'] = resultado['linhas'] - resultado['rejeitadas']
+    except (OSError, ValueError, KeyError, UnicodeDecodeError, pd.errors.ParserError) as e:
+        resultado['erro'] = f"{type(e).__name__}: {e}"
+    except Exception as e:   # erros do pyarrow (ArrowInvalid etc.) quando ele está instalado
+        if ARROW_DISPONIVEL and isinstance(e, pa.ArrowException):
+            resultado['erro'] = f"CSV inválido: {e}"
+        else:
+            raise
+
+    duracao = time.perf_counter() - inicio
+    resultado['tempo_s'] = duracao
+    resultado['linhas_por_s'] = resultado['linhas'] / duracao if duracao > 0 else 0.0
+    resultado['mb_por_s'] = resultado.get('bytes', 0) / 1e6 / duracao if duracao > 0 else 0.0
+    return resultado
+
+
+def importar_arquivos(arquivos, processos=None):
+    """
+    Importa vários arquivos em paralelo (threads: o parse do Arrow e as operações de string
+    do pandas soltam o GIL). Devolve a lista de resultados na ordem dos arquivos.
+    """
+    arquivos = list(arquivos)
+    if len(arquivos) <= 1:
+        return [importar_arquivo(a) for a in arquivos]
+    with ThreadPoolExecutor(max_workers=processos or min(len(arquivos), os.cpu_count() or 1)) as pool:
+        return list(pool.map(importar_arquivo, arquivos))
+
+
+def combinar(resultados, correspondencia=None):
+    """
+    Junta os arquivos importados num cardápio (produto_nome, custo_producao, preco_venda, popularidade):
+    arquivos de cardápio são concatenados (o último arquivo vence em nomes repetidos); vendas do PDV
+    são somadas entre si e, havendo ficha técnica no lote, casadas com ela para obter o custo.
+    Sem ficha no lote, as vendas entram com custo_producao 0 e o resultado de cada arquivo de
+    vendas ganha um 'aviso' (aparece no resumo_importacao).
+    """
+    por_layout = {'cardapio': [], 'vendas': [], 'ficha': []}
+    for r in resultados:
+        if r['erro'] is None and r['df'] is not None and not r['df'].empty:
+            por_layout[r['layout']].append(r['df'])
+
+    partes = []
+    if por_layout['cardapio']:
+        partes.append(pd.concat(por_layout['cardapio'], ignore_index=True))
+    if por_layout['vendas']:
+        vendas = pd.concat(por_layout['vendas'], ignore_index=True)
+        vendas = vendas.groupby('produto_nome', sort=False)[['popularidade', 'receita_total']].sum().reset_index()
+        vendas['preco_venda'] = np.where(vendas['popularidade'] > 0, vendas['receita_total'] / vendas['popularidade'].where(vendas['popularidade'] > 0), 0)
+        if por_layout['ficha']:
+            from src.correspondencia import CorrespondenciaProdutos
+            custos = pd.concat(por_layout['ficha'], ignore_index=True).drop_duplicates('produto_nome', keep='last')
+            juntos = (correspondencia or CorrespondenciaProdutos()).juntar(vendas, custos)
+        else:
+            # Sem ficha técnica não há custo: os itens entram para o usuário completar na tabela
+            juntos = vendas.assign(custo_producao=0.0)
+            for r in resultados:
+                if r['layout'] == 'vendas' and r['erro'] is None:
+                    r['aviso'] = "sem ficha técnica no lote: custo de produção zerado, preencha na tabela"
+        juntos = juntos[juntos['popularidade'] > 0]
+        partes.append(juntos[['produto_nome', 'custo_producao', 'preco_venda', 'popularidade']].assign(
+            popularidade=lambda d: d['popularidade'].round().astype('int64')))
+    if not partes:
+        return pd.DataFrame(columns=['produto_nome', 'custo_producao', 'preco_venda', 'popularidade'])
+    return pd.concat(partes, ignore_index=True).drop_duplicates('produto_nome', keep='last').reset_index(drop=True)
+
+
+def resumo_importacao(resultados):
+    # Tabela por arquivo para a interface / CLI
+    return pd.DataFrame([{
+        'arquivo': r['arquivo'], 'layout': r['layout'] or '-', 'encoding': r.get('encoding', '-'),
+        'separador': repr(r.get('separador', '-')), 'decimal': r.get('decimal', '-'), 'linhas': r['linhas'],
+        'aceitas': r['aceitas'], 'rejeitadas': r['rejeitadas'], 'tempo_ms': round(r['tempo_s'] * 1000, 1),
+        'linhas_por_s': round(r['linhas_por_s']), 'mb_por_s': round(r['mb_por_s'], 1), 'erro': r['erro'] or '',
+        'aviso': r.get('aviso') or '',
+    } for r in resultados])
@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+
+from src.engenharia import TIPO_QUADRANTE, classificar_quadrantes
+
+COLUNAS_BASE = ["produto_nome", "custo_producao", "preco_venda", "popularidade"]
+
+# Após N atualizações por delta, as somas são refeitas do zero para não acumular erro de ponto flutuante
+RESSINCRONIZAR_A_CADA = 256
+
+
+def _linhas_alteradas(novo, antigo):
+    # Máscara vetorizada de linhas com qualquer coluna base diferente (NaN == NaN conta como igual)
+    mudou = np.zeros(len(novo), dtype=bool)
+    for c in COLUNAS_BASE:
+        a = novo[c].to_numpy()
+        b = antigo[c].to_numpy()
+        mudou |= ~((a == b) | (pd.isna(a) & pd.isna(b)))
+    return mudou
+
+
+class MenuIncremental:
+    """
+    Camada de cálculo do dashboard que sobrevive entre reruns do Streamlit.
+
+    Recebe a tabela do `st.data_editor` e mantém as colunas derivadas (lucratividade,
+    receita_total, classificacao), as somas das médias e resultados memorizados (KPIs,
+    figura). Só as linhas editadas são recalculadas; a matriz inteira é reclassificada
+    apenas quando as médias de corte se movem.
+    """
+
+    def __init__(self):
+        self.df = None
+        self.ref_pop = None
+        self.ref_luc = None
+        self.versao = 0
+        self.linhas_recalculadas = 0
+        self.reclassificou_tudo = False
+        self._soma_pop = 0.0
+        self._soma_luc = 0.0
+        self._n_pop = 0
+        self._n_luc = 0
+        self._atualizacoes = 0
+        self._memo = {}
+
+    # --- ATUALIZAÇÃO ---
+    def atualizar(self, df_editado):
+        base = df_editado[COLUNAS_BASE]
+        if (self.df is None or len(base) != len(self.df) or not base.index.equals(self.df.index)
+                or self._atualizacoes >= RESSINCRONIZAR_A_CADA):
+            self._recalcular_tudo(base)
+            return self.df
+
+        idx = np.flatnonzero(_linhas_alteradas(base, self.df))
+        self.linhas_recalculadas = len(idx)
+        self.reclassificou_tudo = False
+        if len(idx) == 0:
+            return self.df
+
+        df = base.copy()
+        luc_antiga = self.df['lucratividade'].to_numpy()
+        pop_antiga = self.df['popularidade'].to_numpy(dtype='float64')
+        luc = luc_antiga.copy()
+        receita = self.df['receita_total'].to_numpy(copy=True)
+
+        preco = df['preco_venda'].to_numpy(dtype='float64')
+        custo = df['custo_producao'].to_numpy(dtype='float64')
+        pop = df['popularidade'].to_numpy(dtype='float64')
+        luc[idx] = preco[idx] - custo[idx]
+        receita[idx] = preco[idx] * pop[idx]
+
+        # Médias atualizadas pela diferença das linhas alteradas (ignorando vazios, como o .mean())
+        self._soma_pop += np.nansum(pop[idx]) - np.nansum(pop_antiga[idx])
+        self._soma_luc += np.nansum(luc[idx]) - np.nansum(luc_antiga[idx])
+        self._n_pop += int(np.count_nonzero(~np.isnan(pop[idx])) - np.count_nonzero(~np.isnan(pop_antiga[idx])))
+        self._n_luc += int(np.count_nonzero(~np.isnan(luc[idx])) - np.count_nonzero(~np.isnan(luc_antiga[idx])))
+        self._atualizacoes += 1
+        ref_pop, ref_luc = self._medias()
+
+        df['lucratividade'] = luc
+        df['receita_total'] = receita
+        if ref_pop == self.ref_pop and ref_luc == self.ref_luc:
+            codigos = self.df['classificacao'].cat.codes.to_numpy(copy=True)
+            codigos[idx] = classificar_quadrantes(pop[idx], luc[idx], ref_pop, ref_luc).codes
+            df['classificacao'] = pd.Categorical.from_codes(codigos, dtype=TIPO_QUADRANTE)
+        else:
+            df['classificacao'] = classificar_quadrantes(pop, luc, ref_pop, ref_luc)
+            self.reclassificou_tudo = True
+
+        self.df, self.ref_pop, self.ref_luc = df, ref_pop, ref_luc
+        self.versao += 1
+        return self.df
+
+    def _medias(self):
+        ref_pop = self._soma_pop / self._n_pop if self._n_pop else np.nan
+        ref_luc = self._soma_luc / self._n_luc if self._n_luc else np.nan
+        return ref_pop, ref_luc
+
+    def _recalcular_tudo(self, base):
+        df = base.copy()
+        pop = df['popularidade'].to_numpy(dtype='float64')
+        luc = df['preco_venda'].to_numpy(dtype='float64') - df['custo_producao'].to_numpy(dtype='float64')
+        df['lucratividade'] = luc
+        df['receita_total'] = df['preco_venda'].to_numpy(dtype='float64') * pop
+
+        self._soma_pop = float(np.nansum(pop))
+        self._soma_luc = float(np.nansum(luc))
+        self._n_pop = int(np.count_nonzero(~np.isnan(pop)))
+        self._n_luc = int(np.count_nonzero(~np.isnan(luc)))
+        self._atualizacoes = 0
+        self.ref_pop, self.ref_luc = self._medias()
+        df['classificacao'] = classificar_quadrantes(pop, luc, self.ref_pop, self.ref_luc)
+
+        self.df = df
+        self.versao += 1
+        self.linhas_recalculadas = len(df)
+        self.reclassificou_tudo = True
+
+    # --- RESULTADOS MEMORIZADOS ---
+    def memo(self, nome, fabrica, *dependencias):
+        """
+        Devolve o valor guardado em `nome` enquanto a versão dos dados e as dependências
+        extras não mudarem; caso contrário chama `fabrica()` e guarda o resultado.
+        """
+        chave = (self.versao,) + dependencias
+        guardado = self._memo.get(nome)
+        if guardado is not None and guardado[0] == chave:
+            return guardado[1]
+        valor = fabrica()
+        self._memo[nome] = (chave, valor)
+        return valor
+
+    def kpis(self):
+        return self.memo('kpis', lambda: self.df['classificacao'].value_counts().to_dict())
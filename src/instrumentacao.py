@@ -0,0 +1,219 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import pandas as pd
+
+try:
+    import psutil
+    PSUTIL_DISPONIVEL = True
+except ImportError:
+    import resource
+    PSUTIL_DISPONIVEL = False
+
+# --- CONFIGURAÇÃO ---
+EXECUCOES_GUARDADAS = int(os.getenv('CHEFIA_DIAGNOSTICO_EXECUCOES', '20'))
+# Se definido, cada execução encerrada é acrescentada a este arquivo JSONL
+CAMINHO_JSONL = os.getenv('CHEFIA_DIAGNOSTICO_JSONL') or None
+
+_local = threading.local()
+
+
+def memoria_mb():
+    # RSS atual com psutil (requirements.txt); sem ele, o pico de RSS do processo (ru_maxrss, em KB
+    # no Linux), que nunca desce: os deltas por etapa só mostram crescimento do pico
+    if PSUTIL_DISPONIVEL:
+        return psutil.Process().memory_info().rss / 1e6
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def tamanho_df(df):
+    if df is None or not hasattr(df, 'shape'):
+        return {}
+    return {'linhas': int(df.shape[0]), 'colunas': int(df.shape[1]) if df.ndim > 1 else 1,
+            'df_mb': round(float(df.memory_usage(index=False).sum()) / 1e6, 3) if hasattr(df, 'memory_usage') else None}
+
+
+class _Nulo:
+    # Devolvido quando a instrumentação está desligada: entra, sai e descarta tudo
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setitem__(self, chave, valor):
+        pass
+
+    def update(self, *args, **kwargs):
+        pass
+
+
+_NULO = _Nulo()
+
+
+class _Etapa:
+    def __init__(self, coletor, nome, info):
+        self.coletor = coletor
+        self.evento = {'tipo': 'etapa', 'nome': nome, **info}
+
+    def __enter__(self):
+        self._mem = memoria_mb()
+        self._inicio = time.perf_counter()
+        return self.evento
+
+    def __exit__(self, tipo_exc, exc, tb):
+        self.evento['duracao_ms'] = round((time.perf_counter() - self._inicio) * 1000, 3)
+        self.evento['memoria_delta_mb'] = round(memoria_mb() - self._mem, 3)
+        self.evento['inicio_ms'] = round((self._inicio - self.coletor.inicio) * 1000, 3)
+        if tipo_exc is not None:
+            self.evento['erro'] = tipo_exc.__name__
+        self.coletor.eventos.append(self.evento)
+        return False
+
+
+class Coletor:
+    """
+    Medições de uma execução (um rerun do Streamlit): etapas cronometradas, eventos avulsos
+    (tokens, latência da IA) e contadores (acertos/faltas de cache).
+    """
+
+    def __init__(self, rotulo=''):
+        self.rotulo = rotulo
+        self.criado = time.time()
+        self.inicio = time.perf_counter()
+        self.memoria_inicial_mb = memoria_mb()
+        self.eventos = []
+        self.contadores = {}
+
+    def etapa(self, nome, **info):
+        return _Etapa(self, nome, info)
+
+    def registrar(self, nome, **valores):
+        self.eventos.append({'tipo': 'evento', 'nome': nome,
+                             'inicio_ms': round((time.perf_counter() - self.inicio) * 1000, 3), **valores})
+
+    def contar(self, nome, n=1):
+        self.contadores[nome] = self.contadores.get(nome, 0) + n
+
+    def duracao_ms(self):
+        return (time.perf_counter() - self.inicio) * 1000
+
+    def etapas(self):
+        return pd.DataFrame([e for e in self.eventos if e['tipo'] == 'etapa'])
+
+    def taxas_cache(self):
+        # 'cache_x.acerto' / 'cache_x.falta' -> {'cache_x': (acertos, faltas, taxa)}
+        taxas = {}
+        for nome in {c.rsplit('.', 1)[0] for c in self.contadores if c.endswith(('.acerto', '.falta'))}:
+            acertos = self.contadores.get(f'{nome}.acerto', 0)
+            faltas = self.contadores.get(f'{nome}.falta', 0)
+            taxas[nome] = (acertos, faltas, acertos / (acertos + faltas) if acertos + faltas else 0.0)
+        return taxas
+
+    def tokens(self):
+        soma = {'prompt': 0, 'completion': 0}
+        for e in self.eventos:
+            if e['nome'] == 'llm.tokens':
+                soma['prompt'] += e.get('prompt') or 0
+                soma['completion'] += e.get('completion') or 0
+        return soma
+
+    def linhas_jsonl(self):
+        base = {'execucao': self.rotulo, 'ts': round(self.criado, 3)}
+        linhas = [json.dumps({**base, **e}, ensure_ascii=False, default=str) for e in self.eventos]
+        linhas.append(json.dumps({**base, 'tipo': 'resumo', 'duracao_ms': round(self.duracao_ms(), 3),
+                                  'memoria_mb': round(memoria_mb(), 1), 'contadores': self.contadores},
+                                 ensure_ascii=False))
+        return linhas
+
+
+class Instrumentacao:
+    """
+    Guarda os coletores das últimas execuções de uma sessão. Enquanto `ativo` é falso, nenhum
+    coletor fica associado à thread e as chamadas de `medir`/`registrar`/`contar` espalhadas
+    pelo código viram uma consulta a um thread-local.
+
+    A execução em andamento fica na própria instância (que vive no session_state), não no
+    thread-local: o Streamlit roda cada rerun numa thread nova, então só assim o rerun seguinte
+    ainda acha a execução que terminou sem `encerrar_execucao` (st.stop, exceção) para gravá-la.
+    """
+
+    def __init__(self, maximo=None):
+        self.execucoes = deque(maxlen=maximo or EXECUCOES_GUARDADAS)
+        self._contador = 0
+        self._atual = None
+
+    def iniciar_execucao(self, ativo):
+        # Chamado no topo de cada rerun; grava a execução anterior se ela não foi encerrada
+        self.encerrar_execucao()
+        if not ativo:
+            _local.coletor = None
+            return None
+        self._contador += 1
+        coletor = Coletor(rotulo=f"{os.getpid()}-{int(time.time())}-{self._contador}")
+        self.execucoes.append(coletor)
+        self._atual = _local.coletor = coletor
+        return coletor
+
+    def encerrar_execucao(self):
+        """
+        Chamado no fim do script: acrescenta a execução ao CHEFIA_DIAGNOSTICO_JSONL (uma vez só)
+        e desassocia o coletor da thread.
+        """
+        atual, self._atual = self._atual, None
+        if getattr(_local, 'coletor', None) is atual:
+            _local.coletor = None
+        if atual is not None and CAMINHO_JSONL:
+            try:
+                with open(CAMINHO_JSONL, 'a', encoding='utf-8') as f:
+                    f.write('\n'.join(atual.linhas_jsonl()) + '\n')
+            except OSError:
+                pass
+
+    def exportar_jsonl(self):
+        return '\n'.join(linha for c in self.execucoes for linha in c.linhas_jsonl()) + '\n'
+
+
+# --- API USADA PELOS MÓDULOS (custo ~zero quando desligada) ---
+def coletor_atual():
+    return getattr(_local, 'coletor', None)
+
+
+def medir(nome, **info):
+    """
+    `with medir('vendas.leitura') as m: ...; m['linhas'] = len(df)`
+    """
+    coletor = getattr(_local, 'coletor', None)
+    return _NULO if coletor is None else coletor.etapa(nome, **info)
+
+
+def registrar(nome, **valores):
+    coletor = getattr(_local, 'coletor', None)
+    if coletor is not None:
+        coletor.registrar(nome, **valores)
+
+
+def contar(nome, n=1):
+    coletor = getattr(_local, 'coletor', None)
+    if coletor is not None:
+        coletor.contar(nome, n)
+
+
+def cronometrado(nome):
+    # Decorador: cronometra a função e anota o tamanho do DataFrame devolvido
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            coletor = getattr(_local, 'coletor', None)
+            if coletor is None:
+                return funcao(*args, **kwargs)
+            with coletor.etapa(nome) as evento:
+                resultado = funcao(*args, **kwargs)
+                evento.update(tamanho_df(resultado))
+            return resultado
+        return envolvida
+    return decorador
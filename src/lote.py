@@ -0,0 +1,238 @@
+import glob
+import os
+import re
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from src.correspondencia import CorrespondenciaProdutos
+from src.dataloader import carregar_ficha, carregar_vendas
+from src.engenharia import classificar_menu
+
+# --- CONFIGURAÇÃO ---
+PADROES_VENDAS = ('produtosdevenda*.csv', '*vendas*.csv')
+PADROES_FICHA = ('lbox*cardapio*.csv', '*ficha*.csv')
+COLUNAS_RESULTADO = ['produto_nome', 'custo_producao', 'preco_venda', 'popularidade',
+                     'receita_total', 'lucratividade', 'classificacao']
+LINHAS_POR_BLOCO = 200_000
+# Nomes que o Windows não aceita como arquivo, com qualquer extensão
+NOMES_RESERVADOS = {'CON', 'PRN', 'AUX', 'NUL', *(f'COM{i}' for i in range(1, 10)), *(f'LPT{i}' for i in range(1, 10))}
+
+
+def nome_arquivo_loja(loja):
+    """
+    Nome da loja (vindo do manifesto ou da pasta) seguro para usar como arquivo: sem acentos,
+    separadores de caminho, '..' ou caracteres inválidos no Windows ("São Paulo/Centro" -> "Sao_Paulo_Centro").
+    """
+    texto = unicodedata.normalize('NFKD', str(loja)).encode('ascii', 'ignore').decode('ascii')
+    nome = re.sub(r'[^A-Za-z0-9_-]+', '_', texto).strip('_-') or 'LOJA'
+    return f'_{nome}' if nome.upper() in NOMES_RESERVADOS else nome
+
+
+def _nomes_de_arquivo(trabalhos):
+    # Lojas diferentes podem dar o mesmo nome seguro ("Loja 1" e "Loja/1"): a segunda vira "Loja_1-2"
+    usados = {}
+    for trabalho in trabalhos:
+        base = nome_arquivo_loja(trabalho['loja'])
+        n = usados[base.lower()] = usados.get(base.lower(), 0) + 1
+        trabalho['arquivo'] = base if n == 1 else f'{base}-{n}'
+    return trabalhos
+
+
+# --- DESCOBERTA DOS TRABALHOS ---
+def _primeiro(diretorio, padroes):
+    for padrao in padroes:
+        achados = sorted(glob.glob(os.path.join(diretorio, padrao)))
+        if achados:
+            return achados[-1]   # o mais recente quando o nome traz a data
+    return None
+
+
+def trabalhos_do_manifesto(caminho):
+    """
+    Manifesto CSV (';') com as colunas loja, vendas e ficha. Caminhos relativos são resolvidos
+    a partir da pasta do manifesto.
+    """
+    base = os.path.dirname(os.path.abspath(caminho))
+    df = pd.read_csv(caminho, sep=';', dtype=str, keep_default_na=False)
+    df.columns = df.columns.str.strip().str.lower()
+    faltando = {'loja', 'vendas', 'ficha'} - set(df.columns)
+    if faltando:
+        raise ValueError(f"Manifesto sem as colunas: {', '.join(sorted(faltando))}")
+    return [
+        {'loja': linha.loja.strip(), 'vendas': os.path.join(base, linha.vendas.strip()),
+         'ficha': os.path.join(base, linha.ficha.strip())}
+        for linha in df.itertuples(index=False)
+    ]
+
+
+def trabalhos_do_diretorio(diretorio, ficha_padrao=None):
+    """
+    Uma subpasta por loja, cada uma com sua exportação de vendas e (opcionalmente) sua ficha técnica.
+    Lojas sem ficha própria usam `ficha_padrao` ou a ficha encontrada na raiz do diretório.
+    """
+    ficha_raiz = ficha_padrao or _primeiro(diretorio, PADROES_FICHA)
+    trabalhos = []
+    for pasta in sorted(os.scandir(diretorio), key=lambda e: e.name):
+        if not pasta.is_dir():
+            continue
+        vendas = _primeiro(pasta.path, PADROES_VENDAS)
+        ficha = _primeiro(pasta.path, PADROES_FICHA) or ficha_raiz
+        if vendas and ficha:
+            trabalhos.append({'loja': pasta.name, 'vendas': vendas, 'ficha': ficha})
+    # Diretório sem subpastas: ele mesmo é a única loja
+    if not trabalhos:
+        vendas = _primeiro(diretorio, PADROES_VENDAS)
+        if vendas and ficha_raiz:
+            trabalhos.append({'loja': os.path.basename(os.path.abspath(diretorio)), 'vendas': vendas, 'ficha': ficha_raiz})
+    return trabalhos
+
+
+# --- PROCESSAMENTO DE UMA LOJA (roda dentro do processo filho) ---
+def montar_menu(df_vendas, df_custos, correspondencia=None):
+    """
+    Junção vendas x ficha, lucratividade e classificação: a mesma lógica final do filtro.py original.
+    """
+    correspondencia = correspondencia or CorrespondenciaProdutos()
+    df = correspondencia.juntar(df_vendas, df_custos)
+    if df.empty:
+        return df, correspondencia.relatorio
+    df = df[df['popularidade'] > 0].copy()
+    df['lucratividade'] = df['preco_venda'] - df['custo_producao']
+    df = df[df['lucratividade'] >= 0]
+    if not df.empty:
+        df['classificacao'], _, _ = classificar_menu(df, metodo='media')
+        df['classificacao'] = df['classificacao'].astype(str)
+    return df, correspondencia.relatorio
+
+
+def processar_loja(trabalho, diretorio_saida=None):
+    """
+    Executa um trabalho {'loja', 'vendas', 'ficha'} e grava `<loja>.parquet` e `<loja>.csv` (com o
+    nome da loja passado por nome_arquivo_loja).
+    Nunca levanta exceção: qualquer falha volta no campo 'erro' para não derrubar o lote inteiro.
+    """
+    tempos = {}
+    resumo = {'loja': trabalho['loja'], 'status': 'ok', 'erro': '', 'itens': 0, 'sem_par': 0}
+    inicio = time.perf_counter()
+    try:
+        t = time.perf_counter()
+        df_vendas = carregar_vendas(trabalho['vendas'], chunksize=LINHAS_POR_BLOCO)
+        tempos['vendas_s'] = time.perf_counter() - t
+
+        t = time.perf_counter()
+        df_custos = carregar_ficha(trabalho['ficha'])
+        tempos['ficha_s'] = time.perf_counter() - t
+
+        if df_vendas.empty or df_custos.empty:
+            raise ValueError('arquivo de vendas ou ficha vazio ou fora do layout esperado')
+
+        t = time.perf_counter()
+        df, relatorio = montar_menu(df_vendas, df_custos)
+        tempos['juncao_classificacao_s'] = time.perf_counter() - t
+        resumo['sem_par'] = relatorio.get('sem_par', 0)
+
+        df = df.reindex(columns=COLUNAS_RESULTADO)
+        df.insert(0, 'loja', trabalho['loja'])
+        resumo['itens'] = len(df)
+
+        if diretorio_saida:
+            t = time.perf_counter()
+            arquivo = trabalho.get('arquivo') or nome_arquivo_loja(trabalho['loja'])
+            gravar(df, os.path.join(diretorio_saida, 'lojas', arquivo))
+            tempos['gravacao_s'] = time.perf_counter() - t
+    except Exception as e:
+        # Qualquer erro (inclusive de layout inesperado no meio da junção) vira uma loja com falha
+        df = None
+        resumo['status'], resumo['erro'] = 'erro', f"{type(e).__name__}: {e}"
+
+    resumo.update({k: round(v, 4) for k, v in tempos.items()})
+    resumo['total_s'] = round(time.perf_counter() - inicio, 4)
+    resumo['pid'] = os.getpid()
+    return resumo, df
+
+
+def gravar(df, caminho_sem_extensao):
+    os.makedirs(os.path.dirname(caminho_sem_extensao), exist_ok=True)
+    df.to_parquet(f"{caminho_sem_extensao}.parquet", index=False)
+    df.to_csv(f"{caminho_sem_extensao}.csv", sep=';', decimal=',', index=False, encoding='utf-8-sig')
+
+
+# --- LOTE ---
+def _tamanho(trabalho):
+    try:
+        return os.path.getsize(trabalho['vendas'])
+    except OSError:
+        return 0
+
+
+def executar_lote(trabalhos, diretorio_saida, processos=None):
+    """
+    Processa todas as lojas num pool de processos e grava os resultados por loja, o consolidado
+    (`consolidado.parquet/.csv`) e o resumo de tempos (`resumo.csv`).
+
+    Os maiores arquivos de vendas são despachados primeiro para que a última loja a terminar não
+    seja a mais pesada (o tempo total fica perto de soma/núcleos).
+    """
+    processos = max(1, min(processos or os.cpu_count() or 1, len(trabalhos) or 1))
+    ordenados = sorted(_nomes_de_arquivo([dict(t) for t in trabalhos]), key=_tamanho, reverse=True)
+    inicio = time.perf_counter()
+
+    resumos, resultados = [], []
+    if processos == 1:
+        for trabalho in ordenados:
+            resumo, df = processar_loja(trabalho, diretorio_saida)
+            resumos.append(resumo)
+            if df is not None:
+                resultados.append(df)
+    else:
+        with ProcessPoolExecutor(max_workers=processos) as pool:
+            futuros = {pool.submit(processar_loja, trabalho, diretorio_saida): trabalho for trabalho in ordenados}
+            for futuro in as_completed(futuros):
+                try:
+                    resumo, df = futuro.result()
+                except Exception as e:
+                    # O processo filho morreu (memória, sinal) ou o resultado não voltou: a loja falha, o lote segue
+                    resumo, df = {'loja': futuros[futuro]['loja'], 'status': 'erro', 'erro': f"{type(e).__name__}: {e}",
+                                  'itens': 0, 'sem_par': 0, 'total_s': 0.0}, None
+                resumos.append(resumo)
+                if df is not None:
+                    resultados.append(df)
+
+    t = time.perf_counter()
+    consolidado = pd.concat(resultados, ignore_index=True) if resultados else pd.DataFrame(columns=['loja'] + COLUNAS_RESULTADO)
+    consolidado = consolidado.sort_values(['loja', 'receita_total'], ascending=[True, False], kind='stable')
+    gravar(consolidado, os.path.join(diretorio_saida, 'consolidado'))
+    tempo_consolidacao = time.perf_counter() - t
+
+    duracao = time.perf_counter() - inicio
+    df_resumo = pd.DataFrame(resumos).sort_values('loja', kind='stable').reset_index(drop=True)
+    df_resumo.to_csv(os.path.join(diretorio_saida, 'resumo.csv'), sep=';', decimal=',', index=False)
+
+    soma_trabalhos = float(df_resumo['total_s'].sum()) if not df_resumo.empty else 0.0
+    estatisticas = {
+        'lojas': len(trabalhos),
+        'ok': int((df_resumo['status'] == 'ok').sum()) if not df_resumo.empty else 0,
+        'processos': processos,
+        'total_s': duracao,
+        'soma_trabalhos_s': soma_trabalhos,
+        'consolidacao_s': tempo_consolidacao,
+        # Quanto do trabalho serial foi paralelizado: perto de `processos` = escala linear
+        'aceleracao': soma_trabalhos / duracao if duracao > 0 else 0.0,
+        'itens': len(consolidado),
+    }
+    return df_resumo, consolidado, estatisticas
+
+
+def imprimir_resumo(df_resumo, estatisticas):
+    colunas = [c for c in ['loja', 'status', 'itens', 'sem_par', 'vendas_s', 'ficha_s',
+                           'juncao_classificacao_s', 'gravacao_s', 'total_s', 'erro'] if c in df_resumo.columns]
+    with pd.option_context('display.max_rows', None, 'display.width', 160):
+        print(df_resumo[colunas].to_string(index=False))
+    print(
+        f"\n{estatisticas['ok']}/{estatisticas['lojas']} lojas ok, {estatisticas['itens']} itens consolidados | "
+        f"{estatisticas['processos']} processos | total {estatisticas['total_s']:.2f}s "
+        f"(soma dos trabalhos {estatisticas['soma_trabalhos_s']:.2f}s, aceleração {estatisticas['aceleracao']:.1f}x)"
+    )
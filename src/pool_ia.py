@@ -0,0 +1,86 @@
+import hashlib
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# Quantos conjuntos de agentes ociosos manter por (tipo, modelo, chave de API)
+MAX_OCIOSOS_POR_CHAVE = 4
+
+
+def hash_chave_api(api_key):
+    # A chave de API nunca fica em memória como identificador do pool, só o seu hash
+    return hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()[:16]
+
+
+class PoolIA:
+    """
+    Pool de processo para clientes LLM e agentes do CrewAI, compartilhado entre sessões do Streamlit.
+
+    Um LLM por (modelo, hash da chave de API) é criado uma única vez e reaproveitado, o que
+    também reaproveita os clientes HTTP que o litellm guarda por credencial. Os agentes são
+    emprestados com exclusividade: cada requisição pega um conjunto ocioso (ou cria um novo),
+    monta só a sua Task/Crew e devolve o conjunto ao terminar. Duas sessões nunca usam o
+    mesmo Agent ao mesmo tempo.
+    """
+
+    def __init__(self, max_ociosos=MAX_OCIOSOS_POR_CHAVE):
+        self.max_ociosos = max_ociosos
+        self._lock = threading.Lock()
+        self._llms = {}
+        self._ociosos = defaultdict(deque)
+        self.estatisticas = {
+            'llms_criados': 0,
+            'agentes_criados': 0,
+            'agentes_reusados': 0,
+            'tempo_construcao_s': 0.0,
+        }
+
+    def llm(self, modelo_nome, api_key, fabrica):
+        chave = (modelo_nome, hash_chave_api(api_key))
+        with self._lock:
+            llm = self._llms.get(chave)
+            if llm is None:
+                inicio = time.perf_counter()
+                llm = fabrica(modelo_nome, api_key)
+                self._llms[chave] = llm
+                self.estatisticas['llms_criados'] += 1
+                self.estatisticas['tempo_construcao_s'] += time.perf_counter() - inicio
+        return llm
+
+    @contextmanager
+    def emprestar(self, tipo, modelo_nome, api_key, fabrica_llm, fabrica_agentes):
+        """
+        Empresta com exclusividade um conjunto de agentes `tipo` já configurado para o modelo.
+        `fabrica_agentes(llm)` só é chamada quando não há conjunto ocioso.
+        """
+        chave = (tipo, modelo_nome, hash_chave_api(api_key))
+        with self._lock:
+            fila = self._ociosos[chave]
+            agentes = fila.popleft() if fila else None
+            if agentes is not None:
+                self.estatisticas['agentes_reusados'] += 1
+
+        if agentes is None:
+            llm = self.llm(modelo_nome, api_key, fabrica_llm)
+            inicio = time.perf_counter()
+            agentes = fabrica_agentes(llm)
+            with self._lock:
+                self.estatisticas['agentes_criados'] += 1
+                self.estatisticas['tempo_construcao_s'] += time.perf_counter() - inicio
+
+        # Em caso de erro o conjunto é descartado: o estado interno do agente pode ter ficado inconsistente
+        yield agentes
+
+        with self._lock:
+            fila = self._ociosos[chave]
+            if len(fila) < self.max_ociosos:
+                fila.append(agentes)
+
+    def limpar(self):
+        with self._lock:
+            self._llms.clear()
+            self._ociosos.clear()
+
+
+pool_ia = PoolIA()
@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+
+from src.consultas import formatar_valor
+from src.contexto import QUADRANTES_CURTOS
+from src.engenharia import QUADRANTES, TIPOS_PRODUTO, classificar_menu, tipo_produto
+
+# --- FAIXAS DE CMV (custo / preço de venda) ---
+# Revenda costuma ter CMV entre 35% e 60%; um prato feito na casa acima de ~40% paga gás e mão de obra
+# com a margem de uma lata de refrigerante.
+CMV_MAXIMO_PRODUCAO = 0.40
+CMV_MAXIMO_REVENDA = 0.65
+LIMIAR_ATIPICO = 3.5        # z robusto (mediana/MAD) da margem % dentro do mesmo tipo
+MAX_ITENS_PROMPT = 40       # itens sinalizados enviados à IA, qualquer que seja o tamanho do cardápio
+MAX_DESTAQUES = 5
+TAMANHO_NOME = 40
+
+# Ordem = prioridade: o primeiro alerta de cada item é o principal
+ALERTAS = {
+    'prejuizo': 'vendido abaixo do custo',
+    'sem_custo': 'sem custo cadastrado (ficha técnica ausente?)',
+    'producao_margem_revenda': 'item de produção com CMV de revenda',
+    'producao_popular_baixo_lucro': 'prato popular com lucro abaixo da média',
+    'revenda_subprecificada': 'revenda com CMV alto demais',
+    'margem_atipica': 'margem fora do padrão do seu tipo',
+}
+NOMES_TIPO = {'revenda': 'revenda', 'producao': 'produção'}
+
+
+def _tipos(df, revendas):
+    # Nome do produto (engenharia.tipo_produto) + estrutura de custo da ficha técnica; a coluna 'tipo' manda
+    tipo = tipo_produto(df)
+    if revendas is None or not len(revendas):
+        return tipo
+    nomes = df['produto_nome'].astype(str).str.strip().str.replace(' +', ' ', regex=True).str.upper()
+    pela_ficha = nomes.isin(pd.Index(revendas)).to_numpy()
+    if 'tipo' in df.columns:
+        informado = df['tipo'].astype(str).str.strip().str.lower().replace('produção', 'producao')
+        pela_ficha &= ~informado.isin(TIPOS_PRODUTO).to_numpy()
+    return tipo.mask(pela_ficha, 'revenda')
+
+
+def preanalisar(df, revendas=None, metodo='media'):
+    """
+    Pré-análise determinística do cardápio, sem IA: natureza do item (revenda/produção), CMV %,
+    margem %, quadrante e alertas por item, tudo vetorizado.
+
+    `revendas` (opcional, ex: GrafoReceitas.revendas()) marca como revenda os itens cuja ficha técnica
+    é um único insumo comprado pronto. Devolve um DataFrame alinhado ao índice de `df`, com uma coluna
+    booleana por alerta de ALERTAS e 'alertas' com os códigos separados por vírgula.
+    """
+    tipo = _tipos(df, revendas)
+    custo = df['custo_producao'].astype('float64').to_numpy()
+    preco = df['preco_venda'].astype('float64').to_numpy()
+    vendas = df['popularidade'].astype('float64').to_numpy()
+    lucro = preco - custo
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cmv = np.where(preco > 0, custo / preco, np.nan)
+    receita = df['receita_total'].astype('float64').to_numpy() if 'receita_total' in df.columns else preco * vendas
+    if 'classificacao' in df.columns:
+        classificacao = df['classificacao'].astype(str)
+    else:
+        base = df.assign(lucratividade=lucro) if 'lucratividade' not in df.columns else df
+        classificacao = classificar_menu(base, metodo=metodo)[0].astype(str)
+
+    pre = pd.DataFrame({
+        'produto_nome': df['produto_nome'].astype(str), 'tipo': tipo, 'classificacao': classificacao,
+        'preco_venda': preco, 'custo_producao': custo, 'cmv_pct': cmv * 100, 'margem_pct': (1 - cmv) * 100,
+        'popularidade': vendas, 'lucro_total': lucro * vendas, 'receita_total': receita,
+    }, index=df.index)
+    if 'categoria' in df.columns:
+        pre['categoria'] = df['categoria'].astype(str)
+
+    # Margem atípica: z robusto dentro do tipo (revenda e produção têm faixas de margem diferentes)
+    por_tipo = pre.groupby('tipo', sort=False)['margem_pct']
+    mediana = por_tipo.transform('median')
+    mad = (pre['margem_pct'] - mediana).abs().groupby(pre['tipo'], sort=False).transform('median')
+    z = 0.6745 * (pre['margem_pct'] - mediana) / mad.where(mad > 0)
+
+    producao = (tipo == 'producao').to_numpy()
+    com_custo = custo > 0
+    regras = {
+        'prejuizo': com_custo & (lucro < 0),
+        'sem_custo': ~com_custo,
+        'producao_margem_revenda': producao & com_custo & (cmv > CMV_MAXIMO_PRODUCAO),
+        'producao_popular_baixo_lucro': producao & (classificacao == QUADRANTES[1]).to_numpy(),
+        'revenda_subprecificada': ~producao & com_custo & (cmv > CMV_MAXIMO_REVENDA),
+        'margem_atipica': com_custo & (z.abs() > LIMIAR_ATIPICO).to_numpy(),
+    }
+    alertas = np.full(len(pre), '', dtype=object)
+    for codigo, mascara in regras.items():
+        pre[codigo] = mascara
+        alertas = np.where(mascara, alertas + codigo + ',', alertas)
+    pre['alertas'] = pd.Series(alertas, index=pre.index, dtype=object).str.rstrip(',')
+    return pre
+
+
+def _principal(pre):
+    # Primeiro alerta de cada item sinalizado (ordem de ALERTAS)
+    codigos = list(ALERTAS)
+    marcas = pre[codigos].to_numpy()
+    return pd.Series(np.array(codigos, dtype=object)[marcas.argmax(axis=1)], index=pre.index)
+
+
+def _tabela(df, colunas):
+    saida = df[colunas].copy()
+    saida['produto_nome'] = saida['produto_nome'].str.slice(0, TAMANHO_NOME)
+    saida['popularidade'] = saida['popularidade'].round().astype('int64')
+    if 'classificacao' in saida.columns:
+        saida['classificacao'] = saida['classificacao'].map(QUADRANTES_CURTOS).fillna(saida['classificacao'])
+    if 'tipo' in saida.columns:
+        saida['tipo'] = saida['tipo'].map(NOMES_TIPO)
+    saida = saida.rename(columns={'produto_nome': 'nome', 'classificacao': 'quadrante', 'preco_venda': 'preco',
+                                  'custo_producao': 'custo', 'popularidade': 'vendas'})
+    return saida.to_csv(index=False, sep=';', decimal=',', float_format='%.2f').strip()
+
+
+def resumo_para_prompt(pre, max_itens=MAX_ITENS_PROMPT):
+    """
+    Texto compacto com os agregados por tipo e quadrante, os itens sinalizados de maior receita
+    (no máximo `max_itens`, alternando entre os tipos de alerta) e alguns destaques sem alerta.
+    O tamanho não cresce com o cardápio.
+    """
+    receita_total = pre['receita_total'].sum()
+    participacao = 100 / receita_total if receita_total else 0.0
+    g = pre.assign(custo_vendido=pre['custo_producao'] * pre['popularidade']).groupby('tipo', sort=False)
+    soma = g[['receita_total', 'custo_vendido']].sum()
+    por_tipo = pd.DataFrame({
+        'itens': g.size(), 'receita_pct': soma['receita_total'] * participacao,
+        'cmv_ponderado_pct': soma['custo_vendido'] / soma['receita_total'].where(soma['receita_total'] > 0) * 100,
+        'margem_media_pct': g['margem_pct'].mean(),
+    }).rename(index=NOMES_TIPO)
+    por_quadrante = pd.DataFrame({
+        'itens': pre.groupby('classificacao', sort=False).size(),
+        'receita_pct': pre.groupby('classificacao', sort=False)['receita_total'].sum() * participacao,
+    }).rename(index=QUADRANTES_CURTOS)
+    contagem = pre[list(ALERTAS)].sum()
+
+    sinalizados = pre[pre['alertas'] != '']
+    if len(sinalizados):
+        principal = _principal(sinalizados)
+        prioridade = principal.map({c: i for i, c in enumerate(ALERTAS)})
+        ordem = sinalizados.assign(_principal=principal, _prioridade=prioridade)
+        ordem = ordem.sort_values('receita_total', ascending=False)
+        # Rodízio entre alertas: o 1º de cada alerta, depois o 2º de cada... nenhum alerta domina a lista
+        ordem['_posicao'] = ordem.groupby('_principal', sort=False).cumcount()
+        sinalizados = ordem.sort_values(['_posicao', '_prioridade']).head(max_itens)
+
+    sem_alerta = pre[pre['alertas'] == ''].sort_values('lucro_total', ascending=False)
+    destaques = pd.concat([sem_alerta[sem_alerta['classificacao'] == q].head(MAX_DESTAQUES) for q in QUADRANTES[::2]])
+
+    colunas = ['produto_nome', 'tipo', 'classificacao', 'preco_venda', 'custo_producao', 'cmv_pct', 'popularidade',
+               'lucro_total']
+    partes = [
+        f"PRÉ-ANÁLISE DO CARDÁPIO: {len(pre)} itens, receita total {formatar_valor(receita_total, 'receita_total')}",
+        "POR TIPO:\n" + por_tipo.rename_axis('tipo').reset_index().to_csv(
+            index=False, sep=';', decimal=',', float_format='%.1f').strip(),
+        "POR QUADRANTE:\n" + por_quadrante.rename_axis('quadrante').reset_index().to_csv(
+            index=False, sep=';', decimal=',', float_format='%.1f').strip(),
+        "ALERTAS:\n" + '\n'.join(f"- {codigo}: {descricao} ({int(contagem[codigo])} itens)"
+                                 for codigo, descricao in ALERTAS.items() if contagem[codigo]),
+    ]
+    if len(sinalizados):
+        total = int((pre['alertas'] != '').sum())
+        partes.append(f"ITENS SINALIZADOS ({len(sinalizados)} de {total}, maior receita primeiro):\n"
+                      + _tabela(sinalizados, colunas + ['alertas']))
+    if len(destaques):
+        partes.append("DESTAQUES SEM ALERTA (Estrelas e Oportunidades de maior lucro total):\n"
+                      + _tabela(destaques, colunas))
+    return '\n\n'.join(partes)
+
+
+def fatiar(pre):
+    """
+    Divide a pré-análise em fatias para o relatório em paralelo: por 'categoria' quando o cardápio
+    a traz, senão por quadrante. Devolve {rótulo: DataFrame}, sem fatias vazias.
+    """
+    if 'categoria' in pre.columns:
+        return {str(nome): grupo for nome, grupo in pre.groupby('categoria', sort=True)}
+    return {QUADRANTES_CURTOS[q]: grupo for q in QUADRANTES
+            if len(grupo := pre[pre['classificacao'] == q])}
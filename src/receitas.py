@@ -0,0 +1,267 @@
+import numpy as np
+import pandas as pd
+
+from src.dataloader import ERROS_LEITURA, com_encoding
+from src.formato import farejar
+
+# Após N atualizações incrementais de preço, os custos são refeitos do zero para não acumular erro de ponto flutuante
+RESSINCRONIZAR_A_CADA = 256
+
+COLUNAS_FICHA = {
+    'produto principal': 'produto_principal', 'produto componente': 'produto_componente', 'valor custo': 'valor_custo',
+}
+COLUNAS_INGREDIENTE = ('ingrediente', 'insumo', 'produto_componente', 'produto', 'componente')
+COLUNAS_PRECO = ('preco', 'preço', 'preco_unitario', 'valor', 'valor_unitario', 'custo')
+# Item de revenda costuma ter a si mesmo como componente ("COCA-COLA LATA" -> "COCA-COLA LATA"):
+# o componente vira um ingrediente à parte, com este sufixo, para o grafo continuar acíclico
+SUFIXO_INSUMO = ' [INSUMO]'
+
+
+def normalizar_nome(serie):
+    # Mesma normalização do processar_nova_ficha (src/dataloader.py)
+    return serie.astype(str).str.strip().str.replace(' +', ' ', regex=True).str.upper().str.rstrip('.')
+
+
+def _numeros(serie, decimal=None):
+    # Aceita ponto ou vírgula decimal; com decimal=',' (farejado) o ponto é tratado como milhar ("1.234,56")
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype('float64')
+    texto = serie.astype(str).str.strip()
+    if decimal == ',':
+        texto = texto.str.replace('.', '', regex=False)
+    return pd.to_numeric(texto.str.replace(',', '.', regex=False), errors='coerce')
+
+
+class GrafoReceitas:
+    """
+    Fichas técnicas como um grafo acíclico: produtos -> sub-receitas (molhos, massas) -> ingredientes.
+
+    Cada aresta (receita, componente, quantidade) guarda o preço unitário do componente quando ele é um
+    ingrediente; sub-receitas entram pelo custo calculado vezes um fator da aresta: 1 / rendimento quando
+    a ficha informa o rendimento, senão o fator que reproduz o valor_custo da própria linha. Os custos são
+    calculados uma vez, nível a nível (vetorizado); uma mudança de preço de ingrediente é propagada
+    como delta só pelas arestas afetadas, do nível mais baixo para o mais alto.
+    """
+
+    def __init__(self, receita, componente, quantidade, preco_unitario, rendimentos=None):
+        receita = normalizar_nome(pd.Series(receita)).reset_index(drop=True)
+        componente = normalizar_nome(pd.Series(componente)).reset_index(drop=True)
+        componente = componente.where(componente != receita, componente + SUFIXO_INSUMO)
+        self.nos = pd.Index(pd.unique(pd.concat([receita, componente], ignore_index=True)))
+        n = len(self.nos)
+        self.eh_receita = np.zeros(n, dtype=bool)
+        self.eh_receita[self.nos.get_indexer(pd.unique(receita))] = True
+
+        self.rendimento = np.ones(n)
+        informado = np.zeros(n, dtype=bool)
+        if rendimentos:
+            rend = pd.Series(rendimentos, dtype='float64')
+            pos = self.nos.get_indexer(normalizar_nome(pd.Series(rend.index)))
+            validos = (pos >= 0) & (rend.to_numpy() > 0)
+            self.rendimento[pos[validos]] = rend.to_numpy()[validos]
+            informado[pos[validos]] = True
+
+        pai = self.nos.get_indexer(receita)
+        filho = self.nos.get_indexer(componente)
+        nivel = self._niveis(pai, filho, n)
+        # Arestas ordenadas pelo nível da receita: cada nível é uma fatia contígua
+        ordem = np.argsort(nivel[pai], kind='stable')
+        self.pai = pai[ordem]
+        self.filho = filho[ordem]
+        self.quantidade = np.asarray(quantidade, dtype='float64')[ordem]
+        self.preco_aresta = np.asarray(preco_unitario, dtype='float64')[ordem]
+        self.aresta_ingrediente = ~self.eh_receita[self.filho]
+        # Sub-receita sem rendimento informado: o fator sai da linha na 1ª passada do recalcular
+        # (valor_custo / (quantidade × custo da sub-receita)), para o custo inicial bater com a ficha
+        self.fator = 1 / self.rendimento[self.filho]
+        self._valor_linha = np.where(self.aresta_ingrediente, np.nan, self.quantidade * self.preco_aresta)
+        self._derivar = ~self.aresta_ingrediente & ~informado[self.filho] & (self._valor_linha > 0)
+        self.preco_aresta[~self.aresta_ingrediente] = np.nan   # sub-receitas usam o custo calculado
+        self.niveis = int(nivel.max()) if n else 0
+        self._fatias = np.searchsorted(nivel[self.pai], np.arange(1, self.niveis + 2))
+
+        self.custo = np.zeros(n)
+        self.atualizacoes = 0
+        self.recalcular()
+
+    @staticmethod
+    def _niveis(pai, filho, n):
+        # Nível 0 = ingrediente; receita = 1 + maior nível entre seus componentes (relaxação vetorizada)
+        nivel = np.zeros(n, dtype=np.int64)
+        for _ in range(n + 1):
+            novo = nivel.copy()
+            np.maximum.at(novo, pai, nivel[filho] + 1)
+            if np.array_equal(novo, nivel):
+                return nivel
+            nivel = novo
+        raise ValueError("Ficha técnica com ciclo: uma receita usa a si mesma, direta ou indiretamente.")
+
+    @classmethod
+    def da_ficha(cls, df_ficha):
+        """
+        Monta o grafo a partir da ficha técnica (produto_principal;produto_componente;quantidade;unidade;valor_custo
+        e, opcionalmente, rendimento). O preço unitário de cada linha é valor_custo / quantidade e as linhas
+        de sub-receita sem rendimento mantêm o próprio valor_custo, então os custos iniciais batem com a soma
+        do processar_nova_ficha; linhas sem quantidade valem como custo fixo.
+        """
+        df = df_ficha.copy()
+        df.columns = df.columns.str.replace('"', '').str.strip().str.lower()
+        df = df.rename(columns=COLUNAS_FICHA)
+        faltando = {'produto_principal', 'produto_componente', 'valor_custo'} - set(df.columns)
+        if faltando:
+            raise ValueError(f"Ficha técnica sem as colunas: {', '.join(sorted(faltando))}")
+
+        custo = _numeros(df['valor_custo'])
+        df = df[custo.notna().to_numpy()]
+        custo = custo.dropna().to_numpy()
+        qtd = _numeros(df['quantidade']).to_numpy() if 'quantidade' in df.columns else np.full(len(df), np.nan)
+        sem_qtd = ~(qtd > 0)
+        qtd = np.where(sem_qtd, 1.0, qtd)
+
+        rendimentos = None
+        if 'rendimento' in df.columns:
+            rend = pd.DataFrame({'receita': df['produto_principal'], 'rendimento': _numeros(df['rendimento'])}).dropna()
+            rendimentos = rend.drop_duplicates('receita', keep='last').set_index('receita')['rendimento'].to_dict()
+        return cls(df['produto_principal'], df['produto_componente'], qtd, custo / qtd, rendimentos)
+
+    @classmethod
+    def do_arquivo(cls, arquivo):
+        return cls.da_ficha(ler_ficha(arquivo))
+
+    # --- CÁLCULO ---
+    def _contribuicao(self, inicio, fim, valores_filho):
+        q = self.quantidade[inicio:fim]
+        filho = self.filho[inicio:fim]
+        return q * np.where(self.aresta_ingrediente[inicio:fim], self.preco_aresta[inicio:fim],
+                            valores_filho[filho] * self.fator[inicio:fim])
+
+    def _derivar_fatores(self, inicio, fim, custo):
+        # Só na montagem: os componentes deste nível já têm custo, então o fator de cada linha é conhecido
+        derivar = np.flatnonzero(self._derivar[inicio:fim]) + inicio
+        custo_filho = custo[self.filho[derivar]]
+        ok = custo_filho > 0
+        self.fator[derivar[ok]] = self._valor_linha[derivar[ok]] / (self.quantidade[derivar[ok]] * custo_filho[ok])
+        self._derivar[derivar] = False
+
+    def recalcular(self):
+        """
+        Custo de todas as receitas do zero, um nível por vez (componentes sempre em níveis anteriores).
+        """
+        custo = np.zeros(len(self.nos))
+        for k in range(self.niveis):
+            inicio, fim = self._fatias[k], self._fatias[k + 1]
+            if self._derivar[inicio:fim].any():
+                self._derivar_fatores(inicio, fim, custo)
+            custo += np.bincount(self.pai[inicio:fim], weights=self._contribuicao(inicio, fim, custo), minlength=len(custo))
+        self.custo = custo
+        self.atualizacoes = 0
+        return self
+
+    def atualizar_precos(self, precos):
+        """
+        Aplica preços unitários novos de ingredientes ({nome: preço}, Series ou DataFrame
+        ingrediente/preço) e propaga só a diferença para as receitas que os usam.
+
+        Devolve (afetados, desconhecidos): DataFrame produto_nome/custo_anterior/custo_producao das
+        receitas cujo custo mudou e a lista de nomes que não são ingredientes do grafo.
+        """
+        precos = _tabela_precos(precos)
+        nomes = normalizar_nome(pd.Series(precos.index))
+        pos = self.nos.get_indexer(nomes)
+        # Nome de item de revenda: o preço vale para o insumo dele mesmo
+        proprio = self.nos.get_indexer(nomes + SUFIXO_INSUMO)
+        pos = np.where(proprio >= 0, proprio, pos)
+        valido = (pos >= 0) & ~self.eh_receita[np.maximum(pos, 0)] & np.isfinite(precos.to_numpy())
+        desconhecidos = precos.index[~valido].tolist()
+
+        novo = np.full(len(self.nos), np.nan)
+        novo[pos[valido]] = precos.to_numpy()[valido]
+        arestas = np.flatnonzero(self.aresta_ingrediente & ~np.isnan(novo[self.filho]))
+        if len(arestas) == 0:
+            return pd.DataFrame(columns=['produto_nome', 'custo_anterior', 'custo_producao']), desconhecidos
+
+        anterior = self.custo.copy()
+        if self.atualizacoes + 1 >= RESSINCRONIZAR_A_CADA:
+            self.preco_aresta[arestas] = novo[self.filho[arestas]]
+            self.recalcular()
+        else:
+            # Delta das arestas de ingrediente, depois sobe pelas sub-receitas nível a nível
+            delta = np.bincount(
+                self.pai[arestas], minlength=len(self.nos),
+                weights=self.quantidade[arestas] * (novo[self.filho[arestas]] - self.preco_aresta[arestas]),
+            )
+            self.preco_aresta[arestas] = novo[self.filho[arestas]]
+            for k in range(1, self.niveis):
+                inicio, fim = self._fatias[k], self._fatias[k + 1]
+                sub = np.flatnonzero(~self.aresta_ingrediente[inicio:fim] & (delta[self.filho[inicio:fim]] != 0)) + inicio
+                if len(sub):
+                    np.add.at(delta, self.pai[sub], self.quantidade[sub] * delta[self.filho[sub]] * self.fator[sub])
+            self.custo = self.custo + delta
+            self.atualizacoes += 1
+
+        mudou = np.flatnonzero(self.eh_receita & (np.abs(self.custo - anterior) > 1e-9))
+        afetados = pd.DataFrame({
+            'produto_nome': self.nos[mudou], 'custo_anterior': anterior[mudou], 'custo_producao': self.custo[mudou],
+        })
+        return afetados, desconhecidos
+
+    # --- CONSULTAS ---
+    def custos(self):
+        """
+        Custo de todas as receitas no formato do processar_nova_ficha (produto_nome, custo_producao).
+        """
+        receitas = np.flatnonzero(self.eh_receita)
+        return pd.DataFrame({'produto_nome': self.nos[receitas], 'custo_producao': self.custo[receitas]})
+
+    def precos_ingredientes(self):
+        # Preço médio por unidade de cada ingrediente (linhas da ficha podem divergir até a 1ª atualização)
+        arestas = self.aresta_ingrediente
+        preco = pd.Series(self.preco_aresta[arestas]).groupby(self.filho[arestas]).mean()
+        return pd.DataFrame({'ingrediente': self.nos[preco.index.to_numpy()], 'preco_unitario': preco.to_numpy()})
+
+    def revendas(self):
+        """
+        Receitas com a estrutura de custo de um item de revenda: um único componente, ingrediente, em
+        quantidade 1 (compra-se pronto e vende-se a unidade). Usado pela pré-análise (src/preanalise.py).
+        """
+        linhas = np.bincount(self.pai, minlength=len(self.nos))
+        unico = self.aresta_ingrediente & np.isclose(self.quantidade, 1.0) & (linhas[self.pai] == 1)
+        return self.nos[np.unique(self.pai[unico])]
+
+    def resumo(self):
+        return {
+            'receitas': int(self.eh_receita.sum()), 'ingredientes': int((~self.eh_receita).sum()),
+            'sub_receitas': int(len(np.intersect1d(np.flatnonzero(self.eh_receita), self.filho))),
+            'ligacoes': len(self.pai), 'niveis': self.niveis,
+        }
+
+
+def _tabela_precos(precos, decimal=None):
+    # dict / Series / DataFrame -> Series preço indexada pelo nome do ingrediente
+    if isinstance(precos, pd.DataFrame):
+        colunas = {c.strip().lower(): c for c in precos.columns}
+        nome = next((colunas[c] for c in COLUNAS_INGREDIENTE if c in colunas), None)
+        valor = next((colunas[c] for c in COLUNAS_PRECO if c in colunas), None)
+        if nome is None or valor is None:
+            raise ValueError("Tabela de preços precisa de uma coluna de ingrediente e uma de preço.")
+        return pd.Series(_numeros(precos[valor], decimal).to_numpy(), index=precos[nome].astype(str).to_numpy())
+    serie = pd.Series(precos)
+    return pd.Series(_numeros(serie).to_numpy(), index=serie.index.astype(str))
+
+
+def ler_tabela_precos(arquivo):
+    """
+    Lista de preços do fornecedor (CSV com colunas de ingrediente e preço). Encoding, separador e
+    decimal são farejados como na importação em lote.
+    """
+    formato = farejar(arquivo)
+    try:
+        df = pd.read_csv(arquivo, sep=formato['separador'], encoding=formato['encoding'], dtype=str)
+    except ERROS_LEITURA as e:
+        raise ValueError(f"Não foi possível ler a tabela de preços: {e}") from e
+    return _tabela_precos(df, formato['decimal'])
+
+
+def ler_ficha(arquivo):
+    # Ficha técnica crua (texto), como veio do sistema; GrafoReceitas.da_ficha interpreta as colunas
+    return com_encoding(arquivo, lambda encoding: pd.read_csv(arquivo, sep=';', encoding=encoding, dtype=str))
@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+
+# --- TABELA DO CARDÁPIO NA SESSÃO ---
+# Uma tabela colunar tipada por usuário em vez de uma lista de dicts: nomes categóricos,
+# preços/custos float32 e vendas int32. A conversão para tipos "comuns" só acontece na
+# fronteira com a interface (para_editor), porque o st.data_editor trata categorias como listas.
+TIPOS_CARDAPIO = {
+    'produto_nome': 'category',
+    'custo_producao': 'float32',
+    'preco_venda': 'float32',
+    'popularidade': 'int32',
+}
+COLUNAS_CARDAPIO = list(TIPOS_CARDAPIO)
+COLUNAS_NUMERICAS = ['custo_producao', 'preco_venda', 'popularidade']
+
+
+def tabela_vazia():
+    return tipar(pd.DataFrame(columns=COLUNAS_CARDAPIO))
+
+
+def tipar(df):
+    """
+    Converte qualquer DataFrame/lista de registros com as colunas do cardápio para a tabela tipada.
+    Colunas ausentes viram 0; valores não numéricos viram 0.
+    """
+    df = pd.DataFrame(df)
+    tabela = pd.DataFrame(index=pd.RangeIndex(len(df)))
+    nomes = df['produto_nome'] if 'produto_nome' in df.columns else pd.Series([''] * len(df))
+    tabela['produto_nome'] = pd.Categorical(nomes.fillna('').astype(str).to_numpy())
+    for coluna in COLUNAS_NUMERICAS:
+        valores = pd.to_numeric(df[coluna], errors='coerce') if coluna in df.columns else pd.Series(0, index=df.index)
+        tabela[coluna] = valores.fillna(0).to_numpy().astype(TIPOS_CARDAPIO[coluna])
+    return tabela
+
+
+def para_editor(tabela):
+    # Fronteira com a interface: nomes como texto e números em 64 bits (sem ruído de float32 nas contas)
+    return pd.DataFrame({
+        'produto_nome': tabela['produto_nome'].astype(str).to_numpy(),
+        'custo_producao': tabela['custo_producao'].to_numpy(dtype='float64').round(4),
+        'preco_venda': tabela['preco_venda'].to_numpy(dtype='float64').round(4),
+        'popularidade': tabela['popularidade'].to_numpy(dtype='int64'),
+    })
+
+
+def _com_categorias(serie, categorias):
+    return serie.cat.set_categories(categorias)
+
+
+def adicionar_itens(tabela, registros):
+    """
+    Acrescenta itens (lista de dicts ou DataFrame) mantendo os tipos; as categorias de nomes são unidas.
+    """
+    novos = tipar(registros)
+    if tabela.empty:
+        return novos
+    categorias = tabela['produto_nome'].cat.categories.union(novos['produto_nome'].cat.categories)
+    tabela = tabela.assign(produto_nome=_com_categorias(tabela['produto_nome'], categorias))
+    novos = novos.assign(produto_nome=_com_categorias(novos['produto_nome'], categorias))
+    return pd.concat([tabela, novos], ignore_index=True)
+
+
+def _definir(tabela, posicao, coluna, valor):
+    if coluna == 'produto_nome':
+        valor = '' if valor is None else str(valor)
+        if valor not in tabela['produto_nome'].cat.categories:
+            tabela['produto_nome'] = tabela['produto_nome'].cat.add_categories([valor])
+    elif coluna in COLUNAS_NUMERICAS:
+        valor = pd.to_numeric(valor, errors='coerce')
+        valor = 0 if pd.isna(valor) else valor
+        if coluna == 'popularidade':
+            valor = int(valor)
+    else:
+        return
+    tabela.iloc[posicao, tabela.columns.get_loc(coluna)] = valor
+
+
+def aplicar_edicoes(tabela, estado_editor, df_editado):
+    """
+    Aplica o delta do st.data_editor (`st.session_state[key]`: edited_rows, added_rows, deleted_rows).
+
+    Edições de células (o caso comum) são escritas no lugar, célula a célula, sem reconstruir a
+    tabela. Linhas adicionadas ou removidas mudam a forma da tabela, então ela é refeita a partir
+    de `df_editado` (o que o editor devolveu). Devolve a tabela atualizada.
+    """
+    estado_editor = estado_editor or {}
+    if estado_editor.get('added_rows') or estado_editor.get('deleted_rows'):
+        return tipar(df_editado)
+    for posicao, mudancas in (estado_editor.get('edited_rows') or {}).items():
+        posicao = int(posicao)
+        if posicao >= len(tabela):
+            return tipar(df_editado)
+        for coluna, valor in mudancas.items():
+            _definir(tabela, posicao, coluna, valor)
+    return tabela
+
+
+def atualizar_vendas(tabela, vendas):
+    """
+    Substitui popularidade e preço dos itens presentes em `vendas` (produto_nome, popularidade,
+    preco_venda), como ao aplicar um período do histórico. Vetorizado sobre a tabela inteira.
+    """
+    if tabela.empty or vendas.empty:
+        return tabela
+    por_nome = vendas.drop_duplicates('produto_nome').set_index('produto_nome')
+    nomes = tabela['produto_nome'].astype(str).str.upper()
+    posicoes = por_nome.index.get_indexer(nomes)
+    achados = posicoes >= 0
+    if not achados.any():
+        return tabela
+    tabela.loc[achados, 'popularidade'] = por_nome['popularidade'].to_numpy()[posicoes[achados]].astype('int32')
+    tabela.loc[achados, 'preco_venda'] = np.round(por_nome['preco_venda'].to_numpy()[posicoes[achados]], 2).astype('float32')
+    return tabela
+
+
+def atualizar_custos(tabela, custos):
+    """
+    Substitui o custo_producao dos itens presentes em `custos` (produto_nome, custo_producao), como
+    ao aplicar fichas técnicas ou uma nova lista de preços de insumos (src/receitas.py).
+    Devolve (tabela, itens_atualizados).
+    """
+    if tabela.empty or custos.empty:
+        return tabela, 0
+    por_nome = custos.drop_duplicates('produto_nome').set_index('produto_nome')
+    posicoes = por_nome.index.get_indexer(tabela['produto_nome'].astype(str).str.upper())
+    achados = posicoes >= 0
+    if achados.any():
+        tabela.loc[achados, 'custo_producao'] = np.round(por_nome['custo_producao'].to_numpy()[posicoes[achados]], 2).astype('float32')
+    return tabela, int(achados.sum())
+
+
+def memoria_tabela_bytes(tabela):
+    return int(tabela.memory_usage(index=True, deep=True).sum())
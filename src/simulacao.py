@@ -0,0 +1,215 @@
+import numpy as np
+import pandas as pd
+
+from src.engenharia import QUADRANTES, TIPO_QUADRANTE, tipo_produto
+
+# --- PREMISSAS DO MODELO ---
+# Elasticidade-preço da demanda: variação % na quantidade para cada 1% de variação no preço.
+# Revenda é pouco elástica (a lata é comprada de qualquer jeito); prato da casa tem substitutos no próprio cardápio.
+ELASTICIDADE_PADRAO = {'revenda': -0.4, 'producao': -1.2}
+PRECO_MINIMO = 0.01
+# Cenários (ou rodadas de Monte Carlo) por bloco: limita a memória das matrizes cenários x itens
+BLOCO_CENARIOS = 512
+# As matrizes cenários x itens usam float32 (metade da memória, exp/log ~4x mais rápidos);
+# as somas do NumPy são em pares, então o erro relativo dos totais fica na casa de 1e-6
+TIPO = np.float32
+
+
+def _base(df, tipo=TIPO):
+    # Células vazias contam como zero (o editor não deixa salvar assim, mas backups antigos podem ter)
+    preco = np.nan_to_num(df['preco_venda'].to_numpy(dtype='float64')).astype(tipo)
+    custo = np.nan_to_num(df['custo_producao'].to_numpy(dtype='float64')).astype(tipo)
+    pop = np.nan_to_num(df['popularidade'].to_numpy(dtype='float64')).astype(tipo)
+    return preco, custo, pop
+
+
+def _elasticidade(df, elasticidade, n, tipo=TIPO):
+    if elasticidade is None:
+        return elasticidades(df).astype(tipo)
+    return np.broadcast_to(np.asarray(elasticidade, dtype=tipo), (n,))
+
+
+def elasticidades(df, premissas=None):
+    """
+    Elasticidade de cada item conforme a natureza (revenda/produção) de engenharia.tipo_produto.
+    `premissas` sobrescreve ELASTICIDADE_PADRAO (ex: {'revenda': -0.2}).
+    """
+    premissas = {**ELASTICIDADE_PADRAO, **(premissas or {})}
+    revenda = tipo_produto(df).to_numpy() == 'revenda'
+    return np.where(revenda, premissas['revenda'], premissas['producao']).astype('float64')
+
+
+def precos_cenarios(preco, variacoes, alvo=None, modo='percentual'):
+    """
+    Matriz (cenários x itens) de preços novos. Cada variação vale para os itens de `alvo`
+    (máscara booleana; None = todos). modo 'percentual' (0.1 = +10%) ou 'absoluto' (R$).
+    """
+    preco = np.asarray(preco)
+    variacoes = np.atleast_1d(np.asarray(variacoes, dtype=preco.dtype))[:, None]
+    mascara = np.ones(len(preco), dtype=bool) if alvo is None else np.asarray(alvo, dtype=bool)
+    if modo == 'percentual':
+        novos = preco * (1 + variacoes * mascara)
+    elif modo == 'absoluto':
+        novos = preco + variacoes * mascara
+    else:
+        raise ValueError(f"Modo de variação desconhecido: {modo}. Use 'percentual' ou 'absoluto'.")
+    return np.maximum(novos, preco.dtype.type(PRECO_MINIMO))
+
+
+def projetar(preco, custo, pop, precos, elasticidade):
+    """
+    Demanda de elasticidade constante: q' = q * (p'/p)^e. Devolve (popularidade, lucratividade)
+    no formato de `precos` (um cenário por linha). Itens sem preço atual mantêm a demanda.
+    """
+    razao = np.divide(precos, preco, out=np.ones_like(precos), where=preco > 0)
+    popularidade = pop * np.exp(elasticidade * np.log(razao))
+    return popularidade, precos - custo
+
+
+def quadrantes(popularidade, lucratividade):
+    """
+    Códigos 0..3 na ordem de QUADRANTES, com as médias de corte recalculadas em cada cenário (linha),
+    como no painel (método 'media').
+    """
+    ref_pop = popularidade.mean(axis=-1, keepdims=True)
+    ref_luc = lucratividade.mean(axis=-1, keepdims=True)
+    return (2 * ~(popularidade >= ref_pop) + ~(lucratividade >= ref_luc)).astype(np.int8)
+
+
+def migracoes(antes, depois):
+    """
+    Matriz 4x4 de itens que saem de um quadrante (linhas) para outro (colunas).
+    """
+    contagem = np.bincount(np.asarray(antes, dtype=np.int64) * 4 + np.asarray(depois), minlength=16)
+    return pd.DataFrame(contagem.reshape(4, 4), index=pd.Index(QUADRANTES, name='de'),
+                        columns=pd.Index(QUADRANTES, name='para'))
+
+
+# --- GRADE DE CENÁRIOS ---
+def simular_grade(df, variacoes, alvo=None, modo='percentual', elasticidade=None):
+    """
+    Avalia uma grade de variações de preço sobre o cardápio inteiro de uma vez (NumPy, em blocos).
+
+    Devolve um DataFrame com uma linha por variação: receita_total, lucro_total e popularidade_total
+    projetados, os deltas em relação ao cenário atual, quantos itens mudam de quadrante e a contagem
+    final por quadrante.
+    """
+    preco, custo, pop = _base(df)
+    e = _elasticidade(df, elasticidade, len(preco))
+    atual = quadrantes(pop, preco - custo)
+    lucro_atual = float(np.dot(preco - custo, pop))
+    receita_atual = float(np.dot(preco, pop))
+
+    variacoes = np.atleast_1d(np.asarray(variacoes, dtype='float64'))
+    partes = []
+    for inicio in range(0, len(variacoes), BLOCO_CENARIOS):
+        bloco = variacoes[inicio:inicio + BLOCO_CENARIOS]
+        precos = precos_cenarios(preco, bloco, alvo, modo)
+        popularidade, lucratividade = projetar(preco, custo, pop, precos, e)
+        codigos = quadrantes(popularidade, lucratividade)
+        receita = np.einsum('ij,ij->i', precos, popularidade).astype('float64')
+        lucro = np.einsum('ij,ij->i', lucratividade, popularidade).astype('float64')
+        parte = pd.DataFrame({
+            'variacao': bloco,
+            'receita_total': receita,
+            'lucro_total': lucro,
+            'popularidade_total': popularidade.sum(axis=1, dtype='float64'),
+            'delta_receita': receita - receita_atual,
+            'delta_lucro': lucro - lucro_atual,
+            'mudam_quadrante': (codigos != atual).sum(axis=1),
+        })
+        for codigo, nome in enumerate(QUADRANTES):
+            parte[nome] = (codigos == codigo).sum(axis=1)
+        partes.append(parte)
+    return pd.concat(partes, ignore_index=True)
+
+
+def simular_cenario(df, precos_novos, elasticidade=None):
+    """
+    Projeção item a item de um único cenário (vetor de preços novos alinhado a `df`).
+    Devolve (itens, migracoes), com a classificação antes e depois de cada item.
+    """
+    # Um cenário só: float64, para a tabela bater centavo a centavo com o painel
+    preco, custo, pop = _base(df, 'float64')
+    precos_novos = np.maximum(np.asarray(precos_novos, dtype='float64'), PRECO_MINIMO)
+    e = _elasticidade(df, elasticidade, len(preco), 'float64')
+    popularidade, lucratividade = projetar(preco, custo, pop, precos_novos, e)
+    antes = quadrantes(pop, preco - custo)
+    depois = quadrantes(popularidade, lucratividade)
+    itens = pd.DataFrame({
+        'produto_nome': df['produto_nome'].to_numpy(),
+        'tipo': tipo_produto(df).to_numpy(),
+        'preco_venda': preco,
+        'preco_novo': precos_novos,
+        'popularidade': pop,
+        'popularidade_projetada': popularidade,
+        'lucratividade': lucratividade,
+        'receita_total': precos_novos * popularidade,
+        'lucro_total': lucratividade * popularidade,
+        'classificacao': pd.Categorical.from_codes(antes, dtype=TIPO_QUADRANTE),
+        'classificacao_projetada': pd.Categorical.from_codes(depois, dtype=TIPO_QUADRANTE),
+    }, index=df.index)
+    return itens, migracoes(antes, depois)
+
+
+# --- MONTE CARLO ---
+def monte_carlo(df, precos_novos, elasticidade=None, n_simulacoes=1_000, incerteza_demanda=0.15,
+                incerteza_elasticidade=0.3, semente=None):
+    """
+    Simula a incerteza da demanda em torno de um cenário de preços.
+
+    Em cada rodada, a elasticidade de revenda e a de produção são sorteadas em torno da premissa
+    (desvio relativo `incerteza_elasticidade`) e cada item recebe um choque lognormal de demanda de
+    média 1 (desvio `incerteza_demanda`). O cenário atual é avaliado sob o mesmo sorteio, então
+    delta_lucro isola o efeito do preço.
+
+    Devolve {'rodadas': DataFrame por rodada, 'resumo': percentis e probabilidade de ganho,
+    'prob_mudar_quadrante': Series por item}.
+    """
+    rng = np.random.default_rng(semente)
+    preco, custo, pop = _base(df)
+    precos_novos = np.maximum(np.asarray(precos_novos, dtype=TIPO), TIPO(PRECO_MINIMO))
+    e = _elasticidade(df, elasticidade, len(preco))
+    revenda = (tipo_produto(df).to_numpy() == 'revenda').astype(np.intp)
+    luc_atual = preco - custo
+    luc_novo = precos_novos - custo
+    log_razao = np.log(np.divide(precos_novos, preco, out=np.ones_like(preco), where=preco > 0))
+    # Só os itens com preço alterado têm a demanda afetada pela elasticidade (o caso comum é mexer em poucos)
+    alterados = np.flatnonzero(log_razao != 0)
+    e_log = e[alterados] * log_razao[alterados]
+    n = len(preco)
+    mudou_luc = ~(luc_novo >= luc_novo.mean()) != ~(luc_atual >= luc_atual.mean())
+
+    lucro, receita, delta, mudou = [], [], [], np.zeros(n, dtype=np.int64)
+    for inicio in range(0, n_simulacoes, BLOCO_CENARIOS):
+        s = min(BLOCO_CENARIOS, n_simulacoes - inicio)
+        # Fator multiplicativo da elasticidade por tipo (coluna 0 = produção, 1 = revenda)
+        fator = np.maximum(1 + incerteza_elasticidade * rng.standard_normal((s, 2), dtype=TIPO), 0)
+        choque = rng.standard_normal((s, n), dtype=TIPO)
+        choque *= incerteza_demanda
+        choque -= incerteza_demanda ** 2 / 2
+        np.exp(choque, out=choque)
+        pop_atual = pop * choque
+        pop_nova = pop_atual.copy()
+        pop_nova[:, alterados] *= np.exp(fator[:, revenda[alterados]] * e_log)
+
+        lucro_rodada = (pop_nova @ luc_novo).astype('float64')
+        lucro.append(lucro_rodada)
+        receita.append((pop_nova @ precos_novos).astype('float64'))
+        delta.append(lucro_rodada - pop_atual @ luc_atual)
+        # A margem unitária não depende do sorteio: só o lado da popularidade muda de rodada a rodada
+        baixa_pop_atual = ~(pop_atual >= pop_atual.mean(axis=1, keepdims=True))
+        baixa_pop_nova = ~(pop_nova >= pop_nova.mean(axis=1, keepdims=True))
+        mudou += ((baixa_pop_nova != baixa_pop_atual) | mudou_luc).sum(axis=0)
+
+    rodadas = pd.DataFrame({
+        'lucro_total': np.concatenate(lucro), 'receita_total': np.concatenate(receita), 'delta_lucro': np.concatenate(delta),
+    })
+    p5, p50, p95 = np.percentile(rodadas['delta_lucro'], [5, 50, 95])
+    resumo = {
+        'delta_lucro_p5': p5, 'delta_lucro_p50': p50, 'delta_lucro_p95': p95,
+        'lucro_p50': rodadas['lucro_total'].median(), 'receita_p50': rodadas['receita_total'].median(),
+        'prob_lucro_maior': float((rodadas['delta_lucro'] > 0).mean()),
+    }
+    prob = pd.Series(mudou / max(n_simulacoes, 1), index=df['produto_nome'].to_numpy(), name='prob_mudar_quadrante')
+    return {'rodadas': rodadas, 'resumo': resumo, 'prob_mudar_quadrante': prob}
@@ -0,0 +1,33 @@
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def trava_arquivo(caminho):
+    """
+    Trava exclusiva entre processos (lote, CLI e painel) usando o arquivo `caminho`, criado se
+    preciso. Bloqueia até conseguir; é liberada ao sair do bloco ou se o processo morrer.
+    """
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    with open(caminho, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)